@@ -0,0 +1,233 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# ARSC ASSEMBLER BENCHMARK
+#
+# Assembler benchmark suite. Times the individual phases of the assembler (source
+# read, tokenizing, first pass, second pass and each code generator backend) on
+# synthetic programs from a few hundred to 64K words and on the sample programs
+# from the test directory, tracks the peak memory and writes the results as JSON.
+# A previous results file may be given to report the regressions.
+# Usage: python assembler_bench.py [-o results.json] [--compare baseline.json]
+#
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import platform
+import tempfile
+import subprocess
+from argparse import ArgumentParser
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+from asm_parser import AsmParser, RegexStmtTokenizer
+from compiler_engine import CompilerEngine, FirstPassDriver, SecondPassDriver, get_peak_memory
+from compilation_cache import ASSEMBLER_VERSION
+from code_generator import BaseGenerator
+from program_generator import write_program
+
+SYNTHETIC_SIZES = [256, 1024, 4096, 16384, 65536]
+BACKENDS = ['PRETTY', 'MIF', 'HEX', 'BIN']
+# Sample programs with intentional errors, which are not benchmarked
+EXCLUDED_SAMPLES = ['test_error.asm', 'test_valid.asm']
+
+
+# Generator that discards the code, used to time the second pass on its own
+class NullGenerator(BaseGenerator):
+    def on_instruction(self, opcode, indirect_or_iodev_bit, index, address, stmt_str = None):
+        pass
+    def on_bss_directive(self, bss_stmt):
+        pass
+    def on_bsc_directive(self, bsc_stmt):
+        pass
+    def on_anchor(self, address):
+        pass
+    def get_generated_code(self):
+        return None
+
+
+def best_of(repeat, func):
+    best = None
+    for i in range(0, repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# Times the phases of a single source. Runs in a separate process so that the
+# peak memory is not affected by the other cases
+def run_case(src_filename, repeat):
+    results = dict()
+
+    def read():
+        with open(src_filename, 'r') as src_file:
+            return src_file.read().split('\n')
+    results['read'] = best_of(repeat, read)
+    lines = read()
+
+    def tokenize():
+        for line in lines:
+            tokenizer = RegexStmtTokenizer(line)
+            while tokenizer.has_more_tokens():
+                tokenizer.get_next_token()
+    results['tokenize'] = best_of(repeat, tokenize)
+
+    state = dict()
+    def first_pass():
+        state['parser'] = AsmParser(src_filename)
+        state['driver'] = FirstPassDriver()
+        state['parser'].parse(state['driver'])
+    results['first_pass'] = best_of(repeat, first_pass)
+
+    parser, driver = state['parser'], state['driver']
+    sym_tbl = driver.get_symbol_table()
+    results['words'] = driver.get_word_count()
+    results['second_pass'] = best_of(repeat, lambda: parser.iterate(
+        SecondPassDriver(sym_tbl, tuple([NullGenerator()]), driver.literals, driver.anchors)))
+
+    # The generators are created (preallocated) as by the CompilerEngine
+    engine = CompilerEngine(src_filename, None, BACKENDS)
+    for name in BACKENDS:
+        def generate():
+            generator = engine.create_generator(name, None, driver.get_word_count(), sym_tbl)
+            parser.iterate(SecondPassDriver(sym_tbl, tuple([generator]), driver.literals, driver.anchors))
+            generator.get_generated_code()
+        # The backend time excludes the bare second pass
+        results['gen_' + name] = max(0.0, best_of(repeat, generate) - results['second_pass'])
+
+    results['peak_kib'] = get_peak_memory()
+    return results
+
+
+def run_child(src_filename, repeat):
+    output = subprocess.check_output(
+        [sys.executable, os.path.abspath(__file__), '--child', src_filename, '--repeat', str(repeat)])
+    return json.loads(output)
+
+
+# Returns the list of (case, metric, baseline, current) regressions. Timing
+# differences below min_delta seconds are considered noise
+def compare(baseline, current, threshold, min_delta):
+    regressions = []
+    for case, metrics in sorted(current['results'].items()):
+        base_metrics = baseline['results'].get(case)
+        if base_metrics is None:
+            continue
+        for metric, value in sorted(metrics.items()):
+            base_value = base_metrics.get(metric)
+            if metric == 'words' or not base_value or value is None:
+                continue
+            if metric != 'peak_kib' and value - base_value < min_delta:
+                continue
+            if value > base_value * (1 + threshold):
+                regressions.append((case, metric, base_value, value))
+    return regressions
+
+
+def main():
+    arg_parser = ArgumentParser(description='ARSC assembler benchmark suite.')
+    arg_parser.add_argument('-o', '--output', help='JSON results file.', default=None)
+    arg_parser.add_argument('-r', '--repeat', type=int, default=3,
+                            help='Number of timing runs per phase (the best one is reported).')
+    arg_parser.add_argument('-s', '--sizes', type=int, nargs='+', default=SYNTHETIC_SIZES,
+                            help='Sizes (in words) of the synthetic programs.')
+    arg_parser.add_argument('--compare', help='Baseline JSON results file.', default=None)
+    arg_parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Relative slowdown reported as a regression (0.2 by default).')
+    arg_parser.add_argument('--min-delta', type=float, default=0.5,
+                            help='Timing difference (in ms) below which no regression is reported.')
+    arg_parser.add_argument('--child', help=None, default=None)
+    args = arg_parser.parse_args()
+
+    if args.child is not None:
+        print json.dumps(run_case(args.child, args.repeat))
+        return
+
+    cases = []
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for words in args.sizes:
+            src_filename = os.path.join(tmp_dir, 'synthetic_%d.asm' % words)
+            write_program(src_filename, words)
+            cases.append(('synthetic_%d' % words, src_filename))
+        for src_filename in sorted(glob.glob(os.path.join(BENCH_DIR, '..', 'test', '*.asm'))):
+            if os.path.basename(src_filename) in EXCLUDED_SAMPLES:
+                continue
+            cases.append((os.path.splitext(os.path.basename(src_filename))[0], src_filename))
+
+        current = dict(
+            assembler_version=ASSEMBLER_VERSION
+            , python=platform.python_version()
+            , platform=platform.platform()
+            , timestamp=time.strftime('%Y-%m-%dT%H:%M:%S')
+            , results=dict())
+
+        print '%-28s %6s %8s %8s %8s %8s %8s %8s %8s %8s %9s' % (
+            'case', 'words', 'read', 'tokenize', 'pass 1', 'pass 2', 'PRETTY', 'MIF', 'HEX', 'BIN', 'peak KiB')
+        for name, src_filename in cases:
+            try:
+                results = run_child(src_filename, args.repeat)
+            except subprocess.CalledProcessError:
+                sys.stderr.write('%s: failed, not benchmarked\n' % name)
+                continue
+            current['results'][name] = results
+            print '%-28s %6d %s %9s' % (
+                name, results['words']
+                , ' '.join('%8.2f' % (results[phase] * 1000) for phase in
+                           ['read', 'tokenize', 'first_pass', 'second_pass', 'gen_PRETTY', 'gen_MIF', 'gen_HEX', 'gen_BIN'])
+                , results['peak_kib'])
+        print '(times in ms)'
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(current, output_file, indent=2, sort_keys=True)
+
+    if args.compare is not None:
+        with open(args.compare, 'r') as baseline_file:
+            regressions = compare(json.load(baseline_file), current, args.threshold, args.min_delta / 1000)
+        for case, metric, base_value, value in regressions:
+            print 'REGRESSION %s %s: %s -> %s' % (case, metric, base_value, value)
+        if len(regressions) != 0:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
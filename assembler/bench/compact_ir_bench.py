@@ -0,0 +1,125 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# ARSC ASSEMBLER BENCHMARK
+#
+# Compares the memory footprint and the run time of the default (object per
+# statement) and the compact (struct-of-arrays) statement storage on a program
+# that fills the whole 64K-word address space. Each mode runs in a separate
+# process so that the peak memory figures don't affect each other.
+# Usage: python compact_ir_bench.py [-w WORDS]
+#
+import os
+import sys
+import time
+import random
+import tempfile
+import subprocess
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from asm_parser import AsmParser
+from compiler_engine import FirstPassDriver, SecondPassDriver, get_peak_memory
+from code_generator import BinaryGenerator
+
+def write_program(filename, words):
+    rnd = random.Random(words)
+    code_words = words / 4
+    with open(filename, 'w') as src_file:
+        src_file.write('BEGIN:\n')
+        for i in range(0, code_words - 1):
+            src_file.write('    %s %sVAR_%d%s\n' % (
+                rnd.choice(['LDA', 'ADD', 'STA', 'AND', 'OR', 'XOR'])
+                , rnd.choice(['', '*'])
+                , rnd.randint(0, 31)
+                , rnd.choice(['', ',1', ',2', ',3'])))
+        src_file.write('    HLT\n')
+        # The code fills the direct-address window, so the variables are aliased
+        # to the (absolute) low addresses
+        for i in range(0, 32):
+            src_file.write('VAR_%d ALIAS %d\n' % (i, 0xE0 + i))
+
+        remaining = words - code_words
+        i = 0
+        while remaining > 0:
+            count = min(remaining, 16)
+            src_file.write('TABLE_%d BSC %s\n' % (
+                i, ', '.join(str(rnd.randint(-32768, 32767)) for j in range(0, count))))
+            remaining -= count
+            i += 1
+        src_file.write('END\n')
+
+def run_child(filename, compact):
+    start = time.time()
+    parser = AsmParser(filename, compact=compact)
+    first_pass_driver = FirstPassDriver()
+    parser.parse(first_pass_driver)
+    parse_time = time.time() - start
+
+    start = time.time()
+    generator = BinaryGenerator()
+    parser.iterate(SecondPassDriver(first_pass_driver.get_symbol_table(), tuple([generator])))
+    second_pass_time = time.time() - start
+
+    print '%d %f %f %d' % (
+        len(generator.get_generated_code()) / 2, parse_time, second_pass_time, get_peak_memory() or 0)
+
+def main():
+    arg_parser = ArgumentParser(description='Object vs compact statement storage benchmark.')
+    arg_parser.add_argument('-w', '--words', type=int, default=65536,
+                            help='Size of the generated program in 16-bit words.')
+    arg_parser.add_argument('--child', choices=['OBJECTS', 'COMPACT'], help=None)
+    arg_parser.add_argument('--src', help=None)
+    args = arg_parser.parse_args()
+
+    if args.child is not None:
+        run_child(args.src, args.child == 'COMPACT')
+        return
+
+    fd, filename = tempfile.mkstemp(suffix='.asm')
+    os.close(fd)
+    try:
+        write_program(filename, args.words)
+        for mode in ['OBJECTS', 'COMPACT']:
+            output = subprocess.check_output(
+                [sys.executable, os.path.abspath(__file__), '--child', mode, '--src', filename])
+            words, parse_time, second_pass_time, peak = output.split()
+            print '%-8s %6s words   parse %8.1f ms   second pass %8.1f ms   peak memory %7s KiB' %\
+                  (mode, words, float(parse_time) * 1000, float(second_pass_time) * 1000, peak)
+    finally:
+        os.remove(filename)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# ARSC ASSEMBLER BENCHMARK
+#
+# Times the PRETTY, MIF, HEX and BIN generators on large BSS/BSC programs, both when the
+# generated code is kept in memory and when it is written to a buffered file
+# sink, and checks that both produce the same output. The time per word should
+# stay flat as the program grows.
+# Usage: python generator_bench.py [-w MAX_WORDS]
+#
+import os
+import sys
+import time
+import random
+import tempfile
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from asm_parser import AsmParser
+from compiler_engine import FirstPassDriver, SecondPassDriver
+from code_generator import PrettyGenerator, MifGenerator, HexGenerator, BinaryGenerator
+
+def write_program(filename, words):
+    rnd = random.Random(words)
+    with open(filename, 'w') as src_file:
+        src_file.write('    LDA 0\n    HLT\n')
+        remaining = words - 2
+        i = 0
+        while remaining > 0:
+            count = min(remaining, 64)
+            if i % 2 == 0:
+                src_file.write('BUFFER_%d BSS %d\n' % (i, count))
+            else:
+                src_file.write('TABLE_%d BSC %s\n' % (
+                    i, ', '.join(str(rnd.randint(-32768, 32767)) for j in range(0, count))))
+            remaining -= count
+            i += 1
+        src_file.write('END\n')
+
+def generate(parser, sym_tbl, generator_class, sink):
+    generator = generator_class(sink)
+    start = time.time()
+    parser.iterate(SecondPassDriver(sym_tbl, tuple([generator])))
+    if sink is None:
+        generator.get_generated_code()
+    return time.time() - start
+
+def main():
+    arg_parser = ArgumentParser(description='PRETTY, MIF, HEX and BIN generator benchmark.')
+    arg_parser.add_argument('-w', '--words', type=int, default=65536,
+                            help='Size of the largest generated program in 16-bit words.')
+    args = arg_parser.parse_args()
+
+    fd, src_filename = tempfile.mkstemp(suffix='.asm')
+    os.close(fd)
+    fd, dest_filename = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        words = 1024
+        while words <= args.words:
+            write_program(src_filename, words)
+            parser = AsmParser(src_filename)
+            first_pass_driver = FirstPassDriver()
+            parser.parse(first_pass_driver)
+            sym_tbl = first_pass_driver.get_symbol_table()
+
+            for generator_class in [PrettyGenerator, MifGenerator, HexGenerator, BinaryGenerator]:
+                mode = 'b' if generator_class is BinaryGenerator else ''
+                memory_time = generate(parser, sym_tbl, generator_class, None)
+                with open(dest_filename, 'w' + mode, 1 << 16) as dest_file:
+                    sink_time = generate(parser, sym_tbl, generator_class, dest_file)
+
+                generator = generator_class()
+                parser.iterate(SecondPassDriver(sym_tbl, tuple([generator])))
+                with open(dest_filename, 'r' + mode) as dest_file:
+                    if dest_file.read() != str(generator.get_generated_code()):
+                        raise RuntimeError('sink output differs from the in-memory output')
+
+                print '%-16s %6d words   memory %8.1f ms (%5.2f us/word)   sink %8.1f ms (%5.2f us/word)' %\
+                      (generator_class.__name__, words, memory_time * 1000, memory_time * 1e6 / words,
+                       sink_time * 1000, sink_time * 1e6 / words)
+            words *= 4
+    finally:
+        os.remove(src_filename)
+        os.remove(dest_filename)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# ARSC ASSEMBLER BENCHMARK
+#
+# Generates synthetic ARSC assembly programs of the given size (in 16-bit words).
+# The programs mix one-address, branch, index, I/O and zero-address instructions
+# using direct, indexed, indirect and pre-indexed indirect operands, labels, ALIAS
+# expressions and large BSS/BSC blocks, and always assemble without errors.
+# Usage: python program_generator.py WORDS output.asm
+#
+import random
+from argparse import ArgumentParser
+
+ONE_ADDRESS = ['LDA', 'STA', 'ADD', 'AND', 'OR', 'XOR']
+BRANCHES = ['BRU', 'BIP', 'BIN']
+ZERO_ADDRESS = ['TCA', 'SHL', 'SHR']
+VARIABLE_COUNT = 24
+POINTER_COUNT = 8
+LABEL_SPACING = 8
+
+# Returns the list of source lines of a program that assembles to 'words' words
+# (at least 64)
+def generate_program(words, seed=None):
+    if words < 64:
+        raise ValueError('the program must be at least 64 words long')
+
+    rnd = random.Random(words if seed is None else seed)
+    code_words = max(32, words / 4)
+    lines = []
+
+    # Only the labels within the direct-address window may be branched to
+    labels = ['L_%d' % i for i in range(0, min(code_words, 256) / LABEL_SPACING)]
+    variables = ['V_%d' % i for i in range(0, VARIABLE_COUNT)]
+    pointers = ['P_%d' % i for i in range(0, POINTER_COUNT)]
+    index = lambda: rnd.choice(['1', '2', '3'])
+
+    for addr in range(0, code_words - 1):
+        if addr % LABEL_SPACING == 0:
+            lines.append('L_%d:' % (addr / LABEL_SPACING))
+
+        kind = rnd.random()
+        if kind < 0.55:
+            operand = rnd.choice([
+                rnd.choice(variables)
+                , rnd.choice(variables) + ',' + index()
+                , '*' + rnd.choice(pointers)
+                , '*' + rnd.choice(pointers) + ',' + index()
+                , rnd.choice(['V_ALIAS_%d' % i for i in range(0, 4)])
+                , str(rnd.randint(0, 255))])
+            lines.append('    %s %s' % (rnd.choice(ONE_ADDRESS), operand))
+        elif kind < 0.7:
+            target = rnd.choice([rnd.choice(labels), '*' + rnd.choice(pointers)])
+            lines.append('    %s %s' % (rnd.choice(BRANCHES), target))
+        elif kind < 0.82:
+            mnemonic = rnd.choice(['LDX', 'STX', 'TIX', 'TDX'])
+            operand = rnd.choice(variables) if mnemonic in ['LDX', 'STX'] else rnd.choice(labels)
+            lines.append('    %s %s,%s' % (mnemonic, operand, index()))
+        elif kind < 0.9:
+            lines.append('    %s {%d} %s' % (rnd.choice(['RWD', 'WWD']), rnd.randint(0, 1), rnd.choice(variables)))
+        else:
+            lines.append('    %s    // %s' % (rnd.choice(ZERO_ADDRESS), 'zero-address instruction'))
+    lines.append('    HLT')
+
+    # Variables and pointers go right after the code if they fit the direct-address
+    # window; otherwise they are aliased to the top of the window
+    if code_words + VARIABLE_COUNT + POINTER_COUNT <= 256:
+        for variable in variables:
+            lines.append('%s BSS 1' % variable)
+        for pointer in pointers:
+            lines.append('%s BSC %d' % (pointer, rnd.randint(256, 65535 / 2)))
+        data_words = words - code_words - VARIABLE_COUNT - POINTER_COUNT
+    else:
+        for i, symbol in enumerate(variables + pointers):
+            lines.append('%s ALIAS 0x%x' % (symbol, 256 - VARIABLE_COUNT - POINTER_COUNT + i))
+        data_words = words - code_words
+
+    for i in range(0, 4):
+        lines.append('V_ALIAS_%d ALIAS V_0 + %d' % (i, i))
+
+    i = 0
+    while data_words > 0:
+        if i % 2 == 0:
+            count = min(data_words, rnd.randint(16, 512))
+            lines.append('BUFFER_%d BSS %d' % (i, count))
+        else:
+            count = min(data_words, rnd.randint(8, 256))
+            lines.append('TABLE_%d BSC %s' % (
+                i, ', '.join(str(rnd.randint(-32768, 32767)) for j in range(0, count))))
+        data_words -= count
+        i += 1
+
+    lines.append('END')
+    return lines
+
+def write_program(filename, words, seed=None):
+    with open(filename, 'w') as src_file:
+        src_file.write('\n'.join(generate_program(words, seed)) + '\n')
+
+def main():
+    arg_parser = ArgumentParser(description='Synthetic ARSC program generator.')
+    arg_parser.add_argument('words', type=int, help='Size of the program in 16-bit words.')
+    arg_parser.add_argument('output_file', help='The generated source file.')
+    arg_parser.add_argument('--seed', type=int, default=None, help='Random seed.')
+    args = arg_parser.parse_args()
+    write_program(args.output_file, args.words, args.seed)
+
+if __name__ == '__main__':
+    main()
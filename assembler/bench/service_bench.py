@@ -0,0 +1,109 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# ARSC ASSEMBLER BENCHMARK
+#
+# Compares the request rate of the cold arsc_assembler.py launches with the
+# resident assembler service, both through the thin client (one process launch
+# per request) and through a persistent socket connection.
+# Usage: python service_bench.py [-n REQUESTS] [source.asm]
+#
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import subprocess
+from argparse import ArgumentParser
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+def time_launches(script, argv, count, env):
+    start = time.time()
+    for i in range(0, count):
+        subprocess.check_call([sys.executable, os.path.join(SRC_DIR, script)] + argv, env=env)
+    return time.time() - start
+
+def time_connection(argv, count, socket_path):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(socket_path)
+    conn_file = client.makefile('rw')
+    start = time.time()
+    for i in range(0, count):
+        conn_file.write(json.dumps(dict(argv=argv, cwd=os.getcwd())) + '\n')
+        conn_file.flush()
+        if json.loads(conn_file.readline())['status'] != 0:
+            raise RuntimeError('request failed')
+    elapsed = time.time() - start
+    conn_file.close()
+    client.close()
+    return elapsed
+
+def main():
+    arg_parser = ArgumentParser(description='Cold launch vs assembler service benchmark.')
+    arg_parser.add_argument('-n', '--requests', type=int, default=50, help='Number of requests.')
+    arg_parser.add_argument('source', nargs='?', help='Source to assemble.',
+                            default=os.path.join(SRC_DIR, '..', 'test', 'bouncing_square_test.asm'))
+    args = arg_parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    socket_path = os.path.join(tmp_dir, 'bench.sock')
+    argv = ['-f', 'MIF', os.path.abspath(args.source), os.path.join(tmp_dir, 'out.mif')]
+    env = dict(os.environ, ARSC_ASSEMBLER_SOCKET=socket_path)
+
+    server = subprocess.Popen([sys.executable, os.path.join(SRC_DIR, 'arsc_assembler_server.py'),
+                               '--socket', socket_path])
+    try:
+        while not os.path.exists(socket_path):
+            time.sleep(0.05)
+
+        results = [
+            ('cold launch', time_launches('arsc_assembler.py', argv, args.requests, env))
+            , ('client launch', time_launches('arsc_assembler_client.py', argv, args.requests, env))
+            , ('persistent connection', time_connection(argv, args.requests, socket_path))]
+
+        for name, elapsed in results:
+            print '%-24s %8.1f ms/request   %8.1f requests/s' %\
+                  (name, elapsed * 1000 / args.requests, args.requests / elapsed)
+    finally:
+        server.terminate()
+        server.wait()
+        for name in os.listdir(tmp_dir):
+            os.remove(os.path.join(tmp_dir, name))
+        os.rmdir(tmp_dir)
+
+if __name__ == '__main__':
+    main()
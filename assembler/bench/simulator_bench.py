@@ -0,0 +1,96 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# ARSC ASSEMBLER BENCHMARK
+#
+# Measures the speed of the ARSC instruction set simulator (simulated instructions
+# per second) on the sample programs from the test directory. The programs that
+# never halt (i.e. the bouncing square demos) are stopped after MAX_STEPS
+# instructions. Each program is run both by the interpreter and by the basic-block
+# translator (see block_translator.py); the translation time is included.
+# Usage: python simulator_bench.py [-n MAX_STEPS] [-r REPEAT]
+#
+import os
+import sys
+import glob
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from compiler_engine import CompilerEngine
+from isa_simulator import IsaSimulator, MemoryMappedDevice
+from block_translator import TranslatingSimulator
+
+def assemble(src_filename):
+    compiler = CompilerEngine(src_filename, None, 'BIN')
+    compiler.run()
+    return compiler.generators[0].words
+
+def simulate(simulator_class, image, max_steps):
+    simulator = simulator_class(image)
+    video_memory = MemoryMappedDevice(61440)
+    simulator.set_in_device(0, video_memory)
+    simulator.set_out_device(0, video_memory)
+    start = time.time()
+    steps = simulator.run(max_steps)
+    return steps, time.time() - start
+
+def main():
+    arg_parser = ArgumentParser(description='ARSC instruction set simulator benchmark.')
+    arg_parser.add_argument('-n', '--max-steps', type=int, default=1000000,
+                            help='Maximum number of instructions simulated per program.')
+    arg_parser.add_argument('-r', '--repeat', type=int, default=3,
+                            help='Number of runs per program (the best one is reported).')
+    args = arg_parser.parse_args()
+
+    bench_dir = os.path.dirname(os.path.abspath(__file__))
+    for src_filename in sorted(glob.glob(os.path.join(bench_dir, '..', 'test', '*.asm'))):
+        try:
+            image = assemble(src_filename)
+        except SyntaxError:
+            # Sources with (intentional) errors are not benchmarked
+            continue
+
+        for simulator_class in [IsaSimulator, TranslatingSimulator]:
+            steps, elapsed = min((simulate(simulator_class, image, args.max_steps)
+                                  for i in range(0, args.repeat)),
+                                 key=lambda result: result[1])
+            print '%-28s %-11s %9d instructions %9.1f ms %10.0f instructions/s' % (
+                os.path.splitext(os.path.basename(src_filename))[0],
+                'interpreted' if simulator_class is IsaSimulator else 'translated',
+                steps, elapsed * 1000, steps / elapsed if elapsed > 0 else 0)
+
+if __name__ == '__main__':
+    main()
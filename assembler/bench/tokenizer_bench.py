@@ -0,0 +1,95 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# ARSC ASSEMBLER BENCHMARK
+#
+# Compares the SCAN (character by character) and REGEX (single-pass) tokenizers
+# on long BSC constant tables and on the sample programs from the test directory.
+# Usage: python tokenizer_bench.py [-n CONSTANTS_PER_LINE] [-r REPEAT]
+#
+import os
+import sys
+import glob
+import random
+import timeit
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from asm_parser import StmtTokenizer, RegexStmtTokenizer
+
+def make_bsc_line(count):
+    rnd = random.Random(count)
+    return ('TABLE_%d BSC ' % count
+            + ', '.join(str(rnd.randint(-32768, 32767)) for i in range(0, count))
+            + '    // generated constant table')
+
+def tokenize(tokenizer_class, lines):
+    tokens = []
+    for line in lines:
+        tokenizer = tokenizer_class(line)
+        while tokenizer.has_more_tokens():
+            tokens.append(tokenizer.get_next_token())
+    return tokens
+
+def bench(name, lines, repeat):
+    if tokenize(StmtTokenizer, lines) != tokenize(RegexStmtTokenizer, lines):
+        raise RuntimeError('token streams differ for "%s"' % name)
+
+    scan = min(timeit.repeat(lambda: tokenize(StmtTokenizer, lines), number=1, repeat=repeat))
+    regex = min(timeit.repeat(lambda: tokenize(RegexStmtTokenizer, lines), number=1, repeat=repeat))
+    print '%-36s SCAN %10.3f ms   REGEX %10.3f ms   speedup %6.1fx' %\
+          (name, scan * 1000, regex * 1000, scan / regex)
+
+def main():
+    arg_parser = ArgumentParser(description='SCAN vs REGEX tokenizer benchmark.')
+    arg_parser.add_argument('-n', '--constants', type=int, default=4096,
+                            help='Number of constants in the longest BSC line.')
+    arg_parser.add_argument('-r', '--repeat', type=int, default=3,
+                            help='Number of timing runs (the best one is reported).')
+    args = arg_parser.parse_args()
+
+    count = 16
+    while count <= args.constants:
+        bench('BSC line, %d constants' % count, [make_bsc_line(count)], args.repeat)
+        count *= 4
+
+    test_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test')
+    for filename in sorted(glob.glob(os.path.join(test_dir, '*.asm'))):
+        with open(filename, 'r') as src_file:
+            lines = src_file.read().split('\n')
+        bench(os.path.basename(filename), lines, args.repeat)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# ARSC ASSEMBLER BENCHMARK
+#
+# Measures the decoding of the VGA video memory into RGB frames: the per-pixel
+# Python loop, the vectorized (NumPy) decoding of the whole frame and the export of
+# a frame sequence where only a few words change between the frames (as in the
+# bouncing square demos).
+# Usage: python video_bench.py [-f FRAMES] [-w WORDS]
+#
+import os
+import sys
+import time
+import random
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from video_memory import VideoMemory, VIDEO_MEMORY_SIZE, decode_words
+
+def measure(function, repeat=3):
+    best = None
+    for i in range(0, repeat):
+        start = time.time()
+        function()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    arg_parser = ArgumentParser(description='ARSC video memory decoding benchmark.')
+    arg_parser.add_argument('-f', '--frames', type=int, default=100,
+                            help='Number of frames of the exported sequence.')
+    arg_parser.add_argument('-w', '--words', type=int, default=50,
+                            help='Number of words written between the frames.')
+    args = arg_parser.parse_args()
+
+    video_memory = VideoMemory()
+    for address in range(0, VIDEO_MEMORY_SIZE):
+        video_memory.write(address, random.randrange(0, 0x8000))
+
+    elapsed = measure(lambda: decode_words(video_memory.words), 1)
+    print '%-24s %9.1f ms/frame' % ('per-pixel loop', elapsed * 1000)
+
+    elapsed = measure(video_memory.decode)
+    print '%-24s %9.1f ms/frame' % ('vectorized', elapsed * 1000)
+
+    def export_sequence():
+        for frame in range(0, args.frames):
+            for i in range(0, args.words):
+                video_memory.write(random.randrange(0, VIDEO_MEMORY_SIZE), random.randrange(0, 0x8000))
+            video_memory.get_frame()
+
+    elapsed = measure(export_sequence)
+    print '%-24s %9.1f ms/frame (%d frames, %d words written per frame)' % (
+        'dirty words only', elapsed * 1000 / args.frames, args.frames, args.words)
+
+if __name__ == '__main__':
+    main()
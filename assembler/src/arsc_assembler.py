@@ -35,14 +35,20 @@
 #
 # ARSC ASSEMBLER DRIVER
 #
-from compiler_engine import CompilerEngine
+from compiler_engine import CompilerEngine, get_peak_memory
+from compilation_cache import CompilationCache
+from cycle_model import CycleModel
+from profiler import profile_image
+from lookup_tables import get_table_report
 from argparse import ArgumentParser
 import sys
 
 def format_syntax_err(err):
     return '%s(%d): %s' % (err.filename, err.lineno, err.message)
 
-def main():
+# The argv (sys.argv[1:] if omitted) may be given so that the assembler can be
+# driven by the assembler service
+def main(argv=None):
     try:
         arg_parser = ArgumentParser(
             description='ARSC Assembler, Copyright (c) 2016-2017 Dzanan Bajgoric.'
@@ -56,9 +62,11 @@ def main():
             , help='Output file format. Possible options are: MIF (ASCII initialization'
                 + ' file), BIN (binary), HEX (ASCII HEX file - this is NOT an Intel-Format'
                 + ' .hex file) or PRETTY (human-readable output). If omitted,'
-                + ' MIF format is used.'
+                + ' MIF format is used. May be given several times to produce the code'
+                + ' in several formats from a single assembly run, in which case an'
+                + ' output file must be given for each format (in the same order).'
             , choices=['MIF', 'BIN', 'HEX', 'PRETTY']
-            , default='MIF')
+            , action='append')
 
         arg_parser.add_argument(
             '-d'
@@ -68,31 +76,218 @@ def main():
             , choices=['FILE', 'STD']
             , default='FILE')
 
+        arg_parser.add_argument(
+            '-l'
+            , '--lexer'
+            , help='Lexer used to tokenize the source: REGEX (default, single-pass'
+                + ' tokenizer based on precompiled patterns) or SCAN (character by'
+                + ' character tokenizer).'
+            , choices=['REGEX', 'SCAN']
+            , default='REGEX')
+
+        arg_parser.add_argument(
+            '-s'
+            , '--stream'
+            , help='Streaming mode: the source file is read lazily and re-read during'
+                + ' the second pass instead of being kept in memory. The peak memory'
+                + ' usage is reported on the standard error.'
+            , action='store_true')
+
+        arg_parser.add_argument(
+            '-c'
+            , '--compact'
+            , help='Keep the parsed statements in the compact, array-based representation'
+                + ' between the two passes (not with --stream or --single-pass).'
+            , action='store_true')
+
+        arg_parser.add_argument(
+            '--cycles'
+            , help='Annotate the PRETTY listing with the clock cycles of each instruction'
+                + ' (as sequenced by the hardwired control unit) and append the cycle'
+                + ' estimates of the basic blocks and loops.'
+            , action='store_true')
+
+        arg_parser.add_argument(
+            '--read-cycles'
+            , help='Clock cycles of a memory read used by --cycles (1 for the on-chip RAM).'
+            , type=int
+            , default=1)
+
+        arg_parser.add_argument(
+            '--write-cycles'
+            , help='Clock cycles of a memory write used by --cycles (1 for the on-chip RAM).'
+            , type=int
+            , default=1)
+
+        arg_parser.add_argument(
+            '--single-pass'
+            , help='Generate the code in a single pass over the source, patching the forward'
+                + ' references once the source has been parsed (BIN, HEX and MIF only).'
+            , action='store_true')
+
+        arg_parser.add_argument(
+            '-O'
+            , '--optimize'
+            , help='Apply the peephole optimizations (redundant loads, branches to the next'
+                + ' instruction and branch chains) and report the instructions and cycles saved.'
+            , action='store_true')
+
+        arg_parser.add_argument(
+            '--pool-constants'
+            , help='Merge the duplicate single-word BSC constants and use them for the equal'
+                + ' literal operands (i.e. LDA =1), saving the directly addressable low memory.'
+            , action='store_true')
+
+        arg_parser.add_argument(
+            '--layout'
+            , help='Lay out the data by the use counts of the symbols, placing the most used'
+                + ' scalars in the directly addressable window (0-255) and the arrays above'
+                + ' them, and print the address space utilization map.'
+            , action='store_true')
+
+        arg_parser.add_argument(
+            '--layout-profile'
+            , help='Count the uses of the data by simulating the program for the given number'
+                + ' of instructions instead of statically (implies --layout).'
+            , metavar='STEPS'
+            , type=int
+            , default=None)
+
+        arg_parser.add_argument(
+            '--far-pointers'
+            , help='Reach the symbols above the directly addressable window (0-255) indirectly'
+                + ' through generated pointer words in the window, and report the DEFER cycles'
+                + ' each rewritten instruction costs.'
+            , action='store_true')
+
+        arg_parser.add_argument(
+            '--regions'
+            , help='Report the memory regions declared by the REGION directives and the words'
+                + ' used in each of them.'
+            , action='store_true')
+
+        arg_parser.add_argument(
+            '--tables'
+            , help='Report the tables generated by the TABLE directives: their size, the instructions'
+                + ' looking them up and the estimated cycles saved per lookup over computing the entry.'
+            , action='store_true')
+
+        arg_parser.add_argument(
+            '--cache'
+            , help='Directory of the compilation cache. If the code for an unchanged source'
+                + ' is found in the cache, the source is not assembled again.'
+            , default=None)
+
+        arg_parser.add_argument(
+            '--cache-size'
+            , help='Size limit of the compilation cache in MiB (64 by default). The least'
+                + ' recently used entries are evicted once the limit is exceeded.'
+            , type=int
+            , default=64)
+
+        arg_parser.add_argument(
+            '--cache-stats'
+            , help='Report the compilation cache statistics on the standard error.'
+            , action='store_true')
+
+        arg_parser.add_argument(
+            '--stats'
+            , help='Report the per-phase wall/CPU times and the counters (lines, statements,'
+                + ' symbols, words, output bytes) on the standard error, either as a'
+                + ' human-readable table (TEXT, default) or as JSON.'
+            , nargs='?'
+            , choices=['TEXT', 'JSON']
+            , const='TEXT'
+            , default=None)
+
         arg_parser.add_argument(
             'input_file'
             , help='The source file containing the ARSC assembly program.')
 
         arg_parser.add_argument(
             'output_file'
-            , nargs='?'
-            , help='The output file where the generated code will be written to. It may'
-                + ' be omitted if -fmt is set to STD.'
-            , default=None)
+            , nargs='*'
+            , help='The output file(s) where the generated code will be written to, one'
+                + ' per output format. It may be omitted if -dst is set to STD.')
 
-        args = arg_parser.parse_args()
-        if args.output_file is None and args.dst != 'STD':
+        args = arg_parser.parse_args(argv)
+        if args.fmt is None:
+            args.fmt = ['MIF']
+        if args.dst != 'STD' and len(args.output_file) != len(args.fmt):
             arg_parser.print_usage()
-            raise RuntimeError('[output_file] must be specified if -dst is not set to STD')
+            raise RuntimeError('an [output_file] must be specified for each format if -dst is not set to STD')
+        elif args.dst == 'STD':
+            args.output_file = None
+
+        cache = None
+        if args.cache is not None:
+            cache = CompilationCache(args.cache, args.cache_size * 1024 * 1024)
+
+        cycle_model = None
+        if args.cycles:
+            cycle_model = CycleModel(args.read_cycles, args.write_cycles)
+
+        # The profile is taken on the image with the static layout, as the code is
+        # the same whatever the layout of the data
+        layout_profile = None
+        if args.layout_profile is not None:
+            profiled = CompilerEngine(args.input_file, None, 'BIN', args.lexer, compact=args.compact
+                , optimize=args.optimize, pool_constants=args.pool_constants, layout=True
+                , far_pointers=args.far_pointers)
+            profiled.run()
+            layout_profile = profile_image(profiled.generators[0].words, args.layout_profile)
+            # The profile is indexed by the instructions of the program (the
+            # pointers may precede them)
+            if profiled.far_addressing is not None:
+                layout_profile = layout_profile[profiled.far_addressing.code_offset:]
 
         # Run the compiler
-        compiler = CompilerEngine(args.input_file, args.output_file, args.fmt)
-        compiler.run()
+        compiler = CompilerEngine(args.input_file, args.output_file, args.fmt, args.lexer, args.stream
+            , args.compact, cache, stats=args.stats is not None, single_pass=args.single_pass
+            , cycle_model=cycle_model, optimize=args.optimize, pool_constants=args.pool_constants
+            , layout=args.layout, layout_profile=layout_profile, far_pointers=args.far_pointers)
 
         # Figure out what to do with the generated code
         if args.dst == 'FILE':
-            compiler.write()
+            compiler.run_to_file()
         elif args.dst == 'STD':
-            print compiler.get_code_pretty()
+            compiler.run()
+            for position in range(0, len(args.fmt)):
+                print compiler.get_code_pretty(position=position)
+
+        for warning in compiler.warnings:
+            sys.stderr.write('%s: warning: %s\n' % (args.input_file, warning))
+        if args.regions and compiler.memory_map is not None:
+            sys.stderr.write('%s\n' % compiler.memory_map)
+        if args.tables and len(compiler.lookup_tables) != 0:
+            sys.stderr.write('%s\n' % get_table_report(compiler.lookup_tables))
+
+        if compiler.constant_pool is not None:
+            sys.stderr.write('%s\n' % compiler.constant_pool)
+        if compiler.optimizer is not None:
+            sys.stderr.write('%s\n' % compiler.optimizer)
+        if compiler.constant_pool is not None or compiler.optimizer is not None:
+            sys.stderr.write('%d words saved, %d of the 256 directly addressable words free\n' % (
+                compiler.saved_words, max(0, 256 - compiler.word_count)))
+        if compiler.data_layout is not None:
+            sys.stderr.write('%s\n' % compiler.data_layout)
+        if compiler.far_addressing is not None:
+            sys.stderr.write('%s\n' % compiler.far_addressing)
+        if compiler.utilization_map is not None:
+            sys.stderr.write('%s\n' % compiler.utilization_map)
+
+        if args.stream:
+            peak_memory = get_peak_memory()
+            if peak_memory is not None:
+                sys.stderr.write('peak memory: %d KiB\n' % peak_memory)
+
+        if args.stats == 'TEXT':
+            sys.stderr.write('%s\n' % compiler.get_stats())
+        elif args.stats == 'JSON':
+            sys.stderr.write('%s\n' % compiler.get_stats().to_json())
+
+        if args.cache_stats and cache is not None:
+            sys.stderr.write('%s\n' % cache)
 
     except SyntaxError as err:
         print format_syntax_err(err)
@@ -101,5 +296,3 @@ def main():
 
 if __name__ == '__main__':
     main()
-else:
-    raise RuntimeError('arsc_assembler.py must be executed via the terminal')
\ No newline at end of file
@@ -0,0 +1,91 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#
+# ARSC ASSEMBLER CLIENT
+#
+# Drop-in replacement for arsc_assembler.py that forwards the invocation to the
+# resident assembler service (see arsc_assembler_server.py). Imports only what is
+# needed to talk to the service; if the service is not running, the assembler is
+# run in-process instead.
+#
+import os
+import sys
+import json
+import socket
+
+# The default socket is kept in a per-user directory (created by the server with
+# the 0700 permissions) so that the other users can't reach the service
+def get_default_socket_path():
+    return os.environ.get(
+        'ARSC_ASSEMBLER_SOCKET'
+        , os.path.join(os.environ.get('TMPDIR', '/tmp'), 'arsc_assembler-%d' % os.getuid(), 'arsc_assembler.sock'))
+
+# Sends the request to the service and returns the response, or None if the
+# service can't be reached
+def send_request(argv, socket_path):
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except socket.error:
+        client.close()
+        return None
+
+    try:
+        conn_file = client.makefile('rw')
+        conn_file.write(json.dumps(dict(argv=argv, cwd=os.getcwd())) + '\n')
+        conn_file.flush()
+        response = json.loads(conn_file.readline())
+        conn_file.close()
+        return response
+    finally:
+        client.close()
+
+def main():
+    response = send_request(sys.argv[1:], get_default_socket_path())
+    if response is None:
+        import arsc_assembler
+        arsc_assembler.main()
+        return
+
+    sys.stdout.write(response['stdout'].encode('utf-8'))
+    sys.stderr.write(response['stderr'].encode('utf-8'))
+    sys.exit(response['status'])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#
+# ARSC ASSEMBLER SERVER DRIVER
+#
+from assembler_service import AssemblerService
+from arsc_assembler_client import get_default_socket_path
+from argparse import ArgumentParser
+import sys
+
+def main():
+    arg_parser = ArgumentParser(
+        description='ARSC Assembler Server, Copyright (c) 2016-2017 Dzanan Bajgoric.'
+            + ' All Rights Reserved. Keeps the ARSC assembler loaded and serves the'
+            + ' assembly requests sent by arsc_assembler_client.py (over a Unix domain'
+            + ' socket) or written to its standard input, one JSON request per line.')
+
+    arg_parser.add_argument(
+        '--socket'
+        , help='Path of the Unix domain socket to listen on. Defaults to the'
+            + ' ARSC_ASSEMBLER_SOCKET environment variable or $TMPDIR/arsc_assembler-UID/arsc_assembler.sock.'
+        , default=None)
+
+    arg_parser.add_argument(
+        '--stdio'
+        , help='Serve the requests read from the standard input instead of the socket.'
+        , action='store_true')
+
+    args = arg_parser.parse_args()
+    service = AssemblerService()
+    if args.stdio:
+        service.serve_stream(sys.stdin, sys.stdout)
+    else:
+        try:
+            service.serve_unix(args.socket if args.socket is not None else get_default_socket_path())
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == '__main__':
+    main()
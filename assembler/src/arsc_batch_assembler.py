@@ -0,0 +1,131 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#
+# ARSC BATCH ASSEMBLER DRIVER
+#
+from batch_engine import BatchAssembler
+from compilation_cache import CompilationCache
+from argparse import ArgumentParser
+import sys
+
+def main():
+    arg_parser = ArgumentParser(
+        description='ARSC Batch Assembler, Copyright (c) 2016-2017 Dzanan Bajgoric.'
+            + ' All Rights Reserved. Assembles many ARSC assembly programs using a pool'
+            + ' of worker processes.')
+
+    arg_parser.add_argument(
+        '-f'
+        , '--fmt'
+        , help='Output file format: MIF, BIN, HEX or PRETTY. May be given several times.'
+            + ' If omitted, MIF format is used.'
+        , choices=['MIF', 'BIN', 'HEX', 'PRETTY']
+        , action='append')
+
+    arg_parser.add_argument(
+        '-o'
+        , '--out-dir'
+        , help='Directory where the generated files are written to, mirroring the paths of'
+            + ' the sources relative to their common directory. If omitted, each generated'
+            + ' file is written next to its source file.'
+        , default=None)
+
+    arg_parser.add_argument(
+        '-j'
+        , '--jobs'
+        , help='Number of worker processes. Defaults to the number of CPUs.'
+        , type=int
+        , default=None)
+
+    arg_parser.add_argument(
+        '-l'
+        , '--lexer'
+        , help='Lexer used to tokenize the sources: REGEX (default) or SCAN.'
+        , choices=['REGEX', 'SCAN']
+        , default='REGEX')
+
+    arg_parser.add_argument(
+        '-c'
+        , '--compact'
+        , help='Keep the parsed statements in the compact, array-based representation.'
+        , action='store_true')
+
+    arg_parser.add_argument(
+        '--cache'
+        , help='Directory of the compilation cache shared by the worker processes.'
+        , default=None)
+
+    arg_parser.add_argument(
+        '--cache-size'
+        , help='Size limit of the compilation cache in MiB (64 by default).'
+        , type=int
+        , default=64)
+
+    arg_parser.add_argument(
+        '-q'
+        , '--quiet'
+        , help='Report only the failed source files and the summary.'
+        , action='store_true')
+
+    arg_parser.add_argument(
+        'inputs'
+        , nargs='+'
+        , help='Source files, directories (all .asm files within) or glob patterns.')
+
+    args = arg_parser.parse_args()
+    if args.fmt is None:
+        args.fmt = ['MIF']
+
+    def report(result):
+        if result['error'] is not None:
+            print result['error']
+        elif not args.quiet:
+            print '%s: %d words' % (result['src'], result['words'])
+
+    cache = None
+    if args.cache is not None:
+        cache = CompilationCache(args.cache, args.cache_size * 1024 * 1024)
+
+    batch = BatchAssembler(args.inputs, args.out_dir, args.fmt, args.jobs,
+                           lexer=args.lexer, compact=args.compact, cache=cache)
+    batch.run(report)
+    print batch.get_summary()
+
+    if batch.get_failed_count() != 0:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
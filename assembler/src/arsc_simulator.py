@@ -0,0 +1,246 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#
+# ARSC INSTRUCTION SET SIMULATOR DRIVER
+#
+from compiler_engine import CompilerEngine
+from isa_simulator import IsaSimulator, MemoryMappedDevice, QueueInputDevice, load_image_file
+from block_translator import TranslatingSimulator
+from video_memory import VideoMemory, VIDEO_MEMORY_SIZE
+from profiler import ProfilingSimulator, Profile, build_source_map
+from memory_timing import LatencySimulator, MemoryTiming, SdramTiming
+from memory_regions import MEMORY_KINDS
+from arsc_assembler import format_syntax_err
+from argparse import ArgumentParser
+import os
+import sys
+import time
+
+# Returns the memory image, the symbol table and the memory regions (both None
+# unless the program is assembled from the source) of the program
+def load_program(filename):
+    if os.path.splitext(filename)[1].lower() in ['.bin', '.hex', '.mif']:
+        return load_image_file(filename), None, None
+
+    compiler = CompilerEngine(filename, None, 'BIN')
+    compiler.run()
+    return compiler.generators[0].words, compiler.get_symbol_table(), compiler.memory_map
+
+# Parses the SDRAM timing READ,WRITE,ACTIVATE,PRECHARGE (in clock cycles)
+def parse_sdram_cycles(sdram_cycles):
+    try:
+        cycles = [int(value, 0) for value in sdram_cycles.split(',')]
+    except ValueError:
+        cycles = []
+    if len(cycles) != 4 or min(cycles) < 0:
+        raise ValueError('invalid SDRAM timing "%s" (expected READ,WRITE,ACTIVATE,PRECHARGE)' % sdram_cycles)
+    return SdramTiming(*cycles)
+
+# Resolves the memory dump specification SYMBOL|ADDRESS[:COUNT]
+def parse_dump(dump, sym_tbl):
+    location, _, count = dump.partition(':')
+    count = int(count, 0) if count else 1
+    if sym_tbl is not None and sym_tbl.contains(location):
+        return sym_tbl.get_address(location), count
+    try:
+        return int(location, 0), count
+    except ValueError:
+        raise ValueError('unknown symbol or address "%s"' % location)
+
+def main(argv=None):
+    try:
+        arg_parser = ArgumentParser(
+            description='ARSC instruction set simulator. Runs an ARSC program (an assembly'
+                + ' source, or a BIN, HEX or MIF image produced by the ARSC assembler)'
+                + ' and reports the final state of the CPU and the simulation speed.')
+
+        arg_parser.add_argument(
+            '-n'
+            , '--max-steps'
+            , help='Maximum number of instructions to execute (the programs that never'
+                + ' reach HLT are stopped after that many instructions).'
+            , type=int
+            , default=10000000)
+
+        arg_parser.add_argument(
+            '-d'
+            , '--dump'
+            , help='Dump the memory words at SYMBOL|ADDRESS[:COUNT] once the simulation'
+                + ' is over (symbols are available for the assembly sources only).'
+            , action='append'
+            , default=[])
+
+        arg_parser.add_argument(
+            '-k'
+            , '--keys'
+            , help='Comma-separated words to be read from the keyboard (input device 1).'
+            , default='')
+
+        arg_parser.add_argument(
+            '-t'
+            , '--translate'
+            , help='Translate the basic blocks of the program into Python functions'
+                + ' instead of interpreting it instruction by instruction.'
+            , action='store_true')
+
+        arg_parser.add_argument(
+            '--frames'
+            , help='Export the VGA screen as a sequence of PPM images, named after the'
+                + ' printf-style PATTERN with the frame number (i.e. frame%%04d.ppm).'
+                + ' Requires NumPy.'
+            , metavar='PATTERN')
+
+        arg_parser.add_argument(
+            '--frame-steps'
+            , help='Number of instructions between the exported frames.'
+            , type=int
+            , default=100000)
+
+        arg_parser.add_argument(
+            '-p'
+            , '--profile'
+            , help='Count the executions, clock cycles and I/O operations of each instruction'
+                + ' and report the TOP instructions with the most cycles (interpreted only).'
+            , action='store_true')
+
+        arg_parser.add_argument(
+            '--top'
+            , help='Number of instructions in the profile report.'
+            , type=int
+            , default=10)
+
+        arg_parser.add_argument(
+            '--listing'
+            , help='Write the source listing annotated with the profile to the file'
+                + ' (assembly sources only, implies --profile).')
+
+        arg_parser.add_argument(
+            '-m'
+            , '--memory-timing'
+            , help='Model the memory latency: count the fetches, DEFER reads and operand reads/writes'
+                + ' per memory region and report the clock cycles, the cycles stalled waiting for the'
+                + ' memory and the estimated run time (interpreted only).'
+            , action='store_true')
+
+        arg_parser.add_argument(
+            '--memory'
+            , help='Kind of the memory outside of the regions declared by the REGION directives (the'
+                + ' whole memory for the images). Implies --memory-timing.'
+            , choices=MEMORY_KINDS)
+
+        arg_parser.add_argument(
+            '--sdram-cycles'
+            , help='SDRAM timing as READ,WRITE,ACTIVATE,PRECHARGE clock cycles: an access to the open'
+                + ' row takes READ or WRITE cycles, opening a row ACTIVATE more and closing the open row'
+                + ' PRECHARGE more. Implies --memory-timing.'
+            , metavar='CYCLES')
+
+        arg_parser.add_argument(
+            'program'
+            , help='The ARSC assembly source (.asm) or the .bin, .hex or .mif image.')
+
+        args = arg_parser.parse_args(argv)
+        args.profile = args.profile or args.listing is not None
+        args.memory_timing = args.memory_timing or args.memory is not None or args.sdram_cycles is not None
+        if args.profile and args.translate:
+            arg_parser.error('--profile cannot be combined with --translate')
+        if args.memory_timing and (args.profile or args.translate):
+            arg_parser.error('--memory-timing cannot be combined with --profile or --translate')
+        image, sym_tbl, memory_map = load_program(args.program)
+        dumps = [parse_dump(dump, sym_tbl) for dump in args.dump]
+
+        if args.profile:
+            simulator = ProfilingSimulator(image)
+        elif args.memory_timing:
+            sdram_timing = parse_sdram_cycles(args.sdram_cycles) if args.sdram_cycles is not None else None
+            simulator = LatencySimulator(image, MemoryTiming(memory_map, args.memory or 'ONCHIP', sdram_timing))
+        elif args.translate:
+            simulator = TranslatingSimulator(image)
+        else:
+            simulator = IsaSimulator(image)
+        video_memory = VideoMemory() if args.frames is not None else MemoryMappedDevice(VIDEO_MEMORY_SIZE)
+        simulator.set_in_device(0, video_memory)
+        simulator.set_out_device(0, video_memory)
+        simulator.set_in_device(1, QueueInputDevice(int(key, 0) for key in args.keys.split(',') if key))
+
+        start = time.time()
+        if args.frames is None:
+            steps = simulator.run(args.max_steps)
+        else:
+            steps = 0
+            while steps < args.max_steps and not simulator.halted:
+                steps += simulator.run(min(args.frame_steps, args.max_steps - steps))
+                video_memory.write_frame(args.frames % video_memory.frame_count)
+        elapsed = time.time() - start
+
+        print simulator
+        if simulator.halted:
+            print 'halted after %d instructions' % steps
+        else:
+            print 'stopped after %d instructions (HLT not reached)' % steps
+        print 'video memory: %d reads, %d writes' % (video_memory.read_count, video_memory.write_count)
+        if args.frames is not None:
+            print 'frames: %d exported, %d words decoded in %.3f s' % (
+                video_memory.frame_count, video_memory.decoded_words, video_memory.decode_time)
+        if args.translate:
+            print 'translated blocks: %d translations, %d invalidations' % (
+                simulator.translation_count, simulator.invalidation_count)
+        for address, count in dumps:
+            for i in range(address, min(address + count, IsaSimulator.MEMORY_SIZE)):
+                word = simulator.memory[i]
+                print '0x%04x:\t%04x\t%d' % (i, word, word - ((word & 0x8000) << 1))
+        sys.stderr.write('%.3f s, %.0f instructions/s\n' % (elapsed, steps / elapsed if elapsed > 0 else 0))
+
+        if args.memory_timing:
+            print
+            print simulator.timing.get_report(),
+
+        if args.profile:
+            source_map, src_lines = build_source_map(args.program) if sym_tbl is not None else (None, None)
+            profile = Profile(simulator, source_map, src_lines)
+            print
+            print profile.get_top_report(args.top),
+            if args.listing is not None:
+                if src_lines is None:
+                    raise ValueError('the annotated listing requires the assembly source')
+                with open(args.listing, 'w') as listing_file:
+                    listing_file.write(profile.get_listing())
+
+    except SyntaxError as err:
+        print format_syntax_err(err)
+
+if __name__ == '__main__':
+    main()
@@ -36,7 +36,17 @@
 # PART OF THE ARSC ASSEMBLER
 #
 import os
-from asm_stmt import DirectiveType, ISA, DIRS, AsmInstruction, AsmDirective, AsmLabel
+import re
+import time
+from compiler_stats import get_cpu_time
+from asm_stmt import DirectiveType, ISA, DIRS, AsmInstruction, AsmDirective, AsmLabel, CompactStatements
+from symbol_table import SymbolTable
+
+# The statements are parsed as byte strings, hence the unicode source (or its
+# line) is encoded in UTF-8
+def encode_source(source):
+    return source.encode('utf-8') if isinstance(source, unicode) else source
+
 
 # An observer for the parsing events
 class AsmParserObserver:
@@ -48,6 +58,14 @@ class AsmParserObserver:
         raise NotImplementedError
     def on_finished(self):
         raise NotImplementedError
+    # Optional fast path used by 'iterate' in the compact mode. An observer that
+    # consumes the CompactStatements columns directly returns True
+    def on_compact_statements(self, statements):
+        return False
+    # Optional SymbolTable in which 'parse' interns the symbolic addresses of the
+    # instructions (AsmInstruction.SymbolId). A private table is used if None
+    def get_symbol_table(self):
+        return None
 
 
 class StmtTokenizer:
@@ -89,10 +107,54 @@ class StmtTokenizer:
         return token
 
 
+# Tokenizes the statement in a single pass using a precompiled pattern. The whole
+# token stream is produced up front and the tokens are then handed out by moving
+# an offset, so the line is never re-sliced. Produces the same token stream as the
+# StmtTokenizer
+class RegexStmtTokenizer:
+    TOKEN_RE = re.compile(r'[*,:+\-{}]|[^\s*,:+\-{}]+')
+
+    def __init__(self, stmt):
+        self.org_stmt = stmt
+        # Everything following the '//' is a comment
+        end = stmt.find('//')
+        if end == -1:
+            self.tokens = self.TOKEN_RE.findall(stmt)
+        else:
+            self.tokens = self.TOKEN_RE.findall(stmt, 0, end)
+        self.pos = 0
+
+    def get_stmt(self):
+        return self.org_stmt
+
+    def has_more_tokens(self):
+        return self.pos < len(self.tokens)
+
+    def get_next_token(self):
+        if self.pos >= len(self.tokens):
+            raise RuntimeError('no more tokens')
+
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+
+# Supported lexer modes
+LEXERS = dict(
+    SCAN        = StmtTokenizer
+    , REGEX     = RegexStmtTokenizer
+)
+
+
 # Parses the ARSC assembly source file and for each instruction and
 # assembler directive it invokes the proper method of the registered
 # observer. The parsing results are caches so that the parser may be
-# re-used to iterate over the parsed statements
+# re-used to iterate over the parsed statements. In the streaming mode
+# neither the source nor the parsed statements are kept in memory: the
+# source file is read lazily, line by line, and 'iterate' re-streams it
+# up to the line where the parsing process has stopped. In the compact
+# mode the parsed statements are kept in the CompactStatements columns
+# and the source lines are released once the parsing is done
 class AsmParser:
 
     CommandType = type('CommandType'
@@ -100,15 +162,49 @@ class AsmParser:
                        , dict(INSTRUCTION = 0, LABEL = 1, DIRECTIVE = 2))
 
     # The filename can be either an absolute or relative path to the
-    # source file
-    def __init__(self, filename):
+    # source file. The lexer selects the tokenizer used to split the
+    # statements (see LEXERS). If the source is given (a string, a list
+    # of lines or a file-like object) it is parsed instead of the file,
+    # and the filename is only used as a virtual name in the diagnostics
+    def __init__(self, filename, lexer='REGEX', streaming=False, compact=False, source=None):
+        if lexer not in LEXERS:
+            raise ValueError('unknown lexer "%s"' % lexer)
+
+        self.tokenizer_class = LEXERS[lexer]
+        self.filename = filename
+        self.streaming = streaming
+        self.compact = compact
+        self.statements = []
+        self.sym_tbl = SymbolTable()
+        self.last_lineno = 0
+        self.parsed = False
+        self.source = None
+        # CompilerStats that collects the statement counters and the tokenizing
+        # time of the 'parse' (if set)
+        self.stats = None
+        self.tokenize_time = (0.0, 0.0)
+        if source is not None:
+            self.abs_path = filename
+            if isinstance(source, basestring):
+                self.src_lines = encode_source(source).split('\n')
+            elif isinstance(source, (list, tuple)):
+                self.src_lines = [encode_source(line).rstrip('\n') for line in source]
+            elif streaming:
+                # File-like object; must be seekable to be re-streamed
+                self.source = source
+            else:
+                self.src_lines = encode_source(source.read()).split('\n')
+
+            if self.source is None:
+                # Nothing to re-stream, the lines are already in memory
+                self.streaming = False
+            return
+
         try:
             with open(filename, 'r') as src_file:
-                str = src_file.read()
                 self.abs_path = os.path.abspath(filename)
-                self.src_lines = str.split('\n')
-                self.statements = []
-                self.parsed = False
+                if not streaming:
+                    self.src_lines = src_file.read().split('\n')
         except IOError:
             raise IOError('Failed to open/read the source file "%s"' % filename)
 
@@ -122,30 +218,109 @@ class AsmParser:
             return observer.on_label(stmt)
 
 
-    # Kick-start the parsing process. This method may be used only if parsing has not been
-    # completed yet. To iterate over the already parsed statements use the 'iterate' method
-    def parse(self, observer):
-        if isinstance(observer, AsmParserObserver) != True:
-            raise TypeError('observer must be an instance of ParserObserver')
-        elif self.parsed:
-            raise RuntimeError('the parsing process has already been completed')
+    # Generator over the source lines. In the streaming mode lines are read
+    # lazily from the source file
+    def read_lines(self):
+        if not self.streaming:
+            for line in self.src_lines:
+                yield line
+            return
 
+        if self.source is not None:
+            self.source.seek(0)
+            for line in self.source:
+                yield encode_source(line).rstrip('\n')
+            return
+
+        try:
+            with open(self.filename, 'r') as src_file:
+                for line in src_file:
+                    yield line.rstrip('\n')
+        except IOError:
+            raise IOError('Failed to open/read the source file "%s"' % self.filename)
+
+
+    # Generator over the (stmt, lineno) pairs for each non-empty source line.
+    # The lineno of the last line read is kept in 'last_lineno'
+    def read_statements(self, max_lineno=None):
         lineno = 0
-        for line in self.src_lines:
+        for line in self.read_lines():
+            if max_lineno is not None and lineno == max_lineno:
+                break
+
             lineno += 1
-            tokenizer = StmtTokenizer(line)
+            self.last_lineno = lineno
+            tokenizer = self.tokenizer_class(line)
             if not tokenizer.has_more_tokens():
                 continue
 
             try:
                 token = tokenizer.get_next_token()
-                stmt = None
                 if ISA.has_key(token):
                     stmt = self.parse_instruction(token, tokenizer, line)
+                    if not stmt.HasAbsoluteAddress:
+                        stmt.SymbolId = self.sym_tbl.get_id(stmt.Address)
                 else:
                     stmt = self.parse_directive_or_label(token, tokenizer)
 
-                self.statements.append(dict(stmt=stmt, lineno=lineno))
+            except SyntaxError as err:
+                err.lineno = lineno
+                err.filename = self.abs_path
+                raise err
+
+            yield stmt, lineno
+
+
+    # Same as 'read_statements', but measures the time spent on reading, tokenizing and
+    # building the statements (kept in 'tokenize_time') and counts the statements
+    def read_statements_timed(self):
+        wall_time, cpu_time = 0.0, 0.0
+        statements = self.read_statements()
+        while True:
+            wall, cpu = time.time(), get_cpu_time()
+            try:
+                stmt, lineno = next(statements)
+            except StopIteration:
+                break
+            finally:
+                wall_time += time.time() - wall
+                cpu_time += get_cpu_time() - cpu
+                self.tokenize_time = (wall_time, cpu_time)
+
+            if isinstance(stmt, AsmInstruction):
+                self.stats.count('stmt_instruction')
+            elif isinstance(stmt, AsmLabel):
+                self.stats.count('stmt_label')
+            else:
+                self.stats.count('stmt_' + stmt.Directive.lower())
+            yield stmt, lineno
+
+
+    # Kick-start the parsing process. This method may be used only if parsing has not been
+    # completed yet. To iterate over the already parsed statements use the 'iterate' method
+    def parse(self, observer):
+        if isinstance(observer, AsmParserObserver) != True:
+            raise TypeError('observer must be an instance of ParserObserver')
+        elif self.parsed:
+            raise RuntimeError('the parsing process has already been completed')
+
+        self.last_lineno = 0
+        sym_tbl = observer.get_symbol_table()
+        if sym_tbl is not None:
+            self.sym_tbl = sym_tbl
+        if self.compact:
+            self.statements = CompactStatements(self.sym_tbl)
+
+        statements = self.read_statements() if self.stats is None else self.read_statements_timed()
+        for stmt, lineno in statements:
+            try:
+                if self.streaming:
+                    pass
+                elif self.compact:
+                    self.statements.append(stmt, lineno)
+                else:
+                    self.statements.append(dict(stmt=stmt, lineno=lineno))
+
                 if not self.invoke_observer_method(observer, stmt):
                     break
 
@@ -156,11 +331,17 @@ class AsmParser:
 
             self.parsed = True
 
+        # Iteration stops here in the streaming mode
+        self.parsed_lineno = self.last_lineno
+        if self.compact and not self.streaming:
+            self.src_lines = None
+
         try:
             # Inform the observer that parsing has been completed
             observer.on_finished()
         except SyntaxError as err:
-            err.lineno = lineno
+            if err.lineno is None:
+                err.lineno = self.last_lineno
             err.filename = self.abs_path
             raise err
 
@@ -170,7 +351,23 @@ class AsmParser:
         elif not self.parsed:
             raise RuntimeError('the source has not been parsed yet')
 
-        for stmt_pair in self.statements:
+        if self.streaming:
+            stmt_pairs = (dict(stmt=stmt, lineno=lineno) for stmt, lineno in
+                          self.read_statements(self.parsed_lineno))
+        elif self.compact:
+            try:
+                if observer.on_compact_statements(self.statements):
+                    observer.on_finished()
+                    return
+            except SyntaxError as err:
+                err.filename = self.abs_path
+                raise err
+
+            stmt_pairs = (dict(stmt=stmt, lineno=lineno) for stmt, lineno in self.statements)
+        else:
+            stmt_pairs = self.statements
+
+        for stmt_pair in stmt_pairs:
             try:
                 if not self.invoke_observer_method(observer, stmt_pair['stmt']):
                     break
@@ -183,6 +380,26 @@ class AsmParser:
         # Iteration completed
         observer.on_finished()
 
+    # Generator over the (stmt, lineno) pairs of the parsed statements
+    def get_statements(self):
+        if self.streaming:
+            raise RuntimeError('the statements are not kept in the streaming mode')
+        elif self.compact:
+            return iter(self.statements)
+        return ((stmt_pair['stmt'], stmt_pair['lineno']) for stmt_pair in self.statements)
+
+    # Replaces the parsed statements with the given (stmt, lineno) pairs (i.e. the
+    # output of an optimization pass) to be passed to the next 'iterate'
+    def replace_statements(self, stmt_pairs):
+        if self.streaming:
+            raise RuntimeError('the statements are not kept in the streaming mode')
+        elif self.compact:
+            self.statements = CompactStatements(self.sym_tbl)
+            for stmt, lineno in stmt_pairs:
+                self.statements.append(stmt, lineno)
+        else:
+            self.statements = [dict(stmt=stmt, lineno=lineno) for stmt, lineno in stmt_pairs]
+
     def parse_instruction(self, mnemonic, tokenizer, original_stmt):
         indirect_or_iodev_bit = None
         address = None
@@ -191,7 +408,7 @@ class AsmParser:
         if tokenizer.has_more_tokens():
             token = tokenizer.get_next_token()
             if token == '*':
-                indirect_or_iodev_bit = 1
+                indirect_or_iodev_bit = '1'
                 if not tokenizer.has_more_tokens():
                     raise SyntaxError('address expected after "%s"' % token)
 
@@ -213,6 +430,10 @@ class AsmParser:
             else:
                 address = token
 
+            # The sign of a literal operand (i.e. =-1) is a separate token
+            while address in ['=', '=-', '=+'] and tokenizer.has_more_tokens():
+                address += tokenizer.get_next_token()
+
             if tokenizer.has_more_tokens():
                 token = tokenizer.get_next_token()
                 if token != ',':
@@ -270,6 +491,18 @@ class AsmParser:
                     token += tokenizer.get_next_token()
 
                 return AsmDirective('ALIAS', [first_token, token])
+            elif token == 'REGION':
+                token = ''
+                while tokenizer.has_more_tokens():
+                    token += tokenizer.get_next_token()
+
+                return AsmDirective('REGION', [first_token] + token.split(','))
+            elif token == 'TABLE':
+                token = ''
+                while tokenizer.has_more_tokens():
+                    token += tokenizer.get_next_token()
+
+                return AsmDirective('TABLE', [first_token] + token.split(',', 1))
             elif token == 'BSS':
                 if not tokenizer.has_more_tokens():
                     raise SyntaxError('incomplete command "%s"' % token)
@@ -37,6 +37,10 @@
 #
 
 import re
+from array import array
+from symbol_table import SymbolTable
+from memory_regions import MEMORY_KINDS
+from lookup_tables import generate_table
 
 # ARSC ISA along with the 5-bit opcode (stored as 1-byte, however most
 # significant 3 bits will not end up in the instruction)
@@ -65,15 +69,17 @@ ISA = dict(
 
 DirectiveType = type('DirectiveType'
                  , ()
-                 , dict(ANCHOR=0, ALIAS=1, BSS=2, BSC=3, END=4))
+                 , dict(ANCHOR=0, ALIAS=1, BSS=2, BSC=3, END=4, REGION=5))
 
-# Supported ARSC assembly directives
+# Supported ARSC assembly directives (TABLE is a BSC whose constants are generated)
 DIRS = dict(
     ANCHOR      = DirectiveType.ANCHOR
     , ALIAS     = DirectiveType.ALIAS
     , BSS       = DirectiveType.BSS
     , BSC       = DirectiveType.BSC
+    , TABLE     = DirectiveType.BSC
     , END       = DirectiveType.END
+    , REGION    = DirectiveType.REGION
 )
 
 
@@ -83,12 +89,61 @@ def is_valid_name(identifier):
     match = re.search('\A[a-zA-Z_][a-zA-Z_0-9]*\Z', identifier)
     return match is not None
 
+# Returns the symbol of the literal operand (i.e. =5 or =0xFFFF), normalized to the
+# signed 16-bit value of the literal so that the equal literals share the same
+# word of the literal pool
+def get_literal_symbol(literal):
+    try:
+        value = int(literal[1:], 0)
+    except ValueError:
+        raise SyntaxError('invalid literal "%s"' % literal)
+
+    if value < -32768 or value > 65535:
+        raise SyntaxError('literal "%s" is out of range [-32768, 65535]' % literal)
+
+    return '=%d' % (value - 65536 if value > 32767 else value)
+
+def is_literal_symbol(symbol):
+    return symbol[0] == '='
+
+# Creates the BSC directive of the literal pool word of the literal symbol (which is
+# not a valid identifier, hence the directive is not validated)
+def make_literal_directive(symbol):
+    stmt = AsmDirective.__new__(AsmDirective)
+    stmt.Directive = 'BSC'
+    stmt.DirType = DirectiveType.BSC
+    stmt.ConstantSymbol = symbol
+    stmt.Constants = [int(symbol[1:])]
+    return stmt
+
+# Returns the symbol of the pointer word holding the address of the symbol (used to
+# reach the symbols above the directly addressable window through indirection)
+def get_pointer_symbol(symbol):
+    return '@' + symbol
+
+def is_pointer_symbol(symbol):
+    return symbol[0] == '@'
+
+# Creates the BSC directive of the pointer word of the pointer symbol, holding the
+# given address (as a signed 16-bit constant)
+def make_pointer_directive(symbol, address=0):
+    stmt = AsmDirective.__new__(AsmDirective)
+    stmt.Directive = 'BSC'
+    stmt.DirType = DirectiveType.BSC
+    stmt.ConstantSymbol = symbol
+    stmt.Constants = [address - 65536 if address > 32767 else address]
+    return stmt
+
 
 # Represents an ARSC instruction (i.e. LDA *Z, 2) and all its components:
 # mnemonic (i.e. LDA), is_indirect flag (star '*' indicates indirect
-# addressing), address (a decimal or hexadecimal string or a variable name)
-# and index (an empty string, 0, 1, 2 or 3)
-class AsmInstruction:
+# addressing), address (a decimal or hexadecimal string, a variable name or a
+# literal such as =5, whose value is placed in the literal pool) and index (an empty string, 0, 1, 2 or 3). The parser sets the SymbolId to the
+# SymbolTable id of the symbolic address (it is None for absolute addresses)
+class AsmInstruction(object):
+    __slots__ = ('Opcode', 'Mnemonic', 'StmtString', 'HasAbsoluteAddress'
+                 , 'IndirectOrIODeviceBit', 'Address', 'Index', 'SymbolId')
+
     def __init__(self
                  , mnemonic
                  , indirect_or_iodev_bit
@@ -110,6 +165,7 @@ class AsmInstruction:
 
         self.Mnemonic = mnemonic
         self.StmtString = stmt_str
+        self.SymbolId = None
 
         # Handle zero-address instructions
         if mnemonic in ['TCA', 'SHL', 'SHR', 'HLT']:
@@ -129,6 +185,13 @@ class AsmInstruction:
         elif is_valid_name(address):
             self.Address = address
             self.HasAbsoluteAddress = False
+        elif address[0] == '=':
+            # The literal operand addresses its word of the literal pool
+            if mnemonic in ['STA', 'STX', 'BRU', 'BIP', 'BIN', 'TIX', 'TDX']:
+                raise SyntaxError('instruction "%s" may not have a literal operand' % mnemonic)
+
+            self.Address = get_literal_symbol(address)
+            self.HasAbsoluteAddress = False
         else:
             try:
                 self.Address = int(address, 0)
@@ -139,6 +202,11 @@ class AsmInstruction:
             except:
                 raise SyntaxError('invalid address "%s"' % address)
 
+            # The address field is 8 bits wide: the excess bits would spill into
+            # the index field of the instruction word
+            if self.Address > 255:
+                raise SyntaxError('address "%s" is out of bounds (0-255)' % address)
+
         # Validate index
         if index is None:
             if mnemonic in ['LDX', 'STX', 'TIX', 'TDX'] and index not in ['1', '2', '3']:
@@ -167,13 +235,18 @@ class AsmInstruction:
                 if mnemonic in ['RWD', 'WWD']:
                     raise SyntaxError('invalid I/O device ID "%s" in instruction "%s"' % (str(indirect_or_iodev_bit), mnemonic))
                 else:
-                    raise SyntaxError('invalid indirect bit "s" in instruction "%s"' % (str(indirect_or_iodev_bit), mnemonic))
+                    raise SyntaxError('invalid indirect bit "%s" in instruction "%s"' % (str(indirect_or_iodev_bit), mnemonic))
 
 
 # Represents the ARSC assembler directive (i.e. ANCHOR or BSS). As the number
 # and meaning of the arguments depend on the directive, they are stored as
 # an array of args
-class AsmDirective:
+class AsmDirective(object):
+    __slots__ = ('Directive', 'DirType', 'AbsAddress', 'AliasSymbol', 'OriginalSymbol'
+                 , 'BaseSymbol', 'Operator', 'Offset', 'VariableSymbol', 'AllocSize'
+                 , 'ConstantSymbol', 'Constants', 'RegionName', 'RegionStart', 'RegionEnd', 'RegionKind'
+                 , 'TableExpression')
+
     def __init__(self, directive, args):
         if type(directive) is not str:
             raise TypeError('mnemonic must be a string')
@@ -185,9 +258,13 @@ class AsmDirective:
 
         # Validate arguments
         if self.DirType == DirectiveType.ANCHOR:
+            # The anchor is either an absolute address or the name of a memory region
+            if is_valid_name(args[0]):
+                self.RegionName = args[0]
+                return
             try:
                 self.AbsAddress = int(args[0], 0)
-                if self.AbsAddress < 0:
+                if self.AbsAddress < 0 or self.AbsAddress > 0xFFFF:
                     raise SyntaxError
             except:
                 raise SyntaxError('invalid argument "%s" for directive "%s"' % (args[0], directive))
@@ -200,7 +277,23 @@ class AsmDirective:
                         '"%s" is not valid left-hand side for directive "%s". Valid identifier expected' %
                         (args[0], directive))
 
-            if self.DirType == DirectiveType.ALIAS:
+            if self.DirType == DirectiveType.REGION:
+                # NAME REGION START,END,KIND
+                self.RegionName = args[0]
+                if len(args) != 4:
+                    raise SyntaxError('"%s" directive expects the start and end address and the memory kind' % directive)
+                try:
+                    self.RegionStart = int(args[1], 0)
+                    self.RegionEnd = int(args[2], 0)
+                except ValueError:
+                    raise SyntaxError('invalid address range "%s,%s" for directive "%s"' % (args[1], args[2], directive))
+                if not 0 <= self.RegionStart <= self.RegionEnd <= 0xFFFF:
+                    raise SyntaxError('invalid address range "%s,%s" for directive "%s"' % (args[1], args[2], directive))
+                elif args[3] not in MEMORY_KINDS:
+                    raise SyntaxError('memory kind must be one of %s' % ', '.join(MEMORY_KINDS))
+                self.RegionKind = args[3]
+
+            elif self.DirType == DirectiveType.ALIAS:
                 self.AliasSymbol = args[0]
                 if is_valid_name(args[1]):
                     self.OriginalSymbol = args[1]
@@ -234,6 +327,18 @@ class AsmDirective:
                 except ValueError:
                     raise SyntaxError('character string "%s" is not a valid allocation size' % args[1])
 
+            elif directive == 'TABLE':
+                # NAME TABLE COUNT,EXPRESSION (or a built-in generator, see lookup_tables.py)
+                self.ConstantSymbol = args[0]
+                if len(args) != 3:
+                    raise SyntaxError('"%s" directive expects the table size and the expression' % directive)
+                try:
+                    count = int(args[1], 0)
+                except ValueError:
+                    raise SyntaxError('character string "%s" is not a valid table size' % args[1])
+                self.TableExpression = args[2]
+                self.Constants = generate_table(count, args[2])
+
             else: # BSC
                 self.ConstantSymbol = args[0]
                 self.Constants = []
@@ -250,7 +355,9 @@ class AsmDirective:
 
 
 # Label instruction (i.e. ALABEL:)
-class AsmLabel:
+class AsmLabel(object):
+    __slots__ = ('Label',)
+
     def __init__(self, label):
         if type(label) is not str:
             raise TypeError('label must be a string')
@@ -258,3 +365,139 @@ class AsmLabel:
             raise SyntaxError('"%s" is not a valid label name' % label)
 
         self.Label = label
+
+
+# Compact, struct-of-arrays storage for the parsed statements. Instead of keeping
+# an object per statement, the statement fields are stored in the parallel array
+# columns (one row per statement) and the BSC constants of all the BSC directives
+# are packed into a single shared array('h') buffer. Names (symbols, labels) are
+# stored as the ids given out by the SymbolTable (a private one unless given), so
+# that each distinct name is stored only once. ALIAS, ANCHOR, REGION, TABLE and
+# END directives are rare and are kept as is, as are the BSC directives with a
+# constant outside the signed 16-bit range (i.e. 40000, given as unsigned). Iterating over the container yields the
+# (stmt, lineno) pairs, where stmt is re-created from the columns
+class CompactStatements:
+    INSTRUCTION, LABEL, BSS, BSC, OTHER = range(0, 5)
+
+    MNEMONICS = dict((opcode, mnemonic) for mnemonic, opcode in ISA.items())
+
+    def __init__(self, sym_tbl=None):
+        self.sym_tbl = sym_tbl if sym_tbl is not None else SymbolTable()
+        self.kinds = array('B')
+        self.opcodes = array('B')
+        self.indirect_bits = array('B')
+        self.indexes = array('B')
+        # Absolute address of the instruction, BSS allocation size or BSC ordinal
+        self.operands = array('l')
+        # Id of the symbolic address, label, BSS or BSC symbol (-1 if none)
+        self.symbols = array('l')
+        self.linenos = array('l')
+        self.constants = array('h')
+        # End offset of the constants of each BSC directive in the shared buffer
+        self.constant_ends = array('l')
+        self.stmt_strings = []
+        self.names = self.sym_tbl.names
+        self.other = dict()
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def intern(self, name):
+        return self.sym_tbl.get_id(name)
+
+    def append(self, stmt, lineno):
+        opcode, indirect_bit, index, operand, symbol = 0, 0, 0, 0, -1
+        if isinstance(stmt, AsmInstruction):
+            kind = CompactStatements.INSTRUCTION
+            opcode = stmt.Opcode
+            indirect_bit = stmt.IndirectOrIODeviceBit
+            index = stmt.Index
+            if stmt.HasAbsoluteAddress:
+                operand = stmt.Address
+            elif stmt.SymbolId is not None:
+                symbol = stmt.SymbolId
+            else:
+                symbol = self.intern(stmt.Address)
+            self.stmt_strings.append(stmt.StmtString)
+        elif isinstance(stmt, AsmLabel):
+            kind = CompactStatements.LABEL
+            symbol = self.intern(stmt.Label)
+        elif stmt.DirType == DirectiveType.BSS:
+            kind = CompactStatements.BSS
+            operand = stmt.AllocSize
+            symbol = self.intern(stmt.VariableSymbol)
+        elif stmt.DirType == DirectiveType.BSC and stmt.Directive != 'TABLE' and self.pack_constants(stmt.Constants):
+            kind = CompactStatements.BSC
+            operand = len(self.constant_ends) - 1
+            symbol = self.intern(stmt.ConstantSymbol)
+        else:
+            kind = CompactStatements.OTHER
+            self.other[len(self.kinds)] = stmt
+
+        if kind != CompactStatements.INSTRUCTION:
+            self.stmt_strings.append(None)
+
+        self.kinds.append(kind)
+        self.opcodes.append(opcode)
+        self.indirect_bits.append(indirect_bit)
+        self.indexes.append(index)
+        self.operands.append(operand)
+        self.symbols.append(symbol)
+        self.linenos.append(lineno)
+
+    # Packs the BSC constants into the shared buffer. Returns False (with the buffer
+    # left intact) if any of them does not fit in the signed 16-bit column
+    def pack_constants(self, constants):
+        start = len(self.constants)
+        try:
+            self.constants.extend(constants)
+        except OverflowError:
+            del self.constants[start:]
+            return False
+
+        self.constant_ends.append(len(self.constants))
+        return True
+
+    # Re-creates the statement stored in the given row
+    def get_stmt(self, row):
+        kind = self.kinds[row]
+        if kind == CompactStatements.INSTRUCTION:
+            stmt = AsmInstruction.__new__(AsmInstruction)
+            stmt.Opcode = self.opcodes[row]
+            stmt.Mnemonic = CompactStatements.MNEMONICS[stmt.Opcode]
+            stmt.StmtString = self.stmt_strings[row]
+            stmt.IndirectOrIODeviceBit = self.indirect_bits[row]
+            stmt.Index = self.indexes[row]
+            if self.symbols[row] == -1:
+                stmt.SymbolId = None
+                stmt.HasAbsoluteAddress = True
+                stmt.Address = self.operands[row]
+            else:
+                stmt.HasAbsoluteAddress = False
+                stmt.SymbolId = self.symbols[row]
+                stmt.Address = self.names[stmt.SymbolId]
+        elif kind == CompactStatements.LABEL:
+            stmt = AsmLabel.__new__(AsmLabel)
+            stmt.Label = self.names[self.symbols[row]]
+        elif kind == CompactStatements.BSS:
+            stmt = AsmDirective.__new__(AsmDirective)
+            stmt.Directive = 'BSS'
+            stmt.DirType = DirectiveType.BSS
+            stmt.VariableSymbol = self.names[self.symbols[row]]
+            stmt.AllocSize = self.operands[row]
+        elif kind == CompactStatements.BSC:
+            stmt = AsmDirective.__new__(AsmDirective)
+            stmt.Directive = 'BSC'
+            stmt.DirType = DirectiveType.BSC
+            stmt.ConstantSymbol = self.names[self.symbols[row]]
+            ordinal = self.operands[row]
+            start = self.constant_ends[ordinal - 1] if ordinal > 0 else 0
+            stmt.Constants = self.constants[start:self.constant_ends[ordinal]]
+        else:
+            stmt = self.other[row]
+
+        return stmt
+
+    def __iter__(self):
+        for row in range(0, len(self.kinds)):
+            yield self.get_stmt(row), self.linenos[row]
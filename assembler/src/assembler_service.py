@@ -0,0 +1,162 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# PART OF THE ARSC ASSEMBLER
+#
+import os
+import sys
+import json
+import socket
+import stat
+import traceback
+from StringIO import StringIO
+import arsc_assembler
+
+# Resident assembler service. It keeps the assembler modules loaded so that the
+# clients don't pay for the interpreter startup and the imports on each run. The
+# protocol is line based: each request is a single JSON line holding the argv of
+# the arsc_assembler.py invocation and the working directory of the client, and
+# each response is a single JSON line holding the exit status and everything the
+# assembler wrote to the standard output and the standard error (generated code
+# for -d STD, diagnostics in the format_syntax_err format, usage errors...)
+class AssemblerService:
+    def __init__(self):
+        self.request_count = 0
+
+    def handle_request(self, request):
+        self.request_count += 1
+        stdout, stderr = StringIO(), StringIO()
+        org_cwd = os.getcwd()
+        org_stdout, org_stderr = sys.stdout, sys.stderr
+        status = 0
+        try:
+            os.chdir(request.get('cwd', org_cwd).encode('utf-8'))
+            sys.stdout, sys.stderr = stdout, stderr
+            arsc_assembler.main([arg.encode('utf-8') for arg in request['argv']])
+        except SystemExit as err:
+            status = err.code if isinstance(err.code, int) else 1
+        except Exception:
+            traceback.print_exc(file=stderr)
+            status = 1
+        finally:
+            sys.stdout, sys.stderr = org_stdout, org_stderr
+            os.chdir(org_cwd)
+
+        # The output may hold any bytes of the source (i.e. in the diagnostics)
+        return dict(status=status, stdout=decode_output(stdout.getvalue())
+                    , stderr=decode_output(stderr.getvalue()))
+
+    # Returns the response line to the request line. A failure to serve the
+    # request is reported in the response and doesn't stop the service
+    def handle_line(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return json.dumps(dict(status=1, stdout='', stderr='malformed request\n'))
+
+        try:
+            return json.dumps(self.handle_request(request))
+        except Exception:
+            return json.dumps(dict(status=1, stdout='', stderr=decode_output(traceback.format_exc())))
+
+    # Serves the requests read from the input stream until it's closed
+    def serve_stream(self, in_stream, out_stream):
+        for line in iter(in_stream.readline, ''):
+            if len(line.strip()) == 0:
+                continue
+            out_stream.write(self.handle_line(line) + '\n')
+            out_stream.flush()
+
+    # Serves the requests sent over the Unix domain socket. The requests are
+    # served one at a time as each of them may change the working directory.
+    # The socket is accessible to the owner only: it is created with the 0600
+    # permissions, and a missing directory with the 0700 permissions
+    def serve_unix(self, socket_path):
+        socket_dir = os.path.dirname(os.path.abspath(socket_path))
+        if not os.path.exists(socket_dir):
+            os.makedirs(socket_dir, 0700)
+        check_socket_dir(socket_dir)
+        remove_stale_socket(socket_path)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        org_umask = os.umask(0177)
+        try:
+            server.bind(socket_path)
+        except:
+            server.close()
+            raise
+        finally:
+            os.umask(org_umask)
+
+        try:
+            os.chmod(socket_path, 0600)
+            server.listen(16)
+            while True:
+                conn, addr = server.accept()
+                try:
+                    conn_file = conn.makefile('rw')
+                    self.serve_stream(conn_file, conn_file)
+                    conn_file.close()
+                except socket.error:
+                    pass
+                finally:
+                    conn.close()
+        finally:
+            server.close()
+            os.remove(socket_path)
+
+
+# Returns the captured output as unicode, replacing the bytes that are not valid UTF-8
+def decode_output(output):
+    return output if isinstance(output, unicode) else output.decode('utf-8', 'replace')
+
+# Checks that no other user may replace the socket: the directory must belong to
+# the current user, or be a shared directory with the sticky bit set (i.e. /tmp)
+def check_socket_dir(socket_dir):
+    info = os.stat(socket_dir)
+    if info.st_uid != os.getuid() and info.st_mode & (stat.S_IWGRP | stat.S_IWOTH) and not info.st_mode & stat.S_ISVTX:
+        raise RuntimeError('the socket directory "%s" may be modified by other users' % socket_dir)
+
+# Removes the socket left over by a previous server of the same user. Any other
+# file at the path (or a socket of another user) is left alone
+def remove_stale_socket(socket_path):
+    try:
+        info = os.lstat(socket_path)
+    except OSError:
+        return
+
+    if not stat.S_ISSOCK(info.st_mode) or info.st_uid != os.getuid():
+        raise RuntimeError('"%s" exists and is not a socket of the current user' % socket_path)
+    os.remove(socket_path)
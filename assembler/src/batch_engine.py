@@ -0,0 +1,181 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# PART OF THE ARSC ASSEMBLER
+#
+import os
+import glob
+import time
+import multiprocessing
+from compiler_engine import CompilerEngine
+from arsc_assembler import format_syntax_err
+
+# Extension of the output file generated for each output format
+OUTPUT_EXTENSIONS = dict(
+    MIF         = '.mif'
+    , BIN       = '.bin'
+    , HEX       = '.hex'
+    , PRETTY    = '.txt'
+)
+
+
+# Expands the list of files, directories (all .asm files in the directory) and
+# glob patterns into a sorted list of source files with no duplicates
+def collect_sources(inputs):
+    sources = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            sources.update(glob.glob(os.path.join(item, '*.asm')))
+        elif os.path.isfile(item):
+            sources.add(item)
+        else:
+            matches = glob.glob(item)
+            if len(matches) == 0:
+                raise IOError('no source files match "%s"' % item)
+            sources.update(matches)
+
+    return sorted(os.path.abspath(source) for source in sources)
+
+
+# Returns the output path (with no extension) of each of the (absolute) source files.
+# The sources are written next to themselves or, if out_dir is set, mirrored under
+# out_dir by their paths relative to the common directory of all the sources (so a
+# single directory of sources maps onto out_dir itself)
+def get_dest_bases(sources, out_dir):
+    if out_dir is None:
+        return [os.path.splitext(source)[0] for source in sources]
+
+    common_dir = os.path.dirname(os.path.commonprefix(sources))
+    return [os.path.join(out_dir, os.path.relpath(os.path.splitext(source)[0], common_dir))
+            for source in sources]
+
+
+# Assembles a single source file. Runs in the worker process, hence the result
+# is a plain dict: the source, number of the generated words, the formatted
+# error (None on success), the time spent on the file and whether the code has
+# been taken from the compilation cache. The source whose output files would be
+# written by another source as well (collision) is not assembled
+def assemble_file(task):
+    src_filename, dest_base, out_formats, options, collision = task
+    dest_filenames = [dest_base + OUTPUT_EXTENSIONS[out_format] for out_format in out_formats]
+
+    result = dict(src=src_filename, words=0, error=None, time=0.0, cached=False)
+    start = time.time()
+    try:
+        if collision is not None:
+            raise IOError('the output files "%s.*" are written by "%s" as well' % (dest_base, collision))
+
+        compiler = CompilerEngine(src_filename, dest_filenames, out_formats, **options)
+        compiler.run_to_file()
+        result['words'] = compiler.word_count
+        result['cached'] = compiler.cache_hit
+    except SyntaxError as err:
+        result['error'] = format_syntax_err(err)
+    except (IOError, RuntimeError) as err:
+        result['error'] = '%s: error: %s' % (src_filename, err)
+    except Exception as err:
+        # Any other failure is reported for the file rather than aborting the batch
+        result['error'] = '%s: internal error: %s: %s' % (src_filename, err.__class__.__name__, err)
+
+    result['time'] = time.time() - start
+    return result
+
+
+# Assembles many source files using a pool of worker processes. The results are
+# reported in the order of the (sorted) source files regardless of the order in
+# which the workers complete them
+class BatchAssembler:
+    def __init__(self, inputs, out_dir, out_formats, jobs=None, **options):
+        self.sources = collect_sources(inputs)
+        self.out_dir = out_dir
+        self.out_formats = list(out_formats)
+        self.jobs = jobs if jobs is not None else multiprocessing.cpu_count()
+        self.options = options
+        self.results = []
+        self.wall_time = 0.0
+
+    # Runs the batch. The optional callback is invoked with each result, in order
+    def run(self, callback=None):
+        dest_bases = get_dest_bases(self.sources, self.out_dir)
+        sources_by_dest = dict()
+        for source, dest_base in zip(self.sources, dest_bases):
+            sources_by_dest.setdefault(dest_base, []).append(source)
+        for dest_dir in set(os.path.dirname(dest_base) for dest_base in dest_bases):
+            if not os.path.isdir(dest_dir):
+                os.makedirs(dest_dir)
+
+        tasks = []
+        for source, dest_base in zip(self.sources, dest_bases):
+            others = [other for other in sources_by_dest[dest_base] if other != source]
+            tasks.append((source, dest_base, self.out_formats, self.options, others[0] if others else None))
+        self.results = []
+        start = time.time()
+        if self.jobs <= 1 or len(tasks) <= 1:
+            results = (assemble_file(task) for task in tasks)
+            self.collect(results, callback)
+        else:
+            jobs = min(self.jobs, len(tasks))
+            pool = multiprocessing.Pool(jobs)
+            try:
+                # Hand out several small files at once to cut the IPC overhead
+                chunk_size = max(1, len(tasks) / (jobs * 4))
+                self.collect(pool.imap(assemble_file, tasks, chunk_size), callback)
+                pool.close()
+            except:
+                pool.terminate()
+                raise
+            finally:
+                pool.join()
+
+        self.wall_time = time.time() - start
+        return self.results
+
+    def collect(self, results, callback):
+        for result in results:
+            self.results.append(result)
+            if callback is not None:
+                callback(result)
+
+    def get_failed_count(self):
+        return len([result for result in self.results if result['error'] is not None])
+
+    def get_summary(self):
+        words = sum(result['words'] for result in self.results)
+        cached = len([result for result in self.results if result['cached']])
+        wall_time = max(self.wall_time, 1e-9)
+        return ('%d files (%d failed, %d cached), %d words in %.3f s using %d job(s): %.1f files/s,'
+                ' %.1f words/s' %
+                (len(self.results), self.get_failed_count(), cached, words, self.wall_time, self.jobs,
+                 len(self.results) / wall_time, words / wall_time))
@@ -0,0 +1,285 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# ARSC INSTRUCTION SET SIMULATOR
+#
+import sys
+from asm_stmt import ISA
+from isa_simulator import IsaSimulator
+
+MNEMONICS = dict((opcode, mnemonic) for mnemonic, opcode in ISA.items())
+
+# Instructions that end a basic block
+TERMINATORS = [ISA['BRU'], ISA['BIP'], ISA['BIN'], ISA['TIX'], ISA['TDX'], ISA['HLT']]
+
+# Instructions that set the CR and OF bits
+FLAG_INSTRUCTIONS = [ISA['ADD'], ISA['TCA'], ISA['SHL']]
+
+# A translated basic block: the compiled function, the address range it was
+# translated from (end is exclusive) and the generated Python source
+class TranslatedBlock:
+    def __init__(self, function, start, end, source):
+        self.function = function
+        self.start = start
+        self.end = end
+        self.length = end - start
+        self.source = source
+
+
+# Instruction set simulator that translates the program into Python functions
+# instead of decoding each instruction every time it is executed. Starting from
+# the current PC, the instructions up to (and including) the next BRU, BIP, BIN,
+# TIX, TDX or HLT form a basic block that is compiled once into a specialized
+# function (the addresses and the index registers resolved at translation time,
+# ACC kept in a local variable) and cached by its start address. A block returns
+# the address of the next block to execute, or minus the number of the executed
+# instructions if it is left early (HLT, or a store into the translated code).
+# Such a store (self-modifying code) invalidates the blocks covering the stored
+# word, and the running block is left right after the store
+class TranslatingSimulator(IsaSimulator):
+    # Maximum number of instructions in a block
+    MAX_BLOCK_SIZE = 256
+
+    def __init__(self, image=None):
+        self.blocks = dict()
+        # Start addresses of the blocks covering each memory word
+        self.blocks_at = dict()
+        # Non-zero for the memory words covered by a translated block
+        self.code_map = bytearray(IsaSimulator.MEMORY_SIZE)
+        self.translation_count = 0
+        self.invalidation_count = 0
+        IsaSimulator.__init__(self, image)
+
+    # The translated code refers to the index registers reset() replaces
+    def reset(self):
+        IsaSimulator.reset(self)
+        self.flush()
+
+    def load(self, image, address=0):
+        IsaSimulator.load(self, image, address)
+        self.flush()
+
+    # Drops all the translated blocks
+    def flush(self):
+        self.blocks.clear()
+        self.blocks_at.clear()
+        self.code_map[:] = bytearray(IsaSimulator.MEMORY_SIZE)
+
+    # Drops the blocks translated from the memory word at the address
+    def invalidate(self, address):
+        self.invalidation_count += 1
+        for start in self.blocks_at.pop(address, ()):
+            block = self.blocks.pop(start, None)
+            if block is None:
+                continue
+            for block_addr in range(block.start, block.end):
+                starts = self.blocks_at.get(block_addr)
+                if starts is not None:
+                    starts.discard(start)
+                    if len(starts) == 0:
+                        del self.blocks_at[block_addr]
+                        self.code_map[block_addr] = 0
+        self.code_map[address] = 0
+
+    # The interpreted stores (see 'run') must invalidate the translated code as well
+    def exec_sta(self, address, ir):
+        IsaSimulator.exec_sta(self, address, ir)
+        if self.code_map[address]:
+            self.invalidate(address)
+
+    def exec_stx(self, address, ir):
+        IsaSimulator.exec_stx(self, address, ir)
+        if self.code_map[address]:
+            self.invalidate(address)
+
+    # Executes the translated blocks until HLT is reached or max_steps instructions
+    # have been executed. The instructions that don't fit into the remaining steps
+    # (or can't be translated) are interpreted
+    def run(self, max_steps=None):
+        blocks = self.blocks
+        limit = max_steps if max_steps is not None else sys.maxint
+        steps = 0
+        translated_steps = 0
+        pc = self.pc
+        self.running = True
+        self.halted = False
+        while steps < limit:
+            block = blocks.get(pc)
+            if block is None:
+                block = self.translate(pc)
+            if block is None or steps + block.length > limit:
+                # IsaSimulator.run counts its own steps
+                self.pc = pc
+                steps += IsaSimulator.run(self, 1 if block is None else limit - steps)
+                pc = self.pc
+                if self.halted:
+                    break
+                continue
+
+            next_pc = block.function()
+            if next_pc >= 0:
+                steps += block.length
+                translated_steps += block.length
+                pc = next_pc
+            else:
+                steps -= next_pc
+                translated_steps -= next_pc
+                pc = (block.start - next_pc) & 0xFFFF
+                if self.halted:
+                    break
+
+        self.pc = pc
+        self.running = False
+        self.steps += translated_steps
+        return steps
+
+    # Translates the basic block starting at the address (None if its first
+    # instruction is not a valid one)
+    def translate(self, start):
+        lines = []
+        address = start
+        uses_flags = False
+        terminated = False
+        while not terminated and address - start < TranslatingSimulator.MAX_BLOCK_SIZE \
+                and address < IsaSimulator.MEMORY_SIZE:
+            word = self.memory[address]
+            opcode = word >> 11
+            if opcode not in MNEMONICS:
+                break
+            uses_flags = uses_flags or opcode in FLAG_INSTRUCTIONS
+            terminated = opcode in TERMINATORS
+            lines.append('# 0x%04x: %04x %s' % (address, word, MNEMONICS[opcode]))
+            lines.extend(self.translate_instruction(word, address, address + 1 - start, uses_flags))
+            address += 1
+
+        if address == start:
+            return None
+        if not terminated:
+            lines.extend(self.get_exit(address & 0xFFFF, uses_flags))
+
+        name = 'block_%04x' % start
+        source = '\n'.join(
+            ['def %s(sim=sim, memory=memory, idx=idx, code_map=code_map):' % name, '    acc = sim.acc']
+            + (['    cr = sim.cr', '    of = sim.of'] if uses_flags else [])
+            + ['    ' + line for line in lines]) + '\n'
+        namespace = dict(sim=self, memory=self.memory, idx=self.idx, code_map=self.code_map)
+        exec compile(source, '<%s>' % name, 'exec') in namespace
+        block = TranslatedBlock(namespace[name], start, address, source)
+
+        self.blocks[start] = block
+        for block_addr in range(start, address):
+            self.blocks_at.setdefault(block_addr, set()).add(start)
+            self.code_map[block_addr] = 1
+        self.translation_count += 1
+        return block
+
+    # Writes the registers back and returns the next PC (the expression), or minus
+    # the number of the executed instructions if the count is given
+    def get_exit(self, pc_expr, uses_flags, count=None):
+        return (['sim.acc = acc']
+                + (['sim.cr = cr', 'sim.of = of'] if uses_flags else [])
+                + ['return %s' % (pc_expr if count is None else -count)])
+
+    # Returns the expression of the effective address of the instruction
+    def get_address_expr(self, word):
+        opcode = word >> 11
+        expr = str(word & 0xFF)
+        index = (word >> 8) & 3
+        if index and opcode not in [ISA['LDX'], ISA['STX'], ISA['TIX'], ISA['TDX']]:
+            expr = '((%s + idx[%d]) & 0xFFFF)' % (expr, index)
+        if word & 0x400 and opcode not in [ISA['RWD'], ISA['WWD']]:
+            expr = 'memory[%s]' % expr
+        return expr
+
+    # Returns the lines of Python code that execute the instruction. The count is
+    # the number of the instructions executed up to (and including) this one
+    def translate_instruction(self, word, address, count, uses_flags):
+        opcode = word >> 11
+        mnemonic = MNEMONICS[opcode]
+        next_pc = (address + 1) & 0xFFFF
+        index = (word >> 8) & 3
+        if mnemonic == 'HLT':
+            return ['sim.halted = True'] + self.get_exit(None, uses_flags, count)
+        elif mnemonic in ['TCA', 'SHL', 'SHR', 'NOT']:
+            return dict(
+                TCA = ['operand = ~acc & 0xFFFF', 'result = operand + 1', 'cr = result >> 16'
+                       , 'acc = result & 0xFFFF', 'of = (~operand & acc & 0x8000) >> 15']
+                , SHL = ['cr = 0', 'of = ((acc >> 15) ^ (acc >> 14)) & 1', 'acc = (acc << 1) & 0xFFFF']
+                , SHR = ['acc = (acc >> 1) | (acc & 0x8000)']
+                , NOT = ['acc = ~acc & 0xFFFF'])[mnemonic]
+
+        address_expr = self.get_address_expr(word)
+        if mnemonic == 'LDA':
+            return ['acc = memory[%s]' % address_expr]
+        elif mnemonic == 'ADD':
+            return ['operand = memory[%s]' % address_expr
+                    , 'result = acc + operand'
+                    , 'cr = result >> 16'
+                    , 'result &= 0xFFFF'
+                    , 'of = (~(acc ^ operand) & (acc ^ result) & 0x8000) >> 15'
+                    , 'acc = result']
+        elif mnemonic in ['AND', 'OR', 'XOR']:
+            return ['acc %s= memory[%s]' % (dict(AND='&', OR='|', XOR='^')[mnemonic], address_expr)]
+        elif mnemonic in ['STA', 'STX']:
+            value = 'acc' if mnemonic == 'STA' else 'idx[%d]' % index
+            return (['address = %s' % address_expr
+                     , 'memory[address] = %s' % value
+                     , 'if code_map[address]:'
+                     , '    sim.invalidate(address)']
+                    + ['    ' + line for line in self.get_exit(None, uses_flags, count)])
+        elif mnemonic == 'LDX':
+            return ['idx[%d] = memory[%s]' % (index, address_expr)] if index else []
+        elif mnemonic == 'RWD':
+            return ['acc = sim.in_devices[%d].read(memory[%s]) & 0xFFFF' % ((word >> 10) & 1, address_expr)]
+        elif mnemonic == 'WWD':
+            return ['sim.out_devices[%d].write(memory[%s], acc)' % ((word >> 10) & 1, address_expr)]
+        elif mnemonic == 'BRU':
+            return self.get_exit(address_expr, uses_flags)
+
+        # Conditional branches
+        if mnemonic == 'BIP':
+            condition = 'acc != 0 and not acc & 0x8000'
+            lines = []
+        elif mnemonic == 'BIN':
+            condition = 'acc & 0x8000'
+            lines = []
+        elif mnemonic == 'TIX':
+            condition = 'idx[%d] == 0' % index
+            lines = ['idx[%d] = (idx[%d] + 1) & 0xFFFF' % (index, index)] if index else []
+        else:
+            condition = 'idx[%d] != 0' % index
+            lines = ['idx[%d] = (idx[%d] - 1) & 0xFFFF' % (index, index)] if index else []
+
+        return lines + self.get_exit('%s if %s else %d' % (address_expr, condition, next_pc), uses_flags)
@@ -35,33 +35,70 @@
 #
 # PART OF THE ARSC ASSEMBLER
 #
+import sys
+from array import array
 from binascii import hexlify
+from cycle_model import find_basic_blocks, find_loops
 
-# The base class for code generators
+# The base class for code generators. If a sink (a file-like object) is given, the
+# generated code is written to it chunk by chunk as it is produced instead of being
+# kept in memory
 class BaseGenerator:
+    def __init__(self, sink = None):
+        self.sink = sink
+        self.chunks = []
+
+    def emit(self, chunk):
+        if self.sink is not None:
+            self.sink.write(chunk)
+        else:
+            self.chunks.append(chunk)
+
+    def get_emitted_code(self):
+        if self.sink is not None:
+            raise RuntimeError('the generated code has been written to the sink')
+        if len(self.chunks) > 1:
+            self.chunks = [''.join(self.chunks)]
+        return self.chunks[0] if len(self.chunks) != 0 else ''
+
     def on_instruction(self, opcode, indirect_or_iodev_bit, index, address, stmt_str = None):
         raise NotImplementedError
     def on_bss_directive(self, bss_stmt):
         raise NotImplementedError
     def on_bsc_directive(self, bsc_stmt):
         raise NotImplementedError
+    # Continues the code at the address (set by the ANCHOR directive)
+    def on_anchor(self, address):
+        raise NotImplementedError
     def get_generated_code(self):
         raise NotImplementedError
     def on_finished(self):
         pass
+    # Optional support of the single-pass compilation: replaces the address field
+    # of the instruction at instr_addr emitted earlier
+    def can_patch(self):
+        return False
+    def patch_address(self, instr_addr, address):
+        raise NotImplementedError
 
 
-# The pretty code generator that generates the human-readable, annotated code
+# The pretty code generator that generates the human-readable, annotated code. If
+# a CycleModel is given, the listing shows the clock cycles of each instruction and
+# ends with the cycle estimates of the basic blocks and loops (the labels are taken
+# from the symbol table, if given)
 class PrettyGenerator(BaseGenerator):
-    def __init__(self):
-        self.gen_code = ''
+    def __init__(self, sink = None, cycle_model = None, sym_tbl = None):
+        BaseGenerator.__init__(self, sink)
         self.curr_addr = 0
+        self.cycle_model = cycle_model
+        self.sym_tbl = sym_tbl
+        self.code_words = array('H')
 
     def get_generated_code(self):
-        return self.gen_code
+        return self.get_emitted_code()
 
     def on_instruction(self, opcode, indirect_or_iodev_bit, index, address, stmt_str = None):
-        self.gen_code += (
+        code = (
             '0x'
             + format(self.curr_addr, '04x')
             + ':\t'
@@ -70,15 +107,23 @@ class PrettyGenerator(BaseGenerator):
             + format(index, '02b')
             + format(address, '08b'))
 
+        if self.cycle_model is not None:
+            # The code words are kept by their address (the gaps left by ANCHOR are zero)
+            if len(self.code_words) < self.curr_addr:
+                self.code_words.extend(array('H', [0]) * (self.curr_addr - len(self.code_words)))
+            self.code_words.append((opcode << 11) | (indirect_or_iodev_bit << 10) | (index << 8) | address)
+            code += '\t(%d)' % self.cycle_model.get_cycles(opcode, indirect_or_iodev_bit)
+
         if stmt_str is not None:
-            self.gen_code += '\t// ' + stmt_str.lstrip()
+            code += '\t// ' + stmt_str.lstrip()
 
-        self.gen_code += '\n'
+        self.emit(code + '\n')
         self.curr_addr += 1
 
     def on_bss_directive(self, bss_stmt):
+        lines = []
         for i in range(0, bss_stmt.AllocSize):
-            self.gen_code += (
+            lines.append(
                 '0x'
                 + format(self.curr_addr, '04x')
                 + ':\t'
@@ -92,21 +137,23 @@ class PrettyGenerator(BaseGenerator):
 
             self.curr_addr += 1
 
+        self.emit(''.join(lines))
+
     def on_bsc_directive(self, bsc_stmt):
+        lines = []
         i = 0
         for constant in bsc_stmt.Constants:
-            self.gen_code += (
-                '0x'
-                + format(self.curr_addr, '04x')
-                + ':\t')
-
             if constant >= 0:
-                self.gen_code += format(constant, '016b')
+                word = format(constant, '016b')
             else:
-                self.gen_code += bin(constant & 0b1111111111111111)[2:]
+                word = bin(constant & 0b1111111111111111)[2:]
 
-            self.gen_code += (
-                '\t// '
+            lines.append(
+                '0x'
+                + format(self.curr_addr, '04x')
+                + ':\t'
+                + word
+                + '\t// '
                 + bsc_stmt.ConstantSymbol
                 + ' + '
                 + str(i)
@@ -116,68 +163,194 @@ class PrettyGenerator(BaseGenerator):
             self.curr_addr += 1
             i += 1
 
+        self.emit(''.join(lines))
+
+    def on_anchor(self, address):
+        self.emit('// ANCHOR 0x%04x\n' % address)
+        self.curr_addr = address
+
+    def on_finished(self):
+        if self.cycle_model is not None:
+            self.emit(self.get_cycle_summary())
+
+    # Returns the label (or the address) of the code address
+    def get_location_name(self, address):
+        if address in self.labels:
+            return '%s (0x%04x)' % (self.labels[address], address)
+        return '0x%04x' % address
+
+    # Cycle estimates of the basic blocks and loops, as comment lines
+    def get_cycle_summary(self):
+        self.labels = dict()
+        if self.sym_tbl is not None:
+            for symbol, address in sorted(self.sym_tbl.symbols.items(), reverse=True):
+                if address < len(self.code_words):
+                    self.labels[address] = symbol
+
+        blocks = find_basic_blocks(self.code_words, self.cycle_model, len(self.code_words))
+        lines = ['\n// Basic blocks (instructions, cycles):\n']
+        for block in blocks:
+            lines.append('//\t%s - 0x%04x:\t%d instructions, %d cycles\n' %
+                         (self.get_location_name(block.start), block.end - 1, len(block), block.cycles))
+
+        loops = find_loops(blocks)
+        if len(loops) != 0:
+            lines.append('// Loops (cycles per iteration):\n')
+        for loop in loops:
+            if loop.min_cycles == loop.max_cycles:
+                cycles = '%d cycles' % loop.min_cycles
+            else:
+                cycles = '%d-%d cycles' % (loop.min_cycles, loop.max_cycles)
+            lines.append('//\t%s - 0x%04x:\t%d blocks, %s\n' %
+                         (self.get_location_name(loop.header.start), loop.latch.end - 1, len(loop.blocks), cycles))
+
+        return ''.join(lines)
+
 
-# Binary generator that generates the executable (binary) ARSC code. 'get_hex_string'
-# method may be used to obtain the hexadecimal ASCII representation of the binary
-# data, where each byte is represented by two HEX digits. This HEX string can be
-# stored in the .hex memory initialization file
+# Binary generator that generates the executable (binary) ARSC code. The image is
+# kept as an array of 16-bit words, preallocated (and hence zero-filled) when the
+# word count is known from the first pass; the BSS blocks are simply skipped over
+# and the BSC constants are packed in bulk. 'get_image_buffer' exposes the words as
+# a little-endian byte buffer with no copying (on little-endian hosts). The words
+# skipped by ANCHOR are zero; the [start, end) ranges of the words actually
+# generated are kept in the segments
 class BinaryGenerator(BaseGenerator):
-    def __init__(self):
-        self.bin_data = bytearray()
+    def __init__(self, sink = None, word_count = 0):
+        BaseGenerator.__init__(self, sink)
+        self.words = array('H', [0]) * word_count
+        self.curr_addr = 0
+        self.segments = []
+        self.segment_start = 0
+
+    # Grows the image (with zero words) so that it holds at least word_count words
+    def reserve(self, word_count):
+        if len(self.words) < word_count:
+            self.words.extend(array('H', [0]) * (word_count - len(self.words)))
+
+    # Returns the binary image as a little-endian byte buffer
+    def get_image_buffer(self):
+        if sys.byteorder == 'little':
+            return buffer(self.words)
+
+        words = array('H', self.words)
+        words.byteswap()
+        return buffer(words)
 
     def get_generated_code(self):
-        return self.bin_data
+        return bytearray(self.get_image_buffer())
 
     def on_instruction(self, opcode, indirect_or_iodev_bit, index, address, stmt_str = None):
-        self.bin_data.append(address)
-        self.bin_data.append((opcode << 3) | (indirect_or_iodev_bit << 2) | index)
+        word = (opcode << 11) | (indirect_or_iodev_bit << 10) | (index << 8) | address
+        try:
+            self.words[self.curr_addr] = word
+        except IndexError:
+            # The image was not preallocated (or too small): it is grown geometrically
+            self.reserve(max(2 * len(self.words), 1024))
+            self.words[self.curr_addr] = word
+        self.curr_addr += 1
+
+    def can_patch(self):
+        return True
+
+    def patch_address(self, instr_addr, address):
+        self.words[instr_addr] = (self.words[instr_addr] & 0xFF00) | address
 
     def on_bss_directive(self, bss_stmt):
-        for i in range(0, bss_stmt.AllocSize):
-            self.bin_data.append(0)
-            self.bin_data.append(0)
+        self.curr_addr += bss_stmt.AllocSize
+        self.reserve(self.curr_addr)
+
+    def on_anchor(self, address):
+        self.close_segment()
+        self.curr_addr = address
+        self.segment_start = address
+        self.reserve(address)
+
+    def close_segment(self):
+        if self.curr_addr > self.segment_start:
+            self.segments.append((self.segment_start, self.curr_addr))
+        self.segment_start = self.curr_addr
+
+    # Closes the last segment and drops the words preallocated in excess (if any)
+    def finish_image(self):
+        self.close_segment()
+        end = max([0] + [end for start, end in self.segments])
+        del self.words[end:]
 
     def on_bsc_directive(self, bsc_stmt):
-        for constant in bsc_stmt.Constants:
-            self.bin_data.append(constant & 0xFF)
-            self.bin_data.append((constant >> 8) & 0xFF)
+        start = self.curr_addr
+        self.curr_addr += len(bsc_stmt.Constants)
+        self.reserve(self.curr_addr)
+        try:
+            packed = array('H', array('h', bsc_stmt.Constants).tostring())
+        except OverflowError:
+            packed = array('H', [constant & 0xFFFF for constant in bsc_stmt.Constants])
+        self.words[start:self.curr_addr] = packed
+
+    def on_finished(self):
+        self.finish_image()
+        if self.sink is not None:
+            self.sink.write(self.get_image_buffer())
 
 
 # MIF generator produces an ASCII memory intialization string that can be used to
 # create a .mif memory initialization file supported by most FPGA synthesis tools
-# for CAM, RAM and ROM memory initialization
+# for CAM, RAM and ROM memory initialization. The gaps between the segments (left
+# by ANCHOR) are given as zero-filled address ranges
 class MifGenerator(BinaryGenerator):
-    def __init__(self):
-        self.mif_data = ''
-        BinaryGenerator.__init__(self)
+    # Number of the MIF content lines emitted at once
+    CHUNK_SIZE = 4096
 
     def on_finished(self):
-        self.mif_data = 'WIDTH=16;\n'
-        self.mif_data += 'DEPTH=%d;\n\n' % (len(self.bin_data) / 2)
-        self.mif_data += 'ADDRESS_RADIX=HEX;\nDATA_RADIX=HEX;\n\n'
-        self.mif_data += 'CONTENT BEGIN\n'
+        self.finish_image()
+        words = self.words
+        self.emit(
+            'WIDTH=16;\n'
+            + 'DEPTH=%d;\n\n' % len(words)
+            + 'ADDRESS_RADIX=HEX;\nDATA_RADIX=HEX;\n\n'
+            + 'CONTENT BEGIN\n')
+
+        curr_addr = 0
+        for segment_start, segment_end in sorted(self.segments):
+            if segment_start > curr_addr:
+                self.emit('\t[%02x..%02x]\t:\t0000;\n' % (curr_addr, segment_start - 1))
+            self.emit_content(max(segment_start, curr_addr), segment_end)
+            curr_addr = max(curr_addr, segment_end)
 
-        address = 0
-        for i in range(0, len(self.bin_data), 2):
-            self.mif_data += '\t%s\t:\t%s%s;\n' %\
-                             (format(address, '02x'), format(self.bin_data[i+1], '02x'), format(self.bin_data[i], '02x'))
-            address += 1
+        self.emit('END;\n')
 
-        self.mif_data += 'END;\n'
+    # Each chunk is formatted at once from the interleaved addresses and words
+    def emit_content(self, start_addr, end_addr):
+        words = self.words
+        for start in range(start_addr, end_addr, MifGenerator.CHUNK_SIZE):
+            end = min(start + MifGenerator.CHUNK_SIZE, end_addr)
+            values = [0] * (2 * (end - start))
+            values[0::2] = xrange(start, end)
+            values[1::2] = words[start:end]
+            self.emit(('\t%02x\t:\t%04x;\n' * (end - start)) % tuple(values))
 
     def get_generated_code(self):
-        return self.mif_data
+        return self.get_emitted_code()
 
 
 # Hexadecimal generator that produce the HEX string representation of the binary
 # data (used to create a .hex memory initialization file)
 class HexGenerator(BinaryGenerator):
-    def __init__(self):
-        self.hex_data = ''
-        BaseGenerator.__init__(self)
-
     def on_finished(self):
-        self.hex_data = hexlify(self.bin_data)
+        self.finish_image()
+        self.emit(hexlify(self.get_image_buffer()))
+
+    def get_generated_code(self):
+        return self.get_emitted_code()
+
+
+# Stands in for a generator when the code has been taken from the compilation
+# cache: the code is written to the sink (if any) straight away
+class CachedGenerator(BaseGenerator):
+    def __init__(self, code, sink = None):
+        BaseGenerator.__init__(self, sink)
+        self.code = code
+        if sink is not None:
+            sink.write(code)
 
     def get_generated_code(self):
-        return self.hex_data
\ No newline at end of file
+        return self.code
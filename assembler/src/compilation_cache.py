@@ -0,0 +1,189 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# PART OF THE ARSC ASSEMBLER
+#
+import os
+import errno
+import pickle
+import hashlib
+import tempfile
+
+# Bump whenever a change to the assembler affects the generated code, so that
+# the code cached by the previous versions is not reused
+ASSEMBLER_VERSION = '1.2'
+
+
+# Content-addressed cache of the generated code. Each entry is keyed on the hash
+# of the source bytes, the output format and the assembler version, and holds the
+# generated code, the symbol table (as a dict), the number of generated words and
+# the reports of the compilation (a dict of the picklable report objects).
+# Entries are stored as separate files in the cache directory: they are written
+# to a temporary file and atomically renamed into place, so the cache may safely
+# be shared by parallel builds. The least recently used entries are evicted once
+# the total size of the cache exceeds the limit
+class CompilationCache:
+    ENTRY_EXTENSION = '.entry'
+
+    def __init__(self, cache_dir, max_size=64 * 1024 * 1024):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        try:
+            os.makedirs(self.cache_dir)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise IOError('failed to create the cache directory "%s"' % self.cache_dir)
+
+    @staticmethod
+    def hash_source(src_filename):
+        src_hash = hashlib.sha1()
+        try:
+            with open(src_filename, 'rb') as src_file:
+                for chunk in iter(lambda: src_file.read(1 << 16), ''):
+                    src_hash.update(chunk)
+        except IOError:
+            raise IOError('Failed to open/read the source file "%s"' % src_filename)
+        return src_hash.hexdigest()
+
+    @staticmethod
+    def hash_text(src_text):
+        if isinstance(src_text, unicode):
+            src_text = src_text.encode('utf-8')
+        return hashlib.sha1(src_text).hexdigest()
+
+    @staticmethod
+    def get_key(src_hash, out_format):
+        return hashlib.sha1('\0'.join([ASSEMBLER_VERSION, out_format, src_hash])).hexdigest()
+
+    def get_entry_path(self, key):
+        return os.path.join(self.cache_dir, key + CompilationCache.ENTRY_EXTENSION)
+
+    # Returns the cached entry (a dict with 'code', 'symbols', 'word_count' and 'reports') or
+    # None if there's no entry for the key
+    def lookup(self, key):
+        path = self.get_entry_path(key)
+        try:
+            with open(path, 'rb') as entry_file:
+                entry = pickle.load(entry_file)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            # Missing, or evicted/replaced by another process in the meantime
+            self.misses += 1
+            return None
+
+        try:
+            # Refresh the access time used by the LRU eviction
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        self.hits += 1
+        return entry
+
+    def store(self, key, code, symbols, word_count, reports=None):
+        entry = dict(code=code, symbols=symbols, word_count=word_count, reports=reports or dict())
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                pickle.dump(entry, tmp_file, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_path, self.get_entry_path(key))
+        except OSError:
+            # On some platforms rename fails if another process has just stored
+            # the same entry, which is just as good
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        self.stores += 1
+        self.evict()
+
+    def get_entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(CompilationCache.ENTRY_EXTENSION):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+            except OSError:
+                pass
+        return entries
+
+    # Removes the least recently used entries until the cache fits the limit
+    def evict(self):
+        entries = self.get_entries()
+        total_size = sum(size for mtime, size, name in entries)
+        for mtime, size, name in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+                self.evictions += 1
+            except OSError:
+                pass
+            total_size -= size
+
+    def clear(self):
+        for mtime, size, name in self.get_entries():
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def get_stats(self):
+        entries = self.get_entries()
+        lookups = self.hits + self.misses
+        return dict(
+            hits=self.hits
+            , misses=self.misses
+            , hit_rate=float(self.hits) / lookups if lookups != 0 else 0.0
+            , stores=self.stores
+            , evictions=self.evictions
+            , entries=len(entries)
+            , size=sum(size for mtime, size, name in entries)
+            , max_size=self.max_size)
+
+    def __str__(self):
+        stats = self.get_stats()
+        return ('cache %s: %d hits, %d misses (%.1f%% hit rate), %d stores, %d evictions,'
+                ' %d entries, %d of %d bytes used' %
+                (self.cache_dir, stats['hits'], stats['misses'], stats['hit_rate'] * 100,
+                 stats['stores'], stats['evictions'], stats['entries'], stats['size'],
+                 stats['max_size']))
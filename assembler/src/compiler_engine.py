@@ -36,12 +36,46 @@
 # PART OF THE ARSC ASSEMBLER
 #
 import os
+import sys
+import tempfile
 from asm_parser import AsmParser, AsmParserObserver
-from asm_stmt import DirectiveType
+from asm_stmt import DirectiveType, ISA, CompactStatements, make_literal_directive, is_pointer_symbol
+from array import array
 from symbol_table import SymbolTable
-from code_generator import BaseGenerator, PrettyGenerator, BinaryGenerator, HexGenerator, MifGenerator
+from code_generator import BaseGenerator, PrettyGenerator, BinaryGenerator, HexGenerator, MifGenerator, CachedGenerator
+from compilation_cache import CompilationCache
+from compiler_stats import CompilerStats
+from peephole_optimizer import PeepholeOptimizer
+from constant_pool import ConstantPool
+from data_layout import DataLayout, get_utilization_map
+from far_addressing import FarAddressing
+from memory_regions import MemoryRegion, MemoryMap
+from lookup_tables import LookupTable
+from cycle_model import CycleModel
+from zlib import crc32
 from binascii import hexlify
 
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Returns the peak resident set size of the assembler process in KiB or None
+# if the platform doesn't provide it
+def get_peak_memory():
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on OS X and in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return peak
+
+# Branches whose target at or before the branch closes a loop
+LOOP_BRANCHES = set(['BRU', 'BIP', 'BIN', 'TIX', 'TDX'])
+
 # Drives the first pass of the compilation during which all the labels,
 # variable symbols, constant symbols and aliases are placed into the
 # symbol table. Additionally, the syntax analysis is performed and in
@@ -58,12 +92,39 @@ from binascii import hexlify
 # been set are used to define aliases, the offsetting is not needed (there's no much sense to
 # define an alias to a symbol defined before the current BASE address has been set anyways)
 class FirstPassDriver(AsmParserObserver):
-    def __init__(self):
+    # Opcodes of the instructions that 'on_compact_statements' may not skip over
+    CHECKED_OPCODES = set(ISA[mnemonic] for mnemonic in LOOP_BRANCHES | set(['HLT']))
+
+    def __init__(self, sym_tbl=None):
         self.base_addr = 0
         self.curr_addr = 0
         self.halt_reached = False
         self.end_reached = False
-        self.sym_tbl = SymbolTable()
+        self.sym_tbl = sym_tbl if sym_tbl is not None else SymbolTable()
+        # Symbols of the literal operands (i.e. '=5'), in the order of their first use
+        self.literals = []
+        self.literal_set = set()
+        # Memory regions, the addresses of the ANCHOR directives (in order) and the
+        # allocated [start, end) address ranges between them
+        self.memory_map = MemoryMap()
+        self.anchors = []
+        self.segments = []
+        self.segment_start = 0
+        # Backward branches as (label, loop start, loop end) and the warnings about them
+        self.loops = []
+        self.warnings = []
+        # TABLE directives and their addresses as (stmt, address)
+        self.tables = []
+
+    # Defines the symbol (looked up only once) at the given address
+    def define_symbol(self, symbol, address, kind='symbol'):
+        self.define_symbol_id(self.sym_tbl.get_id(symbol), address, kind)
+
+    def define_symbol_id(self, symbol_id, address, kind='symbol'):
+        if self.sym_tbl.is_defined(symbol_id):
+            raise SyntaxError('redefinition of the %s "%s"' % (kind, self.sym_tbl.names[symbol_id]))
+
+        self.sym_tbl.set_address(symbol_id, address)
 
     def get_symbol_table(self):
         return self.sym_tbl
@@ -74,21 +135,72 @@ class FirstPassDriver(AsmParserObserver):
         elif stmt.Mnemonic == 'HLT':
             self.halt_reached = True
 
+        if not stmt.HasAbsoluteAddress and stmt.Address[0] == '=' and stmt.Address not in self.literal_set:
+            self.literals.append(stmt.Address)
+            self.literal_set.add(stmt.Address)
+        elif stmt.Mnemonic in LOOP_BRANCHES and not stmt.HasAbsoluteAddress:
+            label = stmt.Address
+            if stmt.IndirectOrIODeviceBit:
+                # The far branch (see FarAddressing) goes to the symbol of its pointer
+                label = label[1:] if is_pointer_symbol(label) else None
+            if label is not None and self.sym_tbl.contains(label):
+                target = self.sym_tbl.get_address(label)
+                if target <= self.curr_addr:
+                    self.loops.append((label, target, self.curr_addr + 1))
+
         self.curr_addr += 1
         return True
 
+    # Consumes the compact statement columns directly (i.e. in the passes over the
+    # optimized statements). The plain instructions, the labels and the BSS and BSC
+    # directives after HLT only advance the address or define their symbol by id;
+    # the other statements are re-created and handled as usual
+    def on_compact_statements(self, statements):
+        if statements.sym_tbl is not self.sym_tbl:
+            return False
+
+        names = statements.names
+        for row in range(0, len(statements)):
+            kind = statements.kinds[row]
+            symbol = statements.symbols[row]
+            try:
+                if kind == CompactStatements.INSTRUCTION:
+                    if self.halt_reached or statements.opcodes[row] in FirstPassDriver.CHECKED_OPCODES \
+                            or (symbol != -1 and names[symbol][0] == '='):
+                        self.on_instruction(statements.get_stmt(row))
+                    else:
+                        self.curr_addr += 1
+                elif kind == CompactStatements.LABEL and not self.halt_reached:
+                    self.define_symbol_id(symbol, self.curr_addr, 'label')
+                elif kind == CompactStatements.BSS and self.halt_reached:
+                    self.define_symbol_id(symbol, self.curr_addr)
+                    self.curr_addr += statements.operands[row]
+                elif kind == CompactStatements.BSC and self.halt_reached and not is_pointer_symbol(names[symbol]):
+                    ordinal = statements.operands[row]
+                    start = statements.constant_ends[ordinal - 1] if ordinal > 0 else 0
+                    self.define_symbol_id(symbol, self.curr_addr)
+                    self.curr_addr += statements.constant_ends[ordinal] - start
+                elif kind == CompactStatements.LABEL:
+                    self.on_label(statements.get_stmt(row))
+                elif not self.on_directive(statements.get_stmt(row)):
+                    break
+            except SyntaxError as err:
+                err.lineno = statements.linenos[row]
+                raise err
+
+        return True
+
     def on_label(self, stmt):
         if self.halt_reached:
             raise SyntaxError('label definition may not appear after the HTL instruction')
 
-        if self.sym_tbl.contains(stmt.Label):
-            raise SyntaxError('redefinition of the label "%s"' % stmt.Label)
-
-        self.sym_tbl.add_entry(stmt.Label, self.curr_addr)
+        self.define_symbol(stmt.Label, self.curr_addr, 'label')
         return True
 
     def on_directive(self, stmt):
-        if stmt.DirType != DirectiveType.ANCHOR and not self.halt_reached:
+        if stmt.DirType not in [DirectiveType.ANCHOR, DirectiveType.REGION] and not self.halt_reached and not (
+                stmt.DirType == DirectiveType.BSC and is_pointer_symbol(stmt.ConstantSymbol)):
+            # Only the pointer words (see FarAddressing) may precede HLT
             raise SyntaxError('HLT instruction expected')
 
         # If END is reached terminate the parsing process
@@ -96,10 +208,18 @@ class FirstPassDriver(AsmParserObserver):
             self.end_reached = True
             return False
         elif stmt.DirType == DirectiveType.ANCHOR:
-            # FIXME: disabled until I figure out how exactly the behaviour should be like
-            #self.base_addr = stmt.AbsAddress
-            #self.curr_addr = stmt.AbsAddress
-            raise SyntaxError('directive "%s" is not yet supported' % stmt.Directive)
+            self.close_segment()
+            if hasattr(stmt, 'RegionName'):
+                address = self.memory_map.get_region(stmt.RegionName).next_addr
+            else:
+                address = stmt.AbsAddress
+            self.anchors.append(address)
+            self.base_addr = address
+            self.curr_addr = address
+            self.segment_start = address
+        elif stmt.DirType == DirectiveType.REGION:
+            self.memory_map.add_region(
+                MemoryRegion(stmt.RegionName, stmt.RegionStart, stmt.RegionEnd, stmt.RegionKind))
         elif stmt.DirType == DirectiveType.ALIAS:
             if self.sym_tbl.contains(stmt.AliasSymbol):
                 raise SyntaxError('redefinition of the symbol "%s"' % stmt.AliasSymbol)
@@ -131,25 +251,27 @@ class FirstPassDriver(AsmParserObserver):
                             'target address for alias "%s" evaluates to a negative number "%s"' %
                             (stmt.AliasSymbol, str(address)))
 
-            self.sym_tbl.add_entry(stmt.AliasSymbol, address)
+            self.define_symbol(stmt.AliasSymbol, address)
 
         elif stmt.DirType == DirectiveType.BSS:
             # FIXME: allow BSS directive where allocation size is a known BSC constant
-            if self.sym_tbl.contains(stmt.VariableSymbol):
-                raise SyntaxError('redefinition of the symbol "%s"' % stmt.VariableSymbol)
-
-            self.sym_tbl.add_entry(stmt.VariableSymbol, self.curr_addr)
+            self.define_symbol(stmt.VariableSymbol, self.curr_addr)
             self.curr_addr += stmt.AllocSize
 
         else:
             # BSC
             # FIXME: allow BSC directive where literal is a known BCS constant
-            if self.sym_tbl.contains(stmt.ConstantSymbol):
-                raise SyntaxError('redefinition of the symbol "%s"' % stmt.ConstantSymbol)
-
-            self.sym_tbl.add_entry(stmt.ConstantSymbol, self.curr_addr)
+            self.define_symbol(stmt.ConstantSymbol, self.curr_addr)
+            if stmt.Directive == 'TABLE':
+                self.tables.append((stmt, self.curr_addr))
             self.curr_addr += len(stmt.Constants)
 
+            # The literal may be addressed through its pointer only
+            symbol = stmt.ConstantSymbol[1:]
+            if is_pointer_symbol(stmt.ConstantSymbol) and symbol[0] == '=' and symbol not in self.literal_set:
+                self.literals.append(symbol)
+                self.literal_set.add(symbol)
+
         return True
 
     def on_finished(self):
@@ -158,11 +280,77 @@ class FirstPassDriver(AsmParserObserver):
         elif not self.end_reached:
             raise SyntaxError('END directive expected')
 
+        self.define_literals()
+        self.close_segment()
+        self.check_loops()
+
+    # Adds the words allocated since the last ANCHOR to the segments, checking
+    # that they don't overlap the earlier ones and fit in their memory region
+    def close_segment(self):
+        start, end = self.segment_start, self.curr_addr
+        self.segment_start = self.curr_addr
+        if end == start:
+            return
+        elif end > 0x10000:
+            raise SyntaxError('the program exceeds the address space (0x%04x words)' % end)
+
+        for other_start, other_end in self.segments:
+            if start < other_end and other_start < end:
+                raise SyntaxError('the words 0x%04x-0x%04x overlap the words 0x%04x-0x%04x allocated earlier'
+                                  % (start, end - 1, other_start, other_end - 1))
+        region = self.memory_map.find_region(start)
+        if region is not None:
+            if end - 1 > region.end:
+                raise SyntaxError('memory region "%s" overflows by %d words' % (region.name, end - 1 - region.end))
+            region.next_addr = max(region.next_addr, end)
+            region.used_words += end - start
+        self.segments.append((start, end))
+
+    # Warns about the loops (the hot code) placed in the slow memory regions
+    def check_loops(self):
+        for label, start, end in self.loops:
+            for region in self.memory_map.find_regions(start, end):
+                if region.is_slow():
+                    self.warnings.append('loop at "%s" (0x%04x-0x%04x) is placed in the %s region %s'
+                                         % (label, start, end - 1, region.kind, region.name))
+
+    # Returns the size of the memory image (the end of the highest allocated word)
+    def get_word_count(self):
+        return max([self.curr_addr] + [end for start, end in self.segments])
+
+    # Allocates the literal pool, one word per distinct literal, after the data.
+    # The literals already placed in the data (by the data layout) are left out
+    def define_literals(self):
+        self.literals = [symbol for symbol in self.literals if not self.sym_tbl.contains(symbol)]
+        for symbol in self.literals:
+            self.define_symbol(symbol, self.curr_addr, 'literal')
+            self.curr_addr += 1
+
+
+# Counts the instructions addressing each of the given symbols
+class LookupCounter(AsmParserObserver):
+    def __init__(self, symbols):
+        self.lookups = dict((symbol, 0) for symbol in symbols)
+
+    def on_instruction(self, stmt):
+        if not stmt.HasAbsoluteAddress and stmt.Address in self.lookups:
+            self.lookups[stmt.Address] += 1
+        return True
+
+    def on_label(self, stmt):
+        return True
+
+    def on_directive(self, stmt):
+        return stmt.DirType != DirectiveType.END
+
+    def on_finished(self):
+        pass
+
 
 # FIXME: each constant must be in range [-32768, 32767]
 # FIXME: no address may exceed 2^16 - 1 = 65535
 class SecondPassDriver(AsmParserObserver):
-    def __init__(self, sym_tbl, generators):
+    def __init__(self, sym_tbl, generators, literals=(), anchors=()):
         if not isinstance(sym_tbl, SymbolTable):
             raise RuntimeError('sym_tbl must be an instance of SymbolTable')
         if not isinstance(generators, tuple):
@@ -175,18 +363,35 @@ class SecondPassDriver(AsmParserObserver):
 
         self.sym_tbl = sym_tbl
         self.generators = generators
+        # Literal symbols whose words are emitted after the data (see FirstPassDriver)
+        self.literals = literals
+        # Addresses of the ANCHOR directives, as resolved by the first pass
+        self.anchors = iter(anchors)
+        # CompilerStats that collects the time spent on finishing the code (if set)
+        self.stats = None
+
+    # Resolves the symbolic address of the instruction with a plain index into
+    # the address vector of the symbol table
+    def resolve(self, stmt):
+        symbol_id = stmt.SymbolId
+        if symbol_id is None:
+            symbol_id = self.sym_tbl.get_id(stmt.Address)
+
+        physical_addr = self.sym_tbl.addresses[symbol_id]
+        if physical_addr == SymbolTable.UNDEFINED:
+            raise SyntaxError('undefined variable "%s"' % stmt.Address)
+        elif physical_addr > 255:
+            raise SyntaxError(
+                'physical address (%s) of the symbol "%s" is out of bounds (0-255)' %
+                (str(physical_addr), stmt.Address))
+
+        return physical_addr
 
     def on_instruction(self, stmt):
         if stmt.HasAbsoluteAddress:
             physical_addr = stmt.Address
-        elif not self.sym_tbl.contains(stmt.Address):
-            raise SyntaxError('undefined variable "%s"' % stmt.Address)
         else:
-            physical_addr = self.sym_tbl.get_address(stmt.Address)
-            if physical_addr > 255:
-                raise SyntaxError(
-                    'physical address (%s) of the symbol "%s" is out of bounds (0-255)' %
-                    (str(physical_addr), stmt.Address))
+            physical_addr = self.resolve(stmt)
 
         for generator in self.generators:
             generator.on_instruction(
@@ -198,6 +403,53 @@ class SecondPassDriver(AsmParserObserver):
 
         return True
 
+    # Consumes the compact statement columns directly. The symbol ids of the
+    # columns index the address vector of the symbol table, and the instruction
+    # fields are passed to the generators straight from the columns
+    def on_compact_statements(self, statements):
+        if statements.sym_tbl is self.sym_tbl:
+            addresses = self.sym_tbl.addresses
+        else:
+            addresses = array('l', [self.sym_tbl.symbols.get(name, SymbolTable.UNDEFINED)
+                                    for name in statements.names])
+
+        for row in range(0, len(statements)):
+            kind = statements.kinds[row]
+            if kind == CompactStatements.LABEL:
+                continue
+            elif kind != CompactStatements.INSTRUCTION:
+                try:
+                    self.on_directive(statements.get_stmt(row))
+                except SyntaxError as err:
+                    err.lineno = statements.linenos[row]
+                    raise err
+                continue
+
+            symbol = statements.symbols[row]
+            if symbol == -1:
+                physical_addr = statements.operands[row]
+            else:
+                physical_addr = addresses[symbol]
+                if physical_addr == SymbolTable.UNDEFINED or physical_addr > 255:
+                    # Reports the error (the symbol is looked up by name)
+                    stmt = statements.get_stmt(row)
+                    stmt.SymbolId = None
+                    try:
+                        self.on_instruction(stmt)
+                    except SyntaxError as err:
+                        err.lineno = statements.linenos[row]
+                        raise err
+
+            for generator in self.generators:
+                generator.on_instruction(
+                    statements.opcodes[row]
+                    , statements.indirect_bits[row]
+                    , statements.indexes[row]
+                    , physical_addr
+                    , statements.stmt_strings[row])
+
+        return True
+
     def on_label(self, stmt):
         return True
 
@@ -208,65 +460,591 @@ class SecondPassDriver(AsmParserObserver):
         elif stmt.DirType == DirectiveType.BSC:
             for generator in self.generators:
                 generator.on_bsc_directive(stmt)
+        elif stmt.DirType == DirectiveType.ANCHOR:
+            address = next(self.anchors)
+            for generator in self.generators:
+                generator.on_anchor(address)
+
+        return True
+
+    def on_finished(self):
+        for symbol in self.literals:
+            self.on_directive(make_literal_directive(symbol))
+
+        if self.stats is not None:
+            self.stats.start_phase('emit')
+        for generator in self.generators:
+            generator.on_finished()
+        if self.stats is not None:
+            self.stats.end_phase('emit')
+
+
+# Performs the whole compilation in a single pass over the source: the statements
+# are checked and the symbols defined as in the first pass, and the code is emitted
+# straight away. Forward references (symbols not yet defined when the instruction
+# is emitted) are recorded in a patch list, as (instruction address, symbol id)
+# pairs, and the generators patch the address fields of those instructions once the
+# source has been parsed. Only the generators that support 'patch_address' (BIN,
+# HEX and MIF) may be used. Useful when the source cannot be read twice
+class SinglePassDriver(FirstPassDriver):
+    def __init__(self, generators):
+        FirstPassDriver.__init__(self)
+        for generator in generators:
+            if not generator.can_patch():
+                raise RuntimeError('%s does not support the single-pass compilation' % generator.__class__.__name__)
+
+        self.generators = generators
+        self.patch_addrs = array('l')
+        self.patch_ids = array('l')
+        # Source lines of the forward references, to report their errors at
+        self.patch_linenos = array('l')
+        # AsmParser whose current line is recorded with the forward references (if set)
+        self.parser = None
+        # CompilerStats that collects the time spent on finishing the code (if set)
+        self.stats = None
+
+    def on_instruction(self, stmt):
+        instr_addr = self.curr_addr
+        FirstPassDriver.on_instruction(self, stmt)
+        if stmt.HasAbsoluteAddress:
+            physical_addr = stmt.Address
+        else:
+            symbol_id = stmt.SymbolId
+            if symbol_id is None:
+                symbol_id = self.sym_tbl.get_id(stmt.Address)
+
+            physical_addr = self.sym_tbl.addresses[symbol_id]
+            if physical_addr == SymbolTable.UNDEFINED:
+                self.patch_addrs.append(instr_addr)
+                self.patch_ids.append(symbol_id)
+                self.patch_linenos.append(self.parser.last_lineno if self.parser is not None else 0)
+                physical_addr = 0
+            elif physical_addr > 255:
+                raise SyntaxError(
+                    'physical address (%s) of the symbol "%s" is out of bounds (0-255)' %
+                    (str(physical_addr), stmt.Address))
+
+        for generator in self.generators:
+            generator.on_instruction(
+                stmt.Opcode
+                , stmt.IndirectOrIODeviceBit
+                , stmt.Index
+                , physical_addr
+                , stmt.StmtString)
+
+        return True
+
+    def on_directive(self, stmt):
+        if not FirstPassDriver.on_directive(self, stmt):
+            return False
+
+        if stmt.DirType == DirectiveType.BSS:
+            for generator in self.generators:
+                generator.on_bss_directive(stmt)
+        elif stmt.DirType == DirectiveType.BSC:
+            for generator in self.generators:
+                generator.on_bsc_directive(stmt)
+        elif stmt.DirType == DirectiveType.ANCHOR:
+            for generator in self.generators:
+                generator.on_anchor(self.curr_addr)
 
         return True
 
+    # Resolves the forward references
     def on_finished(self):
+        FirstPassDriver.on_finished(self)
+        for symbol in self.literals:
+            literal_stmt = make_literal_directive(symbol)
+            for generator in self.generators:
+                generator.on_bsc_directive(literal_stmt)
+
+        if self.stats is not None:
+            self.stats.start_phase('emit')
+
+        addresses = self.sym_tbl.addresses
+        for instr_addr, symbol_id, lineno in zip(self.patch_addrs, self.patch_ids, self.patch_linenos):
+            physical_addr = addresses[symbol_id]
+            try:
+                if physical_addr == SymbolTable.UNDEFINED:
+                    raise SyntaxError('undefined variable "%s"' % self.sym_tbl.names[symbol_id])
+                elif physical_addr > 255:
+                    raise SyntaxError(
+                        'physical address (%s) of the symbol "%s" is out of bounds (0-255)' %
+                        (str(physical_addr), self.sym_tbl.names[symbol_id]))
+            except SyntaxError as err:
+                # Reported at the line of the instruction rather than at the END
+                if lineno != 0:
+                    err.lineno = lineno
+                raise err
+
+            for generator in self.generators:
+                generator.patch_address(instr_addr, physical_addr)
+
         for generator in self.generators:
             generator.on_finished()
+        if self.stats is not None:
+            self.stats.end_phase('emit')
 
 
-# Drives the overall two-pass compilation process
+# Drives the overall two-pass compilation process. The out_format and dest_filename
+# may be lists (of the same length) in which case the code in all the given formats
+# is produced from a single parse and a single second pass. If a CompilationCache
+# is given and it holds the code for the source in all the requested formats, the
+# parsing and both passes are skipped. If the source (a string, a list of lines or
+# a file-like object) is given, it is assembled instead of the src_filename file
+# and src_filename is only used as a virtual name in the diagnostics. If stats is
+# set (or an observer is added), the per-phase times and the counters are collected
+# in the CompilerStats ('get_stats'). If single_pass is set, the code is generated
+# during the only pass over the source (see SinglePassDriver). If a CycleModel is
+# given, the PRETTY listing is annotated with the clock cycle estimates
 class CompilerEngine:
-    def __init__(self, src_filename, dest_filename, out_format):
+    SINGLE_PASS_FORMATS = ['BIN', 'HEX', 'MIF']
+    # Attributes holding the reports of the compilation (see 'get_reports')
+    REPORTS = ['memory_map', 'warnings', 'lookup_tables', 'saved_words', 'optimizer', 'constant_pool'
+               , 'data_layout', 'utilization_map', 'far_addressing']
+
+    def __init__(self, src_filename, dest_filename, out_format, lexer='REGEX', streaming=False
+                 , compact=False, cache=None, source=None, stats=False, single_pass=False
+                 , cycle_model=None, optimize=False, pool_constants=False
+                 , layout=False, layout_profile=None, far_pointers=False):
+        if isinstance(out_format, str):
+            out_format = [out_format]
+        if dest_filename is None or isinstance(dest_filename, str):
+            dest_filename = [dest_filename] * len(out_format)
+        if len(dest_filename) != len(out_format):
+            raise RuntimeError('each output format must have its destination file')
+        dest_paths = [os.path.abspath(filename) for filename in dest_filename if filename is not None]
+        for i, dest_path in enumerate(dest_paths):
+            if dest_path in dest_paths[:i]:
+                raise RuntimeError('the destination file "%s" is given more than once' % dest_path)
+        if single_pass:
+            for fmt in out_format:
+                if fmt not in CompilerEngine.SINGLE_PASS_FORMATS:
+                    raise RuntimeError('the single-pass compilation does not support the %s format' % fmt)
+        if layout_profile is not None:
+            layout = True
+        if (optimize or pool_constants or layout or far_pointers) and (single_pass or streaming):
+            raise RuntimeError('the optimization requires the parsed statements (no streaming or single pass)')
+        if compact and (single_pass or streaming):
+            raise RuntimeError('the compact representation keeps the parsed statements (no streaming or single pass)')
+
         self.src_filename = src_filename
-        self.dest_filename = dest_filename
-        self.out_format = out_format
-        self.generator = None
+        self.source = source
+        self.lexer = lexer
+        self.streaming = streaming
+        self.compact = compact
+        self.single_pass = single_pass
+        self.cycle_model = cycle_model
+        self.optimize = optimize
+        self.optimizer = None
+        self.pool_constants = pool_constants
+        self.constant_pool = None
+        self.saved_words = 0
+        self.layout = layout
+        # Executions per instruction address weighting the uses of the data (or None)
+        self.layout_profile = layout_profile
+        self.data_layout = None
+        self.utilization_map = None
+        self.far_pointers = far_pointers
+        self.far_addressing = None
+        self.dest_filenames = list(dest_filename)
+        self.out_formats = list(out_format)
+        self.cache = cache
+        self.cache_hit = False
+        self.generators = []
+        self.sym_tbl = None
+        self.word_count = 0
+        # Memory regions of the program, the warnings of the compilation and the
+        # generated tables (restored along with the code taken from the cache)
+        self.memory_map = None
+        self.warnings = []
+        self.lookup_tables = []
+        self.stats = CompilerStats() if stats else None
         self.compilation_done = False
 
-    def run(self):
+    def add_observer(self, observer):
+        if self.stats is None:
+            self.stats = CompilerStats()
+        self.stats.add_observer(observer)
+
+    def get_stats(self):
+        return self.stats
+
+    def start_phase(self, phase):
+        if self.stats is not None:
+            self.stats.start_phase(phase)
+
+    def end_phase(self, phase):
+        if self.stats is not None:
+            self.stats.end_phase(phase)
+
+    # The binary image of the binary-based generators is preallocated for word_count words
+    def create_generator(self, out_format, sink, word_count=0, sym_tbl=None):
+        if out_format == 'PRETTY':
+            return PrettyGenerator(sink, self.cycle_model, sym_tbl)
+        elif out_format == 'MIF':
+            return MifGenerator(sink, word_count)
+        elif out_format == 'HEX':
+            return HexGenerator(sink, word_count)
+        else:
+            return BinaryGenerator(sink, word_count)
+
+    # If the sinks (file-like objects, one per output format) are given, the generated
+    # code is written to them while the code is being generated
+    def run(self, sinks=None):
+        self.run_phases(sinks)
+        self.finish_stats(sinks)
+
+    def run_phases(self, sinks):
+        if self.stats is not None:
+            self.stats.reset()
         self.compilation_done = False
-        parser = AsmParser(self.src_filename)
-        if self.out_format == 'PRETTY':
-            self.generator = PrettyGenerator()
-        elif self.out_format == 'MIF':
-            self.generator = MifGenerator()
-        elif self.out_format == 'HEX':
-            self.generator = HexGenerator()
+        self.cache_hit = False
+        if sinks is None:
+            sinks = [None] * len(self.out_formats)
+
+        self.start_phase('cache')
+        if self.cache is not None and self.source is None:
+            src_hash = CompilationCache.hash_source(self.src_filename)
+        elif self.cache is not None and isinstance(self.source, basestring):
+            src_hash = CompilationCache.hash_text(self.source)
+        else:
+            src_hash = None
+
+        if src_hash is not None:
+            keys = [CompilationCache.get_key(src_hash, self.get_variant(out_format)) for out_format in self.out_formats]
+            cached = self.run_cached(keys, sinks)
+            self.end_phase('cache')
+            if cached:
+                return
+
+            # The code is generated in memory so that it can be stored in the cache
+            self.compile([None] * len(self.out_formats))
+            self.start_phase('cache')
+            for key, generator in zip(keys, self.generators):
+                self.cache.store(key, generator.get_generated_code(), self.sym_tbl.symbols, self.word_count
+                                 , self.get_reports())
+            self.end_phase('cache')
+
+            self.start_phase('emit')
+            for generator, sink in zip(self.generators, sinks):
+                if sink is not None:
+                    sink.write(generator.get_generated_code())
+            self.end_phase('emit')
         else:
-            self.generator = BinaryGenerator()
+            self.end_phase('cache')
+            self.compile(sinks)
+
+        self.compilation_done = True
+
+    # Sets the final counters and notifies the observers
+    def finish_stats(self, sinks):
+        if self.stats is None or not self.compilation_done:
+            return
+
+        if sinks is None:
+            sinks = [None] * len(self.out_formats)
+        output_bytes = 0
+        for generator, sink in zip(self.generators, sinks):
+            if sink is None:
+                output_bytes += len(generator.get_generated_code())
+            elif hasattr(sink, 'tell'):
+                output_bytes += sink.tell()
+
+        self.stats.set_counter('symbols', len(self.sym_tbl.symbols))
+        self.stats.set_counter('words', self.word_count)
+        self.stats.set_counter('output_bytes', output_bytes)
+        self.stats.finish()
+
+    # Returns the name of the format variant under which the code is cached
+    def get_variant(self, out_format):
+        variant = out_format
+        if out_format == 'PRETTY' and self.cycle_model is not None:
+            variant = '%s:cycles:%d,%d,%d' % (out_format, self.cycle_model.read_cycles
+                                              , self.cycle_model.write_cycles, self.cycle_model.io_cycles)
+        if self.optimize:
+            variant += ':optimized'
+        if self.pool_constants:
+            variant += ':pooled'
+        if self.layout_profile is not None:
+            variant += ':layout:%08x' % (crc32(array('L', self.layout_profile).tostring()) & 0xFFFFFFFF)
+        elif self.layout:
+            variant += ':layout'
+        if self.far_pointers:
+            variant += ':far'
+        return variant
+
+    # Returns the reports of the compilation (by the name of their attribute), stored
+    # in the cache along with the code
+    def get_reports(self):
+        return dict((name, getattr(self, name)) for name in CompilerEngine.REPORTS)
+
+    # Takes the code from the cache. Succeeds only if all the formats are cached
+    def run_cached(self, keys, sinks):
+        entries = []
+        for key in keys:
+            entry = self.cache.lookup(key)
+            if entry is None:
+                return False
+            entries.append(entry)
+
+        self.generators = [CachedGenerator(entry['code'], sink) for entry, sink in zip(entries, sinks)]
+        self.sym_tbl = SymbolTable()
+        for symbol, address in entries[0]['symbols'].items():
+            self.sym_tbl.add_entry(symbol, address)
+        self.word_count = entries[0]['word_count']
+        for name, report in entries[0]['reports'].items():
+            setattr(self, name, report)
+        self.cache_hit = True
+        self.compilation_done = True
+        return True
+
+    def compile(self, sinks):
+        if self.single_pass:
+            self.compile_single_pass(sinks)
+            return
+
+        self.start_phase('read')
+        parser = AsmParser(self.src_filename, self.lexer, self.streaming, self.compact, self.source)
+        parser.stats = self.stats
+        self.end_phase('read')
 
         # First pass
         first_pass_driver = FirstPassDriver()
+        self.start_phase('first_pass')
         parser.parse(first_pass_driver)
+        self.end_phase('first_pass')
+        if self.stats is not None:
+            wall_time, cpu_time = parser.tokenize_time
+            self.stats.move_time('first_pass', 'tokenize', wall_time, cpu_time)
+            self.stats.set_counter('lines', parser.last_lineno)
 
-        # Second pass
-        second_pass_driver = SecondPassDriver(first_pass_driver.get_symbol_table(), tuple([self.generator]))
+        if self.optimize or self.pool_constants or self.layout or self.far_pointers:
+            first_pass_driver = self.optimize_statements(parser, first_pass_driver)
+
+        # The generators are created once the size of the image is known
+        self.generators = [self.create_generator(out_format, sink, first_pass_driver.get_word_count()
+                                                 , first_pass_driver.get_symbol_table())
+                           for out_format, sink in zip(self.out_formats, sinks)]
+
+        # Second pass (the 'emit' phase is measured by the driver itself)
+        second_pass_driver = SecondPassDriver(first_pass_driver.get_symbol_table(), tuple(self.generators)
+                                              , first_pass_driver.literals, first_pass_driver.anchors)
+        second_pass_driver.stats = self.stats
+        self.start_phase('second_pass')
         parser.iterate(second_pass_driver)
+        self.end_phase('second_pass')
+        if self.stats is not None:
+            emit = self.stats.phases['emit']
+            self.stats.add_time('second_pass', -emit['wall'], -emit['cpu'])
 
-        self.compilation_done = True
+        self.sym_tbl = first_pass_driver.get_symbol_table()
+        self.word_count = first_pass_driver.get_word_count()
+        self.memory_map = first_pass_driver.memory_map
+        self.warnings = first_pass_driver.warnings
+        self.lookup_tables = self.get_lookup_tables(parser, first_pass_driver.tables)
 
-    def write(self):
+    # Runs the constant pooling, the peephole optimizer, the data layout (so that the
+    # profile matches the final code) and the far addressing (which needs the final
+    # addresses) over the parsed statements. The addresses of the symbols are
+    # recomputed by another first pass over the optimized statements (the symbol ids
+    # are kept). Returns the driver of that pass
+    def optimize_statements(self, parser, first_pass_driver):
+        self.start_phase('optimize')
+        word_count = first_pass_driver.get_word_count()
+        sym_tbl = first_pass_driver.get_symbol_table()
+        stmt_pairs = parser.get_statements()
+        if self.pool_constants:
+            self.constant_pool = ConstantPool()
+            stmt_pairs = self.constant_pool.optimize(stmt_pairs)
+        if self.optimize:
+            self.optimizer = PeepholeOptimizer(self.cycle_model)
+            stmt_pairs = self.optimizer.optimize(stmt_pairs)
+        if self.layout:
+            self.data_layout = DataLayout(self.layout_profile)
+            stmt_pairs = self.data_layout.optimize(stmt_pairs)
+        if self.far_pointers:
+            self.far_addressing = FarAddressing(self.cycle_model)
+            stmt_pairs = self.far_addressing.rewrite(
+                stmt_pairs, lambda stmt_pairs: self.assign_addresses(parser, stmt_pairs, sym_tbl))
+
+        first_pass_driver = self.assign_addresses(parser, stmt_pairs, sym_tbl)
+        self.saved_words = word_count - first_pass_driver.get_word_count()
+        if self.far_addressing is not None:
+            self.saved_words += self.far_addressing.added_words
+        if self.layout:
+            self.utilization_map = get_utilization_map(stmt_pairs, first_pass_driver.literals
+                                                       , first_pass_driver.anchors)
+        self.end_phase('optimize')
+        if self.stats is not None:
+            if self.optimizer is not None:
+                self.stats.set_counter('optimized_instructions', self.optimizer.removed_instructions)
+                self.stats.set_counter('optimized_cycles', self.optimizer.saved_cycles)
+            if self.constant_pool is not None:
+                self.stats.set_counter('pooled_constants'
+                                       , self.constant_pool.merged_constants + self.constant_pool.pooled_literals)
+            if self.data_layout is not None:
+                self.stats.set_counter('moved_data', self.data_layout.moved_symbols)
+            if self.far_addressing is not None:
+                self.stats.set_counter('far_references', len(self.far_addressing.rewrites))
+            self.stats.set_counter('saved_words', self.saved_words)
+        return first_pass_driver
+
+    # Replaces the statements of the parser and defines their symbols (keeping the
+    # symbol ids) by a first pass, whose driver is returned
+    def assign_addresses(self, parser, stmt_pairs, sym_tbl):
+        parser.replace_statements(stmt_pairs)
+        sym_tbl.clear_addresses()
+        first_pass_driver = FirstPassDriver(sym_tbl)
+        parser.iterate(first_pass_driver)
+        return first_pass_driver
+
+    # Returns the LookupTable of each TABLE directive, with the instructions using
+    # the table counted by another pass over the (final) statements
+    def get_lookup_tables(self, parser, tables):
+        if len(tables) == 0:
+            return []
+
+        counter = LookupCounter(stmt.ConstantSymbol for stmt, address in tables)
+        parser.iterate(counter)
+        cycle_model = self.cycle_model if self.cycle_model is not None else CycleModel()
+        return [LookupTable(stmt, address, counter.lookups[stmt.ConstantSymbol], cycle_model)
+                for stmt, address in tables]
+
+    def compile_single_pass(self, sinks):
+        # Neither the source lines nor the statements need to be kept
+        self.start_phase('read')
+        parser = AsmParser(self.src_filename, self.lexer, True, False, self.source)
+        parser.stats = self.stats
+        self.end_phase('read')
+        self.generators = [self.create_generator(out_format, sink)
+                           for out_format, sink in zip(self.out_formats, sinks)]
+
+        driver = SinglePassDriver(tuple(self.generators))
+        driver.parser = parser
+        driver.stats = self.stats
+        self.start_phase('first_pass')
+        parser.parse(driver)
+        self.end_phase('first_pass')
+        if self.stats is not None:
+            wall_time, cpu_time = parser.tokenize_time
+            self.stats.move_time('first_pass', 'tokenize', wall_time, cpu_time)
+            emit = self.stats.phases['emit']
+            self.stats.add_time('first_pass', -emit['wall'], -emit['cpu'])
+            self.stats.set_counter('lines', parser.last_lineno)
+            self.stats.set_counter('forward_refs', len(driver.patch_addrs))
+
+        self.sym_tbl = driver.get_symbol_table()
+        self.word_count = driver.get_word_count()
+        self.memory_map = driver.memory_map
+        self.warnings = driver.warnings
+        self.lookup_tables = self.get_lookup_tables(parser, driver.tables)
+
+    def get_symbol_table(self):
         if not self.compilation_done:
             raise RuntimeError('compilation has not been completed yet')
+
+        return self.sym_tbl
+
+    def get_write_mode(self, out_format):
+        if out_format in ['PRETTY', 'HEX', 'MIF']:
+            return 'w'
+        else:
+            return 'wb'
+
+    # Runs the compilation writing the generated code straight to temporary files
+    # (through buffered sinks) in the directories of the destination files. Once
+    # the compilation succeeds they are renamed over the destination files, so a
+    # failed compilation leaves the previous outputs intact
+    def run_to_file(self):
+        dest_files = []
+        tmp_paths = []
         try:
-            if self.out_format in ['PRETTY', 'HEX', 'MIF']:
-                mode = 'w'
-            else:
-                mode = 'wb'
+            for dest_filename, out_format in zip(self.dest_filenames, self.out_formats):
+                tmp_path, dest_file = self.open_temp_file(dest_filename, out_format)
+                tmp_paths.append(tmp_path)
+                dest_files.append(dest_file)
 
-            with open(self.dest_filename, mode) as dest_file:
-                    dest_file.write(self.generator.get_generated_code())
+            self.run_phases(dest_files)
+            self.start_phase('emit')
+            for dest_file in dest_files:
+                dest_file.flush()
+            self.end_phase('emit')
+            self.finish_stats(dest_files)
+            for dest_file in dest_files:
+                dest_file.close()
+            for tmp_path, dest_filename in zip(list(tmp_paths), self.dest_filenames):
+                try:
+                    os.rename(tmp_path, dest_filename)
+                except OSError:
+                    raise IOError('failed to write to "%s" file' % os.path.abspath(dest_filename))
+                tmp_paths.remove(tmp_path)
+        except:
+            for dest_file in dest_files:
+                dest_file.close()
+            for tmp_path in tmp_paths:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            raise
+
+    # Creates a temporary file next to the destination file, with the permissions
+    # of a newly created file. Returns its path and the file opened for writing
+    def open_temp_file(self, dest_filename, out_format):
+        dest_dir, name = os.path.split(os.path.abspath(dest_filename))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=dest_dir, prefix='.%s.' % name, suffix='.tmp')
+        except OSError:
+            raise IOError('failed to write to "%s" file' % os.path.abspath(dest_filename))
 
-        except IOError:
-            raise IOError('failed to write to "%s" file' % os.path.abspath(self.dest_filename))
+        umask = os.umask(0)
+        os.umask(umask)
+        os.fchmod(fd, 0666 & ~umask)
+        return tmp_path, os.fdopen(fd, self.get_write_mode(out_format), 1 << 16)
 
-    def get_code_pretty(self):
+    def write(self):
+        if not self.compilation_done:
+            raise RuntimeError('compilation has not been completed yet')
+
+        for dest_filename, out_format, generator in zip(self.dest_filenames, self.out_formats, self.generators):
+            try:
+                with open(dest_filename, self.get_write_mode(out_format)) as dest_file:
+                        dest_file.write(generator.get_generated_code())
+
+            except IOError:
+                raise IOError('failed to write to "%s" file' % os.path.abspath(dest_filename))
+
+    # Returns the printable code generated in the given format (the first one if omitted)
+    # or by the generator at the given position (i.e. of a repeated format)
+    def get_code_pretty(self, out_format=None, position=None):
         if not self.compilation_done:
             raise RuntimeError('compilation has not been completed yet')
 
-        if self.out_format == 'BIN':
-            return hexlify(self.generator.get_generated_code())
+        if position is None:
+            position = 0 if out_format is None else self.out_formats.index(out_format)
+        out_format = self.out_formats[position]
+        generator = self.generators[position]
+        if out_format == 'BIN':
+            return hexlify(generator.get_generated_code())
         else:
-            return self.generator.get_generated_code()
\ No newline at end of file
+            return generator.get_generated_code()
+
+
+# Assembles the source (a string, a list of lines or a file-like object, of byte
+# strings or of unicode encoded in UTF-8) in memory, without touching the disk, and
+# returns the generated code: a memoryview of the binary image for BIN and a string
+# for the other formats. If out_format is a list,
+# a dict mapping each format to its code is returned. The filename is the virtual
+# name reported, along with the line number, by the SyntaxError diagnostics
+def assemble(source, out_format='BIN', filename='<source>', **options):
+    out_formats = [out_format] if isinstance(out_format, str) else list(out_format)
+    compiler = CompilerEngine(filename, None, out_formats, source=source, **options)
+    compiler.run()
+
+    codes = dict()
+    for generator_format, generator in zip(out_formats, compiler.generators):
+        code = generator.get_generated_code()
+        codes[generator_format] = memoryview(code) if generator_format == 'BIN' else code
+
+    return codes[out_formats[0]] if isinstance(out_format, str) else codes
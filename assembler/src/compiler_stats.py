@@ -0,0 +1,142 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# PART OF THE ARSC ASSEMBLER
+#
+import os
+import json
+import time
+from collections import OrderedDict
+
+def get_cpu_time():
+    times = os.times()
+    return times[0] + times[1]
+
+
+# Observer for the instrumentation events of the CompilerEngine. All the methods
+# are optional
+class CompilerEngineObserver:
+    def on_phase_started(self, phase):
+        pass
+    def on_phase_finished(self, phase, wall_time, cpu_time):
+        pass
+    def on_finished(self, stats):
+        pass
+
+
+# Per-phase wall and CPU times and the counters of a single compilation. The
+# phases are, in order: read (reading the source), cache (compilation cache
+# lookup and store), tokenize (tokenizing and syntax analysis of the statements),
+# first_pass, second_pass and emit (finishing the generated code and writing it
+# out); the optimize phase (constant pooling, peephole optimization, data layout
+# and far addressing) is added when it runs. The counters are: lines, stmt_*
+# (statements by type), symbols, words, output_bytes and, if optimized,
+# optimized_instructions/optimized_cycles (removed by the peephole optimizer),
+# pooled_constants, moved_data (data blocks moved by the layout), far_references
+# (rewritten to use the pointers) and saved_words
+class CompilerStats:
+    PHASES = ['read', 'cache', 'tokenize', 'first_pass', 'second_pass', 'emit']
+
+    def __init__(self):
+        self.observers = []
+        self.reset()
+
+    # Clears the times and the counters (the observers are kept)
+    def reset(self):
+        self.phases = OrderedDict((phase, dict(wall=0.0, cpu=0.0)) for phase in CompilerStats.PHASES)
+        self.counters = OrderedDict()
+        self.started = dict()
+
+    def add_observer(self, observer):
+        if not isinstance(observer, CompilerEngineObserver):
+            raise TypeError('observer must be an instance of CompilerEngineObserver')
+        self.observers.append(observer)
+
+    def start_phase(self, phase):
+        self.started[phase] = (time.time(), get_cpu_time())
+        for observer in self.observers:
+            observer.on_phase_started(phase)
+
+    def end_phase(self, phase):
+        wall, cpu = self.started.pop(phase)
+        wall_time, cpu_time = time.time() - wall, get_cpu_time() - cpu
+        self.add_time(phase, wall_time, cpu_time)
+        for observer in self.observers:
+            observer.on_phase_finished(phase, wall_time, cpu_time)
+
+    # Accumulates the time of the phase (the phase may run in several slices)
+    def add_time(self, phase, wall_time, cpu_time):
+        times = self.phases.setdefault(phase, dict(wall=0.0, cpu=0.0))
+        times['wall'] += wall_time
+        times['cpu'] += cpu_time
+
+    # Moves the time from one phase to another (i.e. the tokenizing time that has
+    # been measured as part of the first pass)
+    def move_time(self, from_phase, to_phase, wall_time, cpu_time):
+        self.add_time(from_phase, -wall_time, -cpu_time)
+        self.add_time(to_phase, wall_time, cpu_time)
+
+    def count(self, counter, value=1):
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def set_counter(self, counter, value):
+        self.counters[counter] = value
+
+    def finish(self):
+        for observer in self.observers:
+            observer.on_finished(self)
+
+    def get_total_time(self):
+        return (sum(times['wall'] for times in self.phases.values())
+                , sum(times['cpu'] for times in self.phases.values()))
+
+    def to_dict(self):
+        wall, cpu = self.get_total_time()
+        return dict(
+            phases=OrderedDict(self.phases.items() + [('total', dict(wall=wall, cpu=cpu))])
+            , counters=self.counters)
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def __str__(self):
+        lines = ['%-12s %10s %10s' % ('phase', 'wall ms', 'cpu ms')]
+        wall, cpu = self.get_total_time()
+        for phase, times in self.phases.items() + [('total', dict(wall=wall, cpu=cpu))]:
+            lines.append('%-12s %10.2f %10.2f' % (phase, times['wall'] * 1000, times['cpu'] * 1000))
+        lines.append('')
+        for counter, value in self.counters.items():
+            lines.append('%-16s %10d' % (counter, value))
+        return '\n'.join(lines)
@@ -0,0 +1,162 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# PART OF THE ARSC ASSEMBLER
+#
+from asm_stmt import AsmInstruction, AsmLabel, DirectiveType
+from peephole_optimizer import ZERO_ADDRESS_INSTRUCTIONS, NON_INDEXED_INSTRUCTIONS
+
+# Instructions that write their operand
+STORES = ['STA', 'STX']
+
+# Pools the constants of the parsed statements ((stmt, lineno) pairs): a single-word
+# BSC constant equal to an earlier one is removed and its uses are redirected to
+# the earlier one, and the literal operands (i.e. =1) equal to a BSC constant use
+# the constant instead of a word of the literal pool. Both save a word of the low
+# memory, the only part reachable by direct addressing (0-255). A constant is
+# pooled only if it is never stored to, never indexed (a single-word table head)
+# and not used by an alias. As the data moves, programs that may address the data
+# other than through the symbols are left unchanged (see 'get_unsafe_reason'): the
+# absolute addresses, the indirect addressing (pointers) and the aliases below their
+# symbol. The words that follow a single-word symbol used as the base of the indexed
+# addressing (or of an alias) are neither moved nor used by the pooled literals, as
+# they may be the elements of a table
+class ConstantPool:
+    def __init__(self):
+        self.merged_constants = 0
+        self.pooled_literals = 0
+        self.skipped_reason = None
+
+    # Returns the list of the statement pairs with the pooled constants
+    def optimize(self, stmt_pairs):
+        stmt_pairs = list(stmt_pairs)
+        self.skipped_reason = self.get_unsafe_reason(stmt_pairs)
+        if self.skipped_reason is not None:
+            return stmt_pairs
+
+        excluded, indexed = self.get_excluded_symbols(stmt_pairs)
+        # The first constant of each value, and the symbols redirected to it
+        constants = dict()
+        renames = dict()
+        pooled_pairs = []
+        in_table = False
+        for stmt, lineno in stmt_pairs:
+            if isinstance(stmt, (AsmInstruction, AsmLabel)) or stmt.DirType not in [DirectiveType.BSS, DirectiveType.BSC]:
+                pooled_pairs.append((stmt, lineno))
+                continue
+
+            # The table elements (which the indexed stores may overwrite) are left alone
+            if stmt.DirType == DirectiveType.BSC and len(stmt.Constants) == 1 \
+                    and stmt.ConstantSymbol not in excluded and not in_table:
+                value = stmt.Constants[0] & 0xFFFF
+                if value not in constants:
+                    constants[value] = stmt.ConstantSymbol
+                else:
+                    renames[stmt.ConstantSymbol] = constants[value]
+                    self.merged_constants += 1
+                    continue
+
+            symbol = stmt.ConstantSymbol if stmt.DirType == DirectiveType.BSC else stmt.VariableSymbol
+            size = len(stmt.Constants) if stmt.DirType == DirectiveType.BSC else stmt.AllocSize
+            in_table = in_table or (symbol in indexed and size == 1)
+            pooled_pairs.append((stmt, lineno))
+
+        for stmt, lineno in pooled_pairs:
+            if not isinstance(stmt, AsmInstruction) or stmt.HasAbsoluteAddress:
+                continue
+
+            target = renames.get(stmt.Address)
+            if target is None and stmt.Address[0] == '=':
+                target = constants.get(int(stmt.Address[1:]) & 0xFFFF)
+                if target is not None:
+                    self.pooled_literals += 1
+            if target is not None:
+                stmt.StmtString = '%s // -> %s' % (stmt.StmtString.rstrip(), target)
+                stmt.Address = target
+                stmt.SymbolId = None
+
+        return pooled_pairs
+
+    # Returns why the constants can't be pooled safely, or None
+    def get_unsafe_reason(self, stmt_pairs):
+        for stmt, lineno in stmt_pairs:
+            if isinstance(stmt, AsmInstruction):
+                if stmt.Mnemonic in ZERO_ADDRESS_INSTRUCTIONS:
+                    continue
+                elif stmt.HasAbsoluteAddress:
+                    return 'absolute address in line %d' % lineno
+                elif stmt.IndirectOrIODeviceBit and stmt.Mnemonic not in ['RWD', 'WWD']:
+                    return 'indirect addressing in line %d' % lineno
+            elif isinstance(stmt, AsmLabel):
+                continue
+            elif stmt.DirType == DirectiveType.ANCHOR:
+                return 'ANCHOR directive in line %d' % lineno
+            elif stmt.DirType == DirectiveType.ALIAS and hasattr(stmt, 'AbsAddress'):
+                return 'alias of the absolute address in line %d' % lineno
+            elif stmt.DirType == DirectiveType.ALIAS and getattr(stmt, 'Operator', None) == '-':
+                # The alias reaches the words before its symbol, which may be moved
+                return 'alias below the symbol in line %d' % lineno
+
+        return None
+
+    # Returns the symbols that may not be pooled (stored to, indexed or used by an
+    # alias) and the symbols used as the base of the indexed addressing
+    def get_excluded_symbols(self, stmt_pairs):
+        excluded = set()
+        indexed = set()
+        for stmt, lineno in stmt_pairs:
+            if isinstance(stmt, AsmInstruction):
+                if stmt.Mnemonic in ZERO_ADDRESS_INSTRUCTIONS:
+                    continue
+                elif stmt.Mnemonic in STORES:
+                    excluded.add(stmt.Address)
+                if stmt.Index != 0 and stmt.Mnemonic not in NON_INDEXED_INSTRUCTIONS:
+                    excluded.add(stmt.Address)
+                    indexed.add(stmt.Address)
+            elif isinstance(stmt, AsmLabel):
+                continue
+            elif stmt.DirType == DirectiveType.ALIAS:
+                excluded.add(stmt.AliasSymbol)
+                excluded.add(getattr(stmt, 'OriginalSymbol', None))
+                excluded.add(getattr(stmt, 'BaseSymbol', None))
+                indexed.add(getattr(stmt, 'BaseSymbol', None))
+
+        return excluded, indexed
+
+    def __str__(self):
+        if self.skipped_reason is not None:
+            return 'constant pooling skipped: %s' % self.skipped_reason
+        return 'constant pooling: %d duplicate constants merged, %d literals pooled with constants' % (
+            self.merged_constants, self.pooled_literals)
@@ -0,0 +1,226 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# PART OF THE ARSC ASSEMBLER
+#
+from asm_stmt import ISA
+
+# Clock cycle costs of the ARSC instructions derived from the hardwired control
+# unit (cpu/hdl/arsc_hcu.v). Each instruction goes through the FETCH, DEFER (only
+# for the indirect non-I/O instructions) and EXECUTE major cycles, and each of
+# those is divided into phases that take one clock cycle, except the phases that
+# wait for the memory (rd_data_valid, wait_req) or for the I/O device (io_done).
+# Those take read_cycles, write_cycles and io_cycles respectively (one cycle for
+# the on-chip RAM and the video RAM). Indexing is done within FETCH and is free
+class CycleModel:
+    # Phases of the EXECUTE cycle as (phases taking one cycle, memory reads, memory
+    # writes, I/O operations)
+    EXECUTE_PHASES = dict(
+        HLT     = (1, 0, 0, 0)
+        , LDA   = (1, 1, 0, 0)
+        , STA   = (2, 0, 1, 0)
+        , ADD   = (1, 1, 0, 0)
+        , TCA   = (2, 0, 0, 0)
+        , BRU   = (1, 0, 0, 0)
+        , BIP   = (1, 0, 0, 0)
+        , BIN   = (1, 0, 0, 0)
+        , RWD   = (2, 1, 0, 1)
+        , WWD   = (3, 1, 0, 1)
+        , SHL   = (1, 0, 0, 0)
+        , SHR   = (1, 0, 0, 0)
+        , LDX   = (1, 1, 0, 0)
+        , STX   = (2, 0, 1, 0)
+        , TIX   = (2, 0, 0, 0)
+        , TDX   = (2, 0, 0, 0)
+        , AND   = (1, 1, 0, 0)
+        , OR    = (1, 1, 0, 0)
+        , NOT   = (1, 0, 0, 0)
+        , XOR   = (1, 1, 0, 0)
+    )
+
+    BRANCHES = [ISA['BRU'], ISA['BIP'], ISA['BIN'], ISA['TIX'], ISA['TDX']]
+    INDEX_BRANCHES = [ISA['TIX'], ISA['TDX']]
+    IO_INSTRUCTIONS = [ISA['RWD'], ISA['WWD']]
+
+    def __init__(self, read_cycles=1, write_cycles=1, io_cycles=1):
+        self.read_cycles = read_cycles
+        self.write_cycles = write_cycles
+        self.io_cycles = io_cycles
+        # FETCH: UAR <- PC, PC <- PC + 1 and read, IR <- RD_DATA (after the read), indexing
+        self.fetch_cycles = 3 + read_cycles
+        # DEFER: read, UAR <- RD_DATA (after the read)
+        self.defer_cycles = 1 + read_cycles
+
+        # Costs indexed by the opcode and the indirect bit
+        self.costs = [[0, 0] for opcode in range(0, 32)]
+        for mnemonic, (phases, reads, writes, ios) in CycleModel.EXECUTE_PHASES.items():
+            execute_cycles = (phases + reads * self.read_cycles + writes * self.write_cycles
+                              + ios * self.io_cycles)
+            opcode = ISA[mnemonic]
+            self.costs[opcode][0] = self.fetch_cycles + execute_cycles
+            if opcode in CycleModel.IO_INSTRUCTIONS:
+                self.costs[opcode][1] = self.costs[opcode][0]
+            else:
+                self.costs[opcode][1] = self.costs[opcode][0] + self.defer_cycles
+
+    def get_cycles(self, opcode, indirect_or_iodev_bit):
+        return self.costs[opcode][indirect_or_iodev_bit]
+
+    # Cycles of the direct (not indirect) instruction
+    def get_mnemonic_cycles(self, mnemonic):
+        return self.costs[ISA[mnemonic]][0]
+
+    # Cycles of the instruction word
+    def get_word_cycles(self, word):
+        return self.costs[word >> 11][(word >> 10) & 1]
+
+    # Returns the table of the costs as a printable string
+    def __str__(self):
+        lines = ['mnemonic  direct  indirect']
+        for mnemonic, opcode in sorted(ISA.items(), key=lambda item: item[1]):
+            lines.append('%-8s  %6d  %8d' % (mnemonic, self.costs[opcode][0], self.costs[opcode][1]))
+        return '\n'.join(lines)
+
+
+# A sequence of instructions with a single entry (the first instruction) and a
+# single exit (the last one). The successors are the start addresses of the blocks
+# the control may be transferred to (the unknown targets of the indexed or indirect
+# branches are not included)
+class BasicBlock:
+    def __init__(self, start, end, cycles, successors):
+        self.start = start
+        self.end = end
+        self.cycles = cycles
+        self.successors = successors
+
+    def __len__(self):
+        return self.end - self.start
+
+
+# A loop found by the back edge from the latch block to the header block. The body
+# is made of the blocks laid out between the two (inclusive). The cycles of one
+# iteration are estimated as the cheapest and the most expensive forward path from
+# the header to the latch (min_cycles, max_cycles)
+class Loop:
+    def __init__(self, header, latch, blocks):
+        self.header = header
+        self.latch = latch
+        self.blocks = blocks
+
+        # The blocks are in the address order, hence each forward edge leads to a later block
+        body = dict((block.start, block) for block in blocks)
+        paths = {header.start: (header.cycles, header.cycles)}
+        for block in blocks:
+            if block.start not in paths:
+                continue
+            min_cycles, max_cycles = paths[block.start]
+            for successor in block.successors:
+                if successor > block.start and successor in body:
+                    cycles = body[successor].cycles
+                    if successor in paths:
+                        prev_min, prev_max = paths[successor]
+                        paths[successor] = (min(prev_min, min_cycles + cycles), max(prev_max, max_cycles + cycles))
+                    else:
+                        paths[successor] = (min_cycles + cycles, max_cycles + cycles)
+
+        self.min_cycles, self.max_cycles = paths.get(latch.start, (0, 0))
+
+
+# Returns the address of the first HLT instruction (the end of the code segment)
+# in the image of 16-bit words
+def find_code_end(words):
+    for address in range(0, len(words)):
+        if words[address] >> 11 == ISA['HLT']:
+            return address + 1
+    return len(words)
+
+# Returns the target address of the branch instruction, or None if it is not a branch
+# or the target is not known statically (indexed or indirect branch). The index
+# field of TIX and TDX selects the register to step and doesn't index the target
+def get_branch_target(word):
+    opcode = word >> 11
+    if opcode not in CycleModel.BRANCHES:
+        return None
+    elif opcode in CycleModel.INDEX_BRANCHES:
+        mode = word & 0x400
+    else:
+        mode = word & 0x700
+    return word & 0xFF if mode == 0 else None
+
+# Splits the code segment of the image into the basic blocks. A block ends at a
+# branch (BRU, BIP, BIN, TIX, TDX) or HLT, or right before a branch target
+def find_basic_blocks(words, cycle_model, code_end=None):
+    if code_end is None:
+        code_end = find_code_end(words)
+
+    leaders = set([0])
+    for address in range(0, code_end):
+        word = words[address]
+        opcode = word >> 11
+        if opcode in CycleModel.BRANCHES or opcode == ISA['HLT']:
+            leaders.add(address + 1)
+            target = get_branch_target(word)
+            if target is not None:
+                leaders.add(target)
+
+    starts = sorted(leader for leader in leaders if leader < code_end)
+    blocks = []
+    for i in range(0, len(starts)):
+        start = starts[i]
+        end = starts[i + 1] if i + 1 < len(starts) else code_end
+        cycles = sum(cycle_model.get_word_cycles(words[address]) for address in range(start, end))
+        last = words[end - 1]
+        opcode = last >> 11
+        successors = []
+        target = get_branch_target(last)
+        if target is not None:
+            successors.append(target)
+        if opcode != ISA['HLT'] and opcode != ISA['BRU'] and end < code_end:
+            successors.append(end)
+        blocks.append(BasicBlock(start, end, cycles, successors))
+
+    return blocks
+
+# Finds the loops (back edges) among the basic blocks
+def find_loops(blocks):
+    loops = []
+    for latch in blocks:
+        for target in latch.successors:
+            if target <= latch.start:
+                body = [block for block in blocks if target <= block.start <= latch.start]
+                if len(body) != 0 and body[0].start == target:
+                    loops.append(Loop(body[0], latch, body))
+
+    return loops
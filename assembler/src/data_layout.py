@@ -0,0 +1,251 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# PART OF THE ARSC ASSEMBLER
+#
+from asm_stmt import AsmInstruction, AsmLabel, DirectiveType, make_literal_directive
+from peephole_optimizer import ZERO_ADDRESS_INSTRUCTIONS, NON_INDEXED_INSTRUCTIONS
+
+# Size of the directly addressable window (the 8-bit address field)
+DIRECT_WINDOW_SIZE = 256
+
+# Reorders the data of the parsed statements ((stmt, lineno) pairs) by how often
+# the data symbols are used, so that the most used scalars end up in the directly
+# addressable window (0-255). The uses are counted statically (one per
+# instruction) or, if the profile (executions per instruction address) is given,
+# weighted by the executions. The code itself can't move, as it starts at address 0
+# and the data follows HLT, so the data is laid out right after the code: the used
+# single-word variables and constants (including the literal pool words) by their
+# use count, then the arrays from the smallest one (the arrays are indexed, so only
+# their base has to be in the window) and finally the unused data. A single-word
+# symbol used as the base of the indexed addressing (or of an alias) is a table
+# head: it is moved together with all the data that follows it. The aliases are
+# placed after the data. As the data moves, programs that may address the data
+# other than through the symbols (absolute addresses, indirect addressing through
+# pointers) are left unchanged (see 'get_unsafe_reason')
+class DataLayout:
+    def __init__(self, profile=None):
+        self.profile = profile
+        self.use_counts = dict()
+        self.moved_symbols = 0
+        self.skipped_reason = None
+
+    # Returns the list of the statement pairs with the data reordered
+    def optimize(self, stmt_pairs):
+        stmt_pairs = list(stmt_pairs)
+        self.skipped_reason = self.get_unsafe_reason(stmt_pairs)
+        if self.skipped_reason is not None:
+            return stmt_pairs
+
+        self.use_counts, table_heads = self.count_uses(stmt_pairs)
+        code_pairs = []
+        units = []
+        aliases = []
+        end_pairs = []
+        for stmt, lineno in stmt_pairs:
+            if len(end_pairs) != 0 or isinstance(stmt, (AsmInstruction, AsmLabel)):
+                (end_pairs if len(end_pairs) != 0 else code_pairs).append((stmt, lineno))
+            elif stmt.DirType == DirectiveType.ALIAS:
+                aliases.append((stmt, lineno))
+            elif stmt.DirType == DirectiveType.REGION:
+                code_pairs.append((stmt, lineno))
+            elif stmt.DirType == DirectiveType.END:
+                end_pairs.append((stmt, lineno))
+            elif len(units) != 0 and units[-1]['table']:
+                # The rest of the data belongs to the table
+                units[-1]['pairs'].append((stmt, lineno))
+                units[-1]['size'] += self.get_size(stmt)
+            else:
+                symbol = self.get_symbol(stmt)
+                size = self.get_size(stmt)
+                units.append(dict(pairs=[(stmt, lineno)], size=size, count=self.use_counts.get(symbol, 0)
+                                  , table=size == 1 and symbol in table_heads))
+
+        # The literals are laid out as the other constants
+        for symbol in self.get_literals(stmt_pairs):
+            units.append(dict(pairs=[(make_literal_directive(symbol), 0)], size=1
+                              , count=self.use_counts.get(symbol, 0), table=False))
+
+        for order, unit in enumerate(units):
+            unit['order'] = order
+        layout = sorted(units, key=lambda unit: (
+            unit['count'] == 0, unit['size'] > 1, -unit['count'] if unit['size'] == 1 else unit['size'], unit['order']))
+        self.moved_symbols = sum(1 for position, unit in enumerate(layout) if unit['order'] != position)
+
+        return code_pairs + [pair for unit in layout for pair in unit['pairs']] + aliases + end_pairs
+
+    def get_symbol(self, stmt):
+        return stmt.ConstantSymbol if stmt.DirType == DirectiveType.BSC else stmt.VariableSymbol
+
+    def get_size(self, stmt):
+        return len(stmt.Constants) if stmt.DirType == DirectiveType.BSC else stmt.AllocSize
+
+    # Returns the literal symbols in the order of their first use
+    def get_literals(self, stmt_pairs):
+        literals = []
+        for stmt, lineno in stmt_pairs:
+            if isinstance(stmt, AsmInstruction) and not stmt.HasAbsoluteAddress \
+                    and stmt.Address[0] == '=' and stmt.Address not in literals:
+                literals.append(stmt.Address)
+        return literals
+
+    # Returns why the data can't be moved safely, or None
+    def get_unsafe_reason(self, stmt_pairs):
+        for stmt, lineno in stmt_pairs:
+            if isinstance(stmt, AsmInstruction):
+                if stmt.Mnemonic in ZERO_ADDRESS_INSTRUCTIONS:
+                    continue
+                elif stmt.HasAbsoluteAddress:
+                    return 'absolute address in line %d' % lineno
+                elif stmt.IndirectOrIODeviceBit and stmt.Mnemonic not in ['RWD', 'WWD']:
+                    return 'indirect addressing in line %d' % lineno
+            elif isinstance(stmt, AsmLabel):
+                continue
+            elif stmt.DirType == DirectiveType.ANCHOR:
+                return 'ANCHOR directive in line %d' % lineno
+            elif stmt.DirType == DirectiveType.ALIAS and hasattr(stmt, 'AbsAddress'):
+                return 'alias of the absolute address in line %d' % lineno
+
+        return None
+
+    # Counts the uses of the data symbols (the uses of an alias count for its
+    # symbol) and returns them with the symbols used as the bases of the indexed
+    # addressing or of the aliases
+    def count_uses(self, stmt_pairs):
+        aliases = dict()
+        table_heads = set()
+        for stmt, lineno in stmt_pairs:
+            if isinstance(stmt, (AsmInstruction, AsmLabel)) or stmt.DirType != DirectiveType.ALIAS:
+                continue
+            elif hasattr(stmt, 'OriginalSymbol'):
+                aliases[stmt.AliasSymbol] = stmt.OriginalSymbol
+            else:
+                aliases[stmt.AliasSymbol] = stmt.BaseSymbol
+                table_heads.add(stmt.BaseSymbol)
+
+        use_counts = dict()
+        instr_addr = 0
+        for stmt, lineno in stmt_pairs:
+            if not isinstance(stmt, AsmInstruction):
+                continue
+
+            weight = 1
+            if self.profile is not None:
+                weight = self.profile[instr_addr] if instr_addr < len(self.profile) else 0
+            instr_addr += 1
+            if stmt.Mnemonic in ZERO_ADDRESS_INSTRUCTIONS:
+                continue
+
+            symbol = stmt.Address
+            visited = set()
+            while symbol in aliases and symbol not in visited:
+                visited.add(symbol)
+                symbol = aliases[symbol]
+            use_counts[symbol] = use_counts.get(symbol, 0) + weight
+            if stmt.Index != 0 and stmt.Mnemonic not in NON_INDEXED_INSTRUCTIONS:
+                table_heads.add(symbol)
+
+        # Table heads and the aliases resolve to the table heads
+        for symbol in list(table_heads):
+            while symbol in aliases:
+                symbol = aliases[symbol]
+                table_heads.add(symbol)
+
+        return use_counts, table_heads
+
+    def __str__(self):
+        if self.skipped_reason is not None:
+            return 'data layout skipped: %s' % self.skipped_reason
+        return 'data layout: %d data blocks moved (%s uses)' % (
+            self.moved_symbols, 'profiled' if self.profile is not None else 'static')
+
+
+# Returns the map of the address space of the statements ((stmt, lineno) pairs,
+# followed by the literal pool, with the addresses of their ANCHOR directives): one
+# character per word of the directly addressable window, and a summary of the
+# rest. The scalars (single-word data) are marked with 'v' (variables) and 'k'
+# (constants), the arrays with 'A', the literal pool with 'L', the far address
+# pointers with 'P' and the code with 'C'
+def get_utilization_map(stmt_pairs, literals=(), anchors=()):
+    window = ['.'] * DIRECT_WINDOW_SIZE
+    used_words = 0
+    out_of_window = []
+    anchors = iter(anchors)
+    curr_addr = 0
+    allocations = []
+    for stmt, lineno in stmt_pairs:
+        if isinstance(stmt, AsmInstruction):
+            allocations.append((curr_addr, 1, 'C', None))
+            curr_addr += 1
+        elif isinstance(stmt, AsmLabel):
+            continue
+        elif stmt.DirType == DirectiveType.ANCHOR:
+            curr_addr = next(anchors)
+        elif stmt.DirType in [DirectiveType.BSS, DirectiveType.BSC]:
+            symbol = stmt.ConstantSymbol if stmt.DirType == DirectiveType.BSC else stmt.VariableSymbol
+            size = len(stmt.Constants) if stmt.DirType == DirectiveType.BSC else stmt.AllocSize
+            if symbol[0] == '=':
+                mark = 'L'
+            elif symbol[0] == '@':
+                mark = 'P'
+            elif size > 1:
+                mark = 'A'
+            else:
+                mark = 'k' if stmt.DirType == DirectiveType.BSC else 'v'
+            allocations.append((curr_addr, size, mark, symbol))
+            curr_addr += size
+    for symbol in literals:
+        allocations.append((curr_addr, 1, 'L', symbol))
+        curr_addr += 1
+
+    for address, size, mark, symbol in allocations:
+        used_words += size
+        if address >= DIRECT_WINDOW_SIZE:
+            if symbol is not None:
+                out_of_window.append(symbol)
+            continue
+        end = min(address + size, DIRECT_WINDOW_SIZE)
+        window[address:end] = mark * (end - address)
+
+    window = ''.join(window)
+    window_words = DIRECT_WINDOW_SIZE - window.count('.')
+    lines = ['address space utilization (C code, v variable, k constant, A array, L literal, P pointer, . free):']
+    for row in range(0, DIRECT_WINDOW_SIZE, 64):
+        lines.append('  0x%04x  %s' % (row, window[row:row + 64]))
+    lines.append('  %d of %d directly addressable words used, %d words above 0x%04x'
+                 % (window_words, DIRECT_WINDOW_SIZE, used_words - window_words, DIRECT_WINDOW_SIZE - 1))
+    if len(out_of_window) != 0:
+        lines.append('  not directly addressable: %s' % ', '.join(out_of_window))
+    return '\n'.join(lines)
@@ -0,0 +1,213 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# PART OF THE ARSC ASSEMBLER
+#
+from asm_stmt import ISA, AsmInstruction, AsmLabel, DirectiveType, get_pointer_symbol, make_pointer_directive
+from cycle_model import CycleModel
+from peephole_optimizer import ZERO_ADDRESS_INSTRUCTIONS, NON_INDEXED_INSTRUCTIONS, BRANCHES
+
+# Label of the first instruction of the program when the pointers precede the code
+START_LABEL = '@START'
+
+# Rewrites the instructions of the parsed statements ((stmt, lineno) pairs) that
+# directly address a symbol above the directly addressable window (0-255) to
+# address it indirectly through a pointer word holding its address. The references
+# to the same symbol share the pointer. The pointers are placed right after the
+# code if they fit in the window there (ANCHOR may place them elsewhere), otherwise
+# before the code, which is then entered by a branch over them. As the pointers move the symbols up, which may
+# push more symbols out of the window, the statements are rewritten and their
+# addresses recomputed (by the given function returning the first pass driver of
+# the statements) until no more pointers are needed. The indexed and indirect
+# references can't be rewritten (the ARSC indexes the address of the pointer) and
+# are left to the second pass, which reports them. As the pointers move the code
+# and the data, programs that may address them other than through the symbols are
+# left unchanged (see 'get_unsafe_reason')
+class FarAddressing:
+    def __init__(self, cycle_model=None):
+        self.cycle_model = cycle_model if cycle_model is not None else CycleModel()
+        # Symbols reached through the pointers, in the order of their first use
+        self.targets = []
+        # (lineno, statement string, symbol) of the rewritten instructions
+        self.rewrites = []
+        # Symbol -> (address of the pointer, address of the symbol)
+        self.pointers = dict()
+        # Words of the pointers and of the branch over them (if before the code)
+        self.added_words = 0
+        self.code_offset = 0
+        self.added_cycles = 0
+        self.table_pairs = []
+        self.before_code = False
+        self.skipped_reason = None
+
+    # Returns the list of the rewritten statement pairs. The addresses of the last
+    # call of assign_addresses are those of the returned statements
+    def rewrite(self, stmt_pairs, assign_addresses):
+        stmt_pairs = list(stmt_pairs)
+        self.skipped_reason = self.get_unsafe_reason(stmt_pairs)
+        if self.skipped_reason is not None:
+            return stmt_pairs
+
+        driver = assign_addresses(stmt_pairs)
+        while True:
+            sym_tbl = driver.get_symbol_table()
+            targets = set(self.targets)
+            new_targets = []
+            for stmt, lineno in stmt_pairs:
+                # The undefined symbols are left to the second pass
+                if self.is_rewritable(stmt) and stmt.Address not in targets \
+                        and sym_tbl.contains(stmt.Address) and sym_tbl.get_address(stmt.Address) > 255:
+                    targets.add(stmt.Address)
+                    new_targets.append(stmt.Address)
+            if len(new_targets) != 0:
+                self.targets.extend(new_targets)
+                stmt_pairs = self.place_pointers(self.redirect(stmt_pairs, set(new_targets)))
+            elif not self.before_code and any(sym_tbl.get_address(get_pointer_symbol(symbol)) > 255
+                                              for symbol in self.targets):
+                self.before_code = True
+                stmt_pairs = self.place_pointers(stmt_pairs)
+            else:
+                break
+            driver = assign_addresses(stmt_pairs)
+
+        # The pointers get the final addresses of their symbols
+        sym_tbl = driver.get_symbol_table()
+        for stmt, lineno in self.table_pairs:
+            if isinstance(stmt, (AsmInstruction, AsmLabel)):
+                continue
+            symbol = stmt.ConstantSymbol[1:]
+            address = sym_tbl.get_address(symbol)
+            stmt.Constants = make_pointer_directive(stmt.ConstantSymbol, address).Constants
+            self.pointers[symbol] = (sym_tbl.get_address(stmt.ConstantSymbol), address)
+        return stmt_pairs
+
+    # Returns why the pointers can't be inserted safely, or None
+    def get_unsafe_reason(self, stmt_pairs):
+        code_labels = set()
+        for stmt, lineno in stmt_pairs:
+            if isinstance(stmt, AsmLabel):
+                code_labels.add(stmt.Label)
+            elif isinstance(stmt, AsmInstruction):
+                continue
+            elif stmt.DirType == DirectiveType.ALIAS and getattr(stmt, 'OriginalSymbol', None) in code_labels:
+                code_labels.add(stmt.AliasSymbol)
+
+        for stmt, lineno in stmt_pairs:
+            if isinstance(stmt, AsmInstruction):
+                if stmt.Mnemonic in ZERO_ADDRESS_INSTRUCTIONS:
+                    continue
+                elif stmt.HasAbsoluteAddress:
+                    return 'absolute address in line %d' % lineno
+                elif stmt.IndirectOrIODeviceBit and stmt.Mnemonic not in ['RWD', 'WWD'] and stmt.Address[0] != '@':
+                    return 'indirect addressing in line %d' % lineno
+                elif stmt.Address in code_labels and stmt.Mnemonic not in BRANCHES:
+                    return 'code label "%s" used as data in line %d' % (stmt.Address, lineno)
+            elif isinstance(stmt, AsmLabel):
+                continue
+            elif stmt.DirType == DirectiveType.ALIAS:
+                if hasattr(stmt, 'AbsAddress'):
+                    return 'alias of the absolute address in line %d' % lineno
+                elif hasattr(stmt, 'BaseSymbol') and stmt.BaseSymbol in code_labels:
+                    return 'alias relative to the code label "%s" in line %d' % (stmt.BaseSymbol, lineno)
+
+        return None
+
+    # Direct references to a symbol (not yet through a pointer)
+    def is_rewritable(self, stmt):
+        if not isinstance(stmt, AsmInstruction) or stmt.Mnemonic in ZERO_ADDRESS_INSTRUCTIONS \
+                or stmt.Mnemonic in ['RWD', 'WWD'] or stmt.HasAbsoluteAddress:
+            return False
+        elif stmt.IndirectOrIODeviceBit or stmt.Address[0] == '@':
+            return False
+        return stmt.Index == 0 or stmt.Mnemonic in NON_INDEXED_INSTRUCTIONS
+
+    # Makes the references to the targets indirect through their pointers
+    def redirect(self, stmt_pairs, targets):
+        for stmt, lineno in stmt_pairs:
+            if self.is_rewritable(stmt) and stmt.Address in targets:
+                self.rewrites.append((lineno, stmt.StmtString.strip(), stmt.Address))
+                stmt.Address = get_pointer_symbol(stmt.Address)
+                stmt.SymbolId = None
+                stmt.IndirectOrIODeviceBit = 1
+                stmt.StmtString = '%s // -> *%s' % (stmt.StmtString.rstrip(), stmt.Address)
+                self.added_cycles += self.cycle_model.defer_cycles
+        return stmt_pairs
+
+    # Returns the statements with the pointers (re)placed after or before the code
+    def place_pointers(self, stmt_pairs):
+        table = set(id(stmt) for stmt, lineno in self.table_pairs)
+        stmt_pairs = [(stmt, lineno) for stmt, lineno in stmt_pairs if id(stmt) not in table]
+        code_size = sum(1 for stmt, lineno in stmt_pairs if isinstance(stmt, AsmInstruction))
+
+        self.table_pairs = [(make_pointer_directive(get_pointer_symbol(symbol)), 0) for symbol in self.targets]
+        if not self.before_code and code_size + len(self.targets) <= 256:
+            self.code_offset = 0
+            data_start = 0
+            for position, (stmt, lineno) in enumerate(stmt_pairs):
+                if isinstance(stmt, AsmInstruction):
+                    data_start = position + 1
+            stmt_pairs[data_start:data_start] = self.table_pairs
+        else:
+            branch = AsmInstruction.__new__(AsmInstruction)
+            branch.Opcode = ISA['BRU']
+            branch.Mnemonic = 'BRU'
+            branch.StmtString = 'BRU %s // over the far address pointers' % START_LABEL
+            branch.HasAbsoluteAddress = False
+            branch.IndirectOrIODeviceBit = 0
+            branch.Address = START_LABEL
+            branch.Index = 0
+            branch.SymbolId = None
+            label = AsmLabel.__new__(AsmLabel)
+            label.Label = START_LABEL
+            self.table_pairs = [(branch, 0)] + self.table_pairs + [(label, 0)]
+            self.code_offset = len(self.targets) + 1
+            stmt_pairs[0:0] = self.table_pairs
+
+        self.added_words = len(self.targets) + (1 if self.code_offset != 0 else 0)
+        return stmt_pairs
+
+    def __str__(self):
+        if self.skipped_reason is not None:
+            return 'far addressing skipped: %s' % self.skipped_reason
+        lines = ['far addressing: %d instructions rewritten through %d pointers (%d words%s), %d DEFER cycles added'
+                 % (len(self.rewrites), len(self.targets), self.added_words
+                    , ', before the code' if self.code_offset != 0 else '', self.added_cycles)]
+        for symbol in self.targets:
+            linenos = [lineno for lineno, stmt_string, target in self.rewrites if target == symbol]
+            pointer_address, address = self.pointers[symbol]
+            lines.append('  %s (0x%04x) through *%s (0x%04x): %d references from line %d, +%d cycles per execution'
+                         % (symbol, address, get_pointer_symbol(symbol), pointer_address, len(linenos)
+                            , linenos[0], self.cycle_model.defer_cycles))
+        return '\n'.join(lines)
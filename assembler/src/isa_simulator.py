@@ -0,0 +1,319 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# ARSC INSTRUCTION SET SIMULATOR
+#
+import os
+import re
+import sys
+from array import array
+from binascii import unhexlify
+from asm_stmt import ISA
+
+# An I/O device accessed by the RWD/WWD instructions. The address is the I/O
+# address read from the memory by the instruction
+class IoDevice:
+    def read(self, address):
+        return 0
+    def write(self, address, data):
+        pass
+
+
+# Memory-mapped I/O device (i.e. the video memory of the VGA screen) backed by an
+# array of 16-bit words. Reads/writes outside of the device are ignored
+class MemoryMappedDevice(IoDevice):
+    def __init__(self, size):
+        self.words = array('H', [0]) * size
+        self.read_count = 0
+        self.write_count = 0
+
+    def read(self, address):
+        self.read_count += 1
+        if address < len(self.words):
+            return self.words[address]
+        return 0
+
+    def write(self, address, data):
+        self.write_count += 1
+        if address < len(self.words):
+            self.words[address] = data
+
+
+# Input device that hands out the queued words (i.e. keyboard scan codes) one by
+# one, and zero once the queue is empty
+class QueueInputDevice(IoDevice):
+    def __init__(self, words=None):
+        self.words = list(words) if words is not None else []
+
+    def read(self, address):
+        if len(self.words) == 0:
+            return 0
+        return self.words.pop(0)
+
+
+# Reads the memory image (a list of 16-bit words) from the .bin, .hex or .mif file
+# generated by the assembler
+def load_image_file(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    try:
+        with open(filename, 'rb' if ext == '.bin' else 'r') as image_file:
+            data = image_file.read()
+    except IOError:
+        raise IOError('Failed to open/read the image file "%s"' % filename)
+
+    if ext == '.mif':
+        return parse_mif(data)
+    elif ext == '.hex':
+        data = unhexlify(data.strip())
+
+    words = array('H')
+    words.fromstring(data[:len(data) & ~1])
+    if sys.byteorder != 'little':
+        words.byteswap()
+    return words
+
+# Parses the content of the MIF file (HEX address and data radix)
+def parse_mif(text):
+    depth = re.search(r'DEPTH\s*=\s*(\d+)\s*;', text)
+    words = array('H', [0]) * (int(depth.group(1)) if depth is not None else 0)
+    content = text[text.find('CONTENT BEGIN'):]
+    for address, data in re.findall(r'^\s*([0-9a-fA-F]+)\s*:\s*([0-9a-fA-F]+)\s*;', content, re.M):
+        address = int(address, 16)
+        if address >= len(words):
+            words.extend(array('H', [0]) * (address + 1 - len(words)))
+        words[address] = int(data, 16)
+    return words
+
+
+# Instruction set simulator of the ARSC CPU. The memory is an array of 64K 16-bit
+# words and the registers are kept as unsigned 16-bit integers. The addressing is
+# done as in the hardwired control unit (cpu/hdl/arsc_hcu.v): the address field is
+# indexed with the selected index register (except for LDX, STX, TIX and TDX) and,
+# if the indirect bit is set (except for RWD and WWD), the effective address is read
+# from the indexed address (pre-indexed indirect addressing). The instructions are
+# dispatched through a table of handlers indexed by the opcode. PSR's NG and ZR bits
+# are derived from ACC; the CR and OF bits are those of the last ADD, TCA or SHL
+class IsaSimulator:
+    MEMORY_SIZE = 1 << 16
+
+    # Addressing modes of the instructions
+    INDEXED, INDIRECT = 1, 2
+
+    # PSR bits (from MSB to LSB)
+    PSR_CR, PSR_NG, PSR_ZR, PSR_OF, PSR_IN = 16, 8, 4, 2, 1
+
+    def __init__(self, image=None):
+        self.memory = array('H', [0]) * IsaSimulator.MEMORY_SIZE
+        self.in_devices = [IoDevice(), IoDevice()]
+        self.out_devices = [IoDevice(), IoDevice()]
+        self.handlers = [self.exec_illegal] * 32
+        self.modes = [0] * 32
+        for mnemonic, opcode in ISA.items():
+            self.handlers[opcode] = getattr(self, 'exec_' + mnemonic.lower())
+            if mnemonic in ['LDX', 'STX', 'TIX', 'TDX']:
+                self.modes[opcode] = IsaSimulator.INDIRECT
+            elif mnemonic in ['RWD', 'WWD']:
+                self.modes[opcode] = IsaSimulator.INDEXED
+            elif mnemonic not in ['HLT', 'TCA', 'SHL', 'SHR', 'NOT']:
+                self.modes[opcode] = IsaSimulator.INDEXED | IsaSimulator.INDIRECT
+        self.reset()
+        if image is not None:
+            self.load(image)
+
+    # Resets the registers (the memory is kept)
+    def reset(self):
+        self.acc = 0
+        self.pc = 0
+        # Index registers 1-3 (the 0th "register" selects no index register and is always zero)
+        self.idx = [0, 0, 0, 0]
+        self.cr = 0
+        self.of = 0
+        self.running = False
+        self.halted = False
+        self.steps = 0
+
+    # Loads the memory image (a sequence of words or a BinaryGenerator) at the given address.
+    # The whole image of the generator is loaded: after an ANCHOR back to a lower address
+    # its current address is no longer the end of the image
+    def load(self, image, address=0):
+        if hasattr(image, 'words'):
+            image = image.words
+        if address + len(image) > IsaSimulator.MEMORY_SIZE:
+            raise ValueError('the image does not fit into the memory')
+
+        self.memory[address:address + len(image)] = array('H', image)
+
+    def set_in_device(self, device_id, device):
+        self.in_devices[device_id] = device
+
+    def set_out_device(self, device_id, device):
+        self.out_devices[device_id] = device
+
+    def get_psr(self):
+        return ((self.cr and IsaSimulator.PSR_CR)
+                | (IsaSimulator.PSR_NG if self.acc & 0x8000 else 0)
+                | (IsaSimulator.PSR_ZR if self.acc == 0 else 0)
+                | (self.of and IsaSimulator.PSR_OF))
+
+    # Executes the instructions until HLT is reached or max_steps instructions have
+    # been executed. Returns the number of instructions executed
+    def run(self, max_steps=None):
+        memory = self.memory
+        handlers = self.handlers
+        modes = self.modes
+        idx = self.idx
+        INDEXED, INDIRECT = IsaSimulator.INDEXED, IsaSimulator.INDIRECT
+        limit = max_steps if max_steps is not None else -1
+        steps = 0
+        self.running = True
+        while self.running and steps != limit:
+            ir = memory[self.pc]
+            self.pc = (self.pc + 1) & 0xFFFF
+            opcode = ir >> 11
+            mode = modes[opcode]
+            address = ir & 0xFF
+            if mode & INDEXED:
+                address = (address + idx[(ir >> 8) & 3]) & 0xFFFF
+            if mode & INDIRECT and ir & 0x400:
+                address = memory[address]
+            handlers[opcode](address, ir)
+            steps += 1
+
+        self.running = False
+        self.steps += steps
+        return steps
+
+    # Executes a single instruction
+    def step(self):
+        return self.run(1)
+
+    def exec_illegal(self, address, ir):
+        self.pc = (self.pc - 1) & 0xFFFF
+        self.running = False
+        raise RuntimeError('illegal opcode 0x%02x at address 0x%04x' % (ir >> 11, self.pc))
+
+    def exec_hlt(self, address, ir):
+        self.running = False
+        self.halted = True
+
+    def exec_lda(self, address, ir):
+        self.acc = self.memory[address]
+
+    def exec_sta(self, address, ir):
+        self.memory[address] = self.acc
+
+    def exec_add(self, address, ir):
+        acc, operand = self.acc, self.memory[address]
+        result = acc + operand
+        self.cr = result >> 16
+        result &= 0xFFFF
+        self.of = (~(acc ^ operand) & (acc ^ result) & 0x8000) >> 15
+        self.acc = result
+
+    def exec_tca(self, address, ir):
+        acc = ~self.acc & 0xFFFF
+        result = acc + 1
+        self.cr = result >> 16
+        result &= 0xFFFF
+        self.of = (~acc & result & 0x8000) >> 15
+        self.acc = result
+
+    def exec_bru(self, address, ir):
+        self.pc = address
+
+    def exec_bip(self, address, ir):
+        if self.acc != 0 and not self.acc & 0x8000:
+            self.pc = address
+
+    def exec_bin(self, address, ir):
+        if self.acc & 0x8000:
+            self.pc = address
+
+    def exec_rwd(self, address, ir):
+        self.acc = self.in_devices[(ir >> 10) & 1].read(self.memory[address]) & 0xFFFF
+
+    def exec_wwd(self, address, ir):
+        self.out_devices[(ir >> 10) & 1].write(self.memory[address], self.acc)
+
+    def exec_shl(self, address, ir):
+        acc = self.acc
+        self.cr = 0
+        self.of = ((acc >> 15) ^ (acc >> 14)) & 1
+        self.acc = (acc << 1) & 0xFFFF
+
+    def exec_shr(self, address, ir):
+        self.acc = (self.acc >> 1) | (self.acc & 0x8000)
+
+    def exec_ldx(self, address, ir):
+        index = (ir >> 8) & 3
+        if index:
+            self.idx[index] = self.memory[address]
+
+    def exec_stx(self, address, ir):
+        self.memory[address] = self.idx[(ir >> 8) & 3]
+
+    def exec_tix(self, address, ir):
+        index = (ir >> 8) & 3
+        if index:
+            self.idx[index] = (self.idx[index] + 1) & 0xFFFF
+        if self.idx[index] == 0:
+            self.pc = address
+
+    def exec_tdx(self, address, ir):
+        index = (ir >> 8) & 3
+        if index:
+            self.idx[index] = (self.idx[index] - 1) & 0xFFFF
+        if self.idx[index] != 0:
+            self.pc = address
+
+    def exec_and(self, address, ir):
+        self.acc &= self.memory[address]
+
+    def exec_or(self, address, ir):
+        self.acc |= self.memory[address]
+
+    def exec_not(self, address, ir):
+        self.acc = ~self.acc & 0xFFFF
+
+    def exec_xor(self, address, ir):
+        self.acc ^= self.memory[address]
+
+    def __str__(self):
+        psr = self.get_psr()
+        return 'PC=%04x ACC=%04x (%d) X1=%04x X2=%04x X3=%04x PSR=[CR=%d NG=%d ZR=%d OF=%d]' % (
+            self.pc, self.acc, self.acc - ((self.acc & 0x8000) << 1)
+            , self.idx[1], self.idx[2], self.idx[3]
+            , bool(psr & IsaSimulator.PSR_CR), bool(psr & IsaSimulator.PSR_NG)
+            , bool(psr & IsaSimulator.PSR_ZR), bool(psr & IsaSimulator.PSR_OF))
@@ -0,0 +1,272 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# PART OF THE ARSC ASSEMBLER
+#
+import re
+
+# Built-in table generators for the VGA video memory, where each word holds 5
+# pixels of 3 bits and each row of 640 pixels takes 128 words: the word of the
+# pixel column within the row, the offset of the pixel within the word, the shift
+# of its color, the mask clearing the pixel (for X in 0..639) and the word address
+# of the row (for X in 0..479)
+GENERATORS = dict(
+    PIXEL_WORD      = 'X/5'
+    , PIXEL_OFFSET  = 'X%5'
+    , PIXEL_SHIFT   = '3*(X%5)'
+    , PIXEL_MASK    = '0x7FFF&~(7<<3*(X%5))'
+    , ROW_ADDRESS   = 'X<<7'
+)
+
+# Instructions that compute the operation in software (with the left operand in ACC
+# and the right one in the memory) as done by the demo programs. The shifts loop on
+# an index register, the multiplication adds and shifts once per bit of the
+# multiplier, and the division (and the remainder) doubles the divisor up to the
+# dividend and then subtracts it back once per quotient bit
+OPERATION_STEPS = {
+    '+'     : ['ADD']
+    , '-'   : ['STA', 'LDA', 'TCA', 'ADD']
+    , '&'   : ['AND']
+    , '|'   : ['OR']
+    , '^'   : ['XOR']
+    , 'neg' : ['TCA']
+    , '~'   : ['NOT']
+    , 'shift_start' : ['LDX', 'TIX']
+    , '<<'  : ['TIX', 'SHL', 'BRU']
+    , '>>'  : ['TIX', 'SHR', 'BRU']
+    , '*'   : ['LDA', 'AND', 'BIN', 'LDA', 'ADD', 'STA', 'LDA', 'SHL', 'STA', 'LDA', 'SHR', 'STA', 'BRU']
+    , '/'   : ['LDA', 'BIP', 'TCA', 'ADD', 'BIN', 'STX', 'LDA', 'ADD', 'STA', 'LDX', 'LDA', 'STA', 'SHL', 'STA'
+               , 'BRU', 'STX', 'LDA', 'BIN', 'LDA', 'TCA', 'ADD', 'BIN', 'LDA', 'SHL', 'ADD', 'STA', 'LDA'
+               , 'TCA', 'ADD', 'STA', 'BRU', 'LDA', 'TCA', 'ADD', 'STA', 'STX', 'LDA', 'ADD', 'STA', 'LDX', 'BRU']
+}
+OPERATION_STEPS['%'] = OPERATION_STEPS['/']
+
+# Expression generating the table entries from the index X (0..COUNT-1). Integer
+# literals (decimal or hexadecimal), X, the parentheses and the C operators
+# - ~ (unary), * / %, + -, << >>, &, ^ and | are allowed, with the C precedence.
+# The division truncates toward zero. The expression is parsed into a tree of
+# (operator, operands...) tuples, where the leaves are ('X',) and ('int', value)
+class TableExpression:
+    TOKEN_RE = re.compile(r'\s*(?:(0x[0-9a-fA-F]+|[0-9]+)|(X)|(<<|>>|[-+*/%&|^~()]))')
+
+    # Binary operators by the precedence level, from the lowest
+    LEVELS = [['|'], ['^'], ['&'], ['<<', '>>'], ['+', '-'], ['*', '/', '%']]
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = self.tokenize(text)
+        self.pos = 0
+        self.tree = self.parse_binary(0)
+        if self.pos != len(self.tokens):
+            raise SyntaxError('unexpected "%s" in the table expression "%s"' % (self.tokens[self.pos][1], text))
+
+    def tokenize(self, text):
+        tokens = []
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            match = TableExpression.TOKEN_RE.match(text, pos)
+            if match is None:
+                raise SyntaxError('unexpected character "%s" in the table expression "%s"' % (text[pos:].strip()[0], text))
+            number, variable, operator = match.groups()
+            if number is not None:
+                tokens.append(('int', int(number, 0)))
+            elif variable is not None:
+                tokens.append(('X', variable))
+            else:
+                tokens.append(('op', operator))
+            pos = match.end()
+        return tokens
+
+    def peek(self):
+        return self.tokens[self.pos][1] if self.pos < len(self.tokens) else None
+
+    def parse_binary(self, level):
+        if level == len(TableExpression.LEVELS):
+            return self.parse_unary()
+
+        tree = self.parse_binary(level + 1)
+        while self.peek() in TableExpression.LEVELS[level]:
+            operator = self.peek()
+            self.pos += 1
+            tree = (operator, tree, self.parse_binary(level + 1))
+        return tree
+
+    def parse_unary(self):
+        if self.pos == len(self.tokens):
+            raise SyntaxError('incomplete table expression "%s"' % self.text)
+
+        kind, token = self.tokens[self.pos]
+        self.pos += 1
+        if kind == 'int':
+            return ('int', token)
+        elif kind == 'X':
+            return ('X',)
+        elif token == '-':
+            return ('neg', self.parse_unary())
+        elif token == '~':
+            return ('~', self.parse_unary())
+        elif token == '+':
+            return self.parse_unary()
+        elif token == '(':
+            tree = self.parse_binary(0)
+            if self.peek() != ')':
+                raise SyntaxError('missing ")" in the table expression "%s"' % self.text)
+            self.pos += 1
+            return tree
+        raise SyntaxError('unexpected "%s" in the table expression "%s"' % (token, self.text))
+
+    # Returns the value of the expression for the index x
+    def evaluate(self, x):
+        return self.evaluate_tree(self.tree, x)
+
+    def evaluate_tree(self, tree, x):
+        operator = tree[0]
+        if operator == 'int':
+            return tree[1]
+        elif operator == 'X':
+            return x
+        elif operator == 'neg':
+            return -self.evaluate_tree(tree[1], x)
+        elif operator == '~':
+            return ~self.evaluate_tree(tree[1], x)
+
+        left = self.evaluate_tree(tree[1], x)
+        right = self.evaluate_tree(tree[2], x)
+        if operator in ['/', '%']:
+            if right == 0:
+                raise SyntaxError('division by zero in the table expression "%s"' % self.text)
+            quotient = abs(left) // abs(right) * (1 if (left < 0) == (right < 0) else -1)
+            return quotient if operator == '/' else left - quotient * right
+        elif operator in ['<<', '>>']:
+            if right < 0:
+                raise SyntaxError('negative shift in the table expression "%s"' % self.text)
+            return left << right if operator == '<<' else left >> right
+        elif operator == '+':
+            return left + right
+        elif operator == '-':
+            return left - right
+        elif operator == '*':
+            return left * right
+        elif operator == '&':
+            return left & right
+        elif operator == '|':
+            return left | right
+        return left ^ right
+
+    # Returns the estimated clock cycles of computing the expression for the index x
+    # in software (see OPERATION_STEPS)
+    def get_software_cycles(self, x, step_cycles):
+        return self.get_tree_cycles(self.tree, x, step_cycles)
+
+    def get_tree_cycles(self, tree, x, step_cycles):
+        operator = tree[0]
+        if operator == 'int':
+            return 0
+        elif operator == 'X':
+            return step_cycles['load']
+        elif operator in ['neg', '~']:
+            return self.get_tree_cycles(tree[1], x, step_cycles) + step_cycles[operator]
+
+        # A constant left operand is loaded like X
+        cycles = self.get_tree_cycles(tree[1], x, step_cycles) if tree[1][0] != 'int' else step_cycles['load']
+        if tree[2][0] not in ['int', 'X']:
+            # The right operand is computed first and kept in a temporary word
+            cycles += self.get_tree_cycles(tree[2], x, step_cycles) + step_cycles['store']
+        left = abs(self.evaluate_tree(tree[1], x))
+        right = abs(self.evaluate_tree(tree[2], x))
+        if operator in ['<<', '>>']:
+            return cycles + step_cycles['shift_start'] + right * step_cycles[operator]
+        elif operator == '*':
+            return cycles + max(1, right.bit_length()) * step_cycles[operator]
+        elif operator in ['/', '%']:
+            return cycles + max(1, left.bit_length() - right.bit_length() + 1) * step_cycles[operator]
+        return cycles + step_cycles[operator]
+
+
+# Returns the constants of the table of count entries generated by the expression
+# (or the built-in generator) as the signed 16-bit values of the BSC directive
+def generate_table(count, expression):
+    if not 0 < count <= 0x10000:
+        raise SyntaxError('table size must be in range [1, 65536]')
+
+    expression = TableExpression(GENERATORS.get(expression, expression))
+    constants = []
+    for x in range(0, count):
+        value = expression.evaluate(x)
+        if value < -32768 or value > 65535:
+            raise SyntaxError('table entry %d (%d) is out of range [-32768, 65535]' % (x, value))
+        constants.append(value - 65536 if value > 32767 else value)
+    return constants
+
+
+# Generated table of the program: its TABLE directive, address and the number of
+# instructions looking it up. A lookup (LDX and LDA indexed) is compared with
+# computing the entry in software, averaged over all the entries
+class LookupTable:
+    def __init__(self, stmt, address, lookups, cycle_model):
+        self.symbol = stmt.ConstantSymbol
+        self.address = address
+        self.size = len(stmt.Constants)
+        self.expression = TableExpression(GENERATORS.get(stmt.TableExpression, stmt.TableExpression))
+        self.generator = stmt.TableExpression
+        self.lookups = lookups
+
+        step_cycles = dict((operator, sum(cycle_model.get_mnemonic_cycles(mnemonic) for mnemonic in steps))
+                           for operator, steps in OPERATION_STEPS.items())
+        step_cycles['load'] = cycle_model.get_mnemonic_cycles('LDA')
+        step_cycles['store'] = cycle_model.get_mnemonic_cycles('STA')
+        self.software_cycles = float(sum(self.expression.get_software_cycles(x, step_cycles)
+                                         for x in range(0, self.size))) / self.size
+        self.lookup_cycles = cycle_model.get_mnemonic_cycles('LDX') + cycle_model.get_mnemonic_cycles('LDA')
+
+    def get_saved_cycles(self):
+        return self.software_cycles - self.lookup_cycles
+
+    def __str__(self):
+        return '%-12s 0x%04x-0x%04x %6d words %4d lookups %10.1f %6d %10.1f  %s' % (
+            self.symbol, self.address, self.address + self.size - 1, self.size, self.lookups
+            , self.software_cycles, self.lookup_cycles, self.get_saved_cycles(), self.generator)
+
+
+# Report of the generated tables (LookupTable) as a printable string: the average
+# cycles of computing an entry, of looking it up and the cycles saved per lookup
+def get_table_report(tables):
+    lines = ['lookup tables:%50s %6s %10s' % ('computed', 'lookup', 'saved')]
+    for table in tables:
+        lines.append('  %s' % table)
+    lines.append('  total: %d words, %.0f cycles saved once each lookup is executed' % (
+        sum(table.size for table in tables), sum(table.get_saved_cycles() * table.lookups for table in tables)))
+    return '\n'.join(lines)
@@ -0,0 +1,109 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# PART OF THE ARSC ASSEMBLER
+#
+
+# Kinds of the memory: the on-chip RAM (onchip_main_ram.v) is read and written in
+# one clock cycle, the SDRAM (sdram_control.v) has a much longer access latency
+MEMORY_KINDS = ['ONCHIP', 'SDRAM']
+
+# Named range [start, end] of the memory addresses declared by the REGION directive.
+# The ANCHOR directive naming the region resumes the allocation at next_addr, past
+# the words already allocated in the region
+class MemoryRegion:
+    def __init__(self, name, start, end, kind):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.kind = kind
+        self.next_addr = start
+        self.used_words = 0
+
+    def contains(self, address):
+        return self.start <= address <= self.end
+
+    def is_slow(self):
+        return self.kind == 'SDRAM'
+
+    def __len__(self):
+        return self.end - self.start + 1
+
+    def __str__(self):
+        return '%s (%s, 0x%04x-0x%04x)' % (self.name, self.kind, self.start, self.end)
+
+
+# The memory regions of the program
+class MemoryMap:
+    def __init__(self):
+        self.regions = []
+        self.regions_by_name = dict()
+
+    def __len__(self):
+        return len(self.regions)
+
+    def add_region(self, region):
+        if region.name in self.regions_by_name:
+            raise SyntaxError('redefinition of the memory region "%s"' % region.name)
+        for other in self.regions:
+            if region.start <= other.end and other.start <= region.end:
+                raise SyntaxError('memory region "%s" overlaps the region %s' % (region.name, other))
+
+        self.regions.append(region)
+        self.regions_by_name[region.name] = region
+
+    def get_region(self, name):
+        if name not in self.regions_by_name:
+            raise SyntaxError('unknown memory region "%s"' % name)
+        return self.regions_by_name[name]
+
+    # Returns the region of the address, or None
+    def find_region(self, address):
+        for region in self.regions:
+            if region.contains(address):
+                return region
+        return None
+
+    # Returns the regions overlapping the range [start, end)
+    def find_regions(self, start, end):
+        return [region for region in self.regions if region.start < end and start <= region.end]
+
+    # Usage of the regions as a printable string
+    def __str__(self):
+        lines = ['memory regions:']
+        for region in self.regions:
+            lines.append('  %-12s %-6s 0x%04x-0x%04x %6d of %6d words used' % (
+                region.name, region.kind, region.start, region.end, region.used_words, len(region)))
+        return '\n'.join(lines)
@@ -0,0 +1,248 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# PART OF THE ARSC ASSEMBLER
+#
+from array import array
+from asm_stmt import ISA
+from cycle_model import CycleModel
+from isa_simulator import IsaSimulator
+from memory_regions import MemoryRegion, MEMORY_KINDS
+
+# Clock frequency of the ARSC system (see docs/BUILD_RUN_ARSC.md)
+CLOCK_FREQUENCY = 50000000
+
+# Timing of the on-chip RAM (onchip_main_ram.v): every read and write is done
+# within one clock cycle
+class OnChipTiming:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        pass
+
+    def access(self, address, clock, is_read):
+        return 1
+
+
+
+# Timing of the SDRAM controller (sdram_control.v). The controller keeps the row
+# of the last access open, so the next access to the same row (bank address[10],
+# row address[15:11]) in the same direction takes read_cycles or write_cycles
+# only. An access to a closed row activates it first, and an access to another
+# row, or in the other direction, precharges the open row and activates the new
+# one. Every refresh_interval cycles the controller refreshes the SDRAM, which
+# closes the row and holds the accesses issued meanwhile for refresh_cycles
+class SdramTiming:
+    def __init__(self, read_cycles=6, write_cycles=2, activate_cycles=3, precharge_cycles=3
+                 , refresh_interval=391, refresh_cycles=7):
+        self.read_cycles = read_cycles
+        self.write_cycles = write_cycles
+        self.activate_cycles = activate_cycles
+        self.precharge_cycles = precharge_cycles
+        self.refresh_interval = refresh_interval
+        self.refresh_cycles = refresh_cycles
+        self.reset()
+
+    def reset(self):
+        self.open_row = None
+        self.next_refresh = self.refresh_interval
+        self.row_hits = 0
+        self.row_activations = 0
+        self.row_misses = 0
+        self.refreshes = 0
+
+    # Returns the cycles of the access issued at the clock cycle
+    def access(self, address, clock, is_read):
+        cycles = self.read_cycles if is_read else self.write_cycles
+        if clock >= self.next_refresh:
+            # Only the last of the refreshes due since the previous access may still be in progress
+            missed = (clock - self.next_refresh) // self.refresh_interval
+            last_refresh = self.next_refresh + missed * self.refresh_interval
+            self.refreshes += missed + 1
+            self.next_refresh = last_refresh + self.refresh_interval
+            self.open_row = None
+            cycles += max(0, last_refresh + self.refresh_cycles - clock)
+
+        row = (address >> 10) << 1 | is_read
+        if row == self.open_row:
+            self.row_hits += 1
+        elif self.open_row is None:
+            self.row_activations += 1
+            cycles += self.activate_cycles
+        else:
+            self.row_misses += 1
+            cycles += self.precharge_cycles + self.activate_cycles
+        self.open_row = row
+        return cycles
+
+    def __str__(self):
+        return 'SDRAM: %d row hits, %d activations, %d row misses, %d refreshes' % (
+            self.row_hits, self.row_activations, self.row_misses, self.refreshes)
+
+
+# Memory timing of the ARSC system: the memory regions (those declared by the
+# program, and the rest of the memory of default_kind) with the timing of their
+# kind of memory, and the accesses and cycles counted per region. The regions of
+# the same kind share the timing, as they share the memory controller. The clock
+# is the cycle count of the simulated program so far; the stall cycles are those
+# spent waiting for the memory on top of the one cycle of the on-chip RAM
+class MemoryTiming:
+    # Kinds of the accesses: instruction fetch, DEFER (pointer) read, operand read and write
+    FETCH, DEFER, READ, WRITE = 0, 1, 2, 3
+
+    def __init__(self, memory_map=None, default_kind='ONCHIP', sdram_timing=None, io_cycles=1):
+        if default_kind not in MEMORY_KINDS:
+            raise ValueError('unknown memory kind "%s"' % default_kind)
+        self.timings = dict(ONCHIP=OnChipTiming(), SDRAM=sdram_timing if sdram_timing is not None else SdramTiming())
+        # The costs of the instructions accessing the on-chip RAM (the stalls are added per access)
+        self.cycle_model = CycleModel(1, 1, io_cycles)
+
+        self.regions = list(memory_map.regions) if memory_map is not None else []
+        self.region_ids = array('H', [len(self.regions)]) * IsaSimulator.MEMORY_SIZE
+        for region_id, region in enumerate(self.regions):
+            self.region_ids[region.start:region.end + 1] = array('H', [region_id]) * len(region)
+        self.regions.append(MemoryRegion('default', 0, IsaSimulator.MEMORY_SIZE - 1, default_kind))
+        self.region_timings = [self.timings[region.kind] for region in self.regions]
+        self.reset()
+
+    def reset(self):
+        for timing in self.timings.values():
+            timing.reset()
+        self.clock = 0
+        self.accesses = [[0, 0, 0, 0] for region in self.regions]
+        self.cycles = [0] * len(self.regions)
+        self.stall_cycles = [0] * len(self.regions)
+
+    # Counts the access of the kind to the address and adds its stall cycles to the clock
+    def access(self, address, kind):
+        region_id = self.region_ids[address]
+        cycles = self.region_timings[region_id].access(address, self.clock, kind != MemoryTiming.WRITE)
+        self.accesses[region_id][kind] += 1
+        self.cycles[region_id] += cycles
+        self.stall_cycles[region_id] += cycles - 1
+        self.clock += cycles - 1
+
+    def get_stall_cycles(self):
+        return sum(self.stall_cycles)
+
+    # Estimated wall time of the simulated program in seconds
+    def get_wall_time(self):
+        return float(self.clock) / CLOCK_FREQUENCY
+
+    # Report of the accesses and cycles per region (the unused regions are left out)
+    def get_report(self):
+        lines = ['%-12s %-6s %12s %12s %12s %12s %12s %12s\n' % (
+            'region', 'kind', 'fetches', 'defers', 'reads', 'writes', 'mem cycles', 'stalls')]
+        for region_id, region in enumerate(self.regions):
+            fetches, defers, reads, writes = self.accesses[region_id]
+            if fetches + defers + reads + writes == 0:
+                continue
+            lines.append('%-12s %-6s %12d %12d %12d %12d %12d %12d\n' % (
+                region.name, region.kind, fetches, defers, reads, writes
+                , self.cycles[region_id], self.stall_cycles[region_id]))
+        if any(sum(self.accesses[region_id]) for region_id, region in enumerate(self.regions) if region.is_slow()):
+            lines.append('%s\n' % self.timings['SDRAM'])
+        stall_cycles = self.get_stall_cycles()
+        lines.append('total: %d cycles, %d stall cycles (%.1f%%), %.6f s at %d MHz\n' % (
+            self.clock, stall_cycles, 100.0 * stall_cycles / max(self.clock, 1), self.get_wall_time()
+            , CLOCK_FREQUENCY // 1000000))
+        return ''.join(lines)
+
+
+# Simulator that runs the program against the memory timing. Each instruction is
+# charged its on-chip cost from the cycle model, and each of its memory accesses
+# (the fetch, the DEFER read of the indirect non-I/O instructions and the operand
+# read or write of the EXECUTE cycle) is passed to the timing for the stalls
+class LatencySimulator(IsaSimulator):
+    def __init__(self, image=None, timing=None):
+        self.timing = timing if timing is not None else MemoryTiming()
+        costs = self.timing.cycle_model.costs
+        # The operand accesses and DEFER reads by the opcode
+        self.operand_reads = [0] * 32
+        self.operand_writes = [0] * 32
+        self.defers = [costs[opcode][1] != costs[opcode][0] for opcode in range(0, 32)]
+        for mnemonic, (phases, reads, writes, ios) in CycleModel.EXECUTE_PHASES.items():
+            self.operand_reads[ISA[mnemonic]] = reads
+            self.operand_writes[ISA[mnemonic]] = writes
+        IsaSimulator.__init__(self, image)
+
+    def reset(self):
+        IsaSimulator.reset(self)
+        self.timing.reset()
+
+    # Same as IsaSimulator.run, with the memory accesses passed to the timing
+    def run(self, max_steps=None):
+        memory = self.memory
+        handlers = self.handlers
+        modes = self.modes
+        idx = self.idx
+        timing = self.timing
+        access = timing.access
+        costs = timing.cycle_model.costs
+        defers = self.defers
+        operand_reads = self.operand_reads
+        operand_writes = self.operand_writes
+        INDEXED, INDIRECT = IsaSimulator.INDEXED, IsaSimulator.INDIRECT
+        FETCH, DEFER, READ, WRITE = MemoryTiming.FETCH, MemoryTiming.DEFER, MemoryTiming.READ, MemoryTiming.WRITE
+        limit = max_steps if max_steps is not None else -1
+        steps = 0
+        self.running = True
+        while self.running and steps != limit:
+            pc = self.pc
+            access(pc, FETCH)
+            ir = memory[pc]
+            self.pc = (pc + 1) & 0xFFFF
+            opcode = ir >> 11
+            mode = modes[opcode]
+            indirect = (ir >> 10) & 1
+            address = ir & 0xFF
+            if mode & INDEXED:
+                address = (address + idx[(ir >> 8) & 3]) & 0xFFFF
+            if indirect and defers[opcode]:
+                access(address, DEFER)
+                if mode & INDIRECT:
+                    address = memory[address]
+            if operand_reads[opcode]:
+                access(address, READ)
+            elif operand_writes[opcode]:
+                access(address, WRITE)
+            timing.clock += costs[opcode][indirect]
+            handlers[opcode](address, ir)
+            steps += 1
+
+        self.running = False
+        self.steps += steps
+        return steps
@@ -0,0 +1,219 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# PART OF THE ARSC ASSEMBLER
+#
+from asm_stmt import AsmInstruction, AsmLabel, DirectiveType
+from cycle_model import CycleModel
+
+# Instructions without the address operand
+ZERO_ADDRESS_INSTRUCTIONS = ['HLT', 'TCA', 'SHL', 'SHR']
+
+# Branches without side effects (removed if they branch to the next instruction)
+PLAIN_BRANCHES = ['BRU', 'BIP', 'BIN']
+
+# Branches whose target may be threaded through a chain of BRUs
+BRANCHES = PLAIN_BRANCHES + ['TIX', 'TDX']
+
+# Instructions whose index register is not added to the address (as in the HCU)
+NON_INDEXED_INSTRUCTIONS = ['LDX', 'STX', 'TIX', 'TDX']
+
+# Peephole optimizer of the parsed statements ((stmt, lineno) pairs). The rewrites,
+# applied until none of them applies any more, are:
+#   store_load      STA X; LDA X        -> STA X    (ACC already holds X)
+#   load_load       LDA X; LDA X        -> LDA X
+#   branch_to_next  BRU/BIP/BIN L; L:   -> L:       (branch to the next instruction)
+#   branch_chain    B L; ... L: BRU M   -> B M      (B being any branch)
+# Only direct (non-indexed, non-indirect) symbolic operands are considered, and the
+# removed LDA must not be a branch target (labeled). The instructions are removed
+# from the statements, so the label addresses must be recomputed by another first
+# pass. As the code shrinks, the programs whose correctness depends on the code
+# addresses are left unchanged (see 'get_unsafe_reason'): absolute addresses,
+# aliases with the absolute or code-relative addresses, the indexed or indirect
+# branches (computed targets) and the code labels used as data (self-modifying code)
+class PeepholeOptimizer:
+    def __init__(self, cycle_model=None):
+        self.cycle_model = cycle_model if cycle_model is not None else CycleModel()
+        self.rewrites = dict(store_load=0, load_load=0, branch_to_next=0, branch_chain=0)
+        self.removed_instructions = 0
+        # Cycles saved by each execution of the rewritten instructions
+        self.saved_cycles = 0
+        self.skipped_reason = None
+
+    # Returns the optimized list of the statement pairs
+    def optimize(self, stmt_pairs):
+        stmt_pairs = list(stmt_pairs)
+        self.skipped_reason = self.get_unsafe_reason(stmt_pairs)
+        if self.skipped_reason is not None:
+            return stmt_pairs
+
+        changed = True
+        while changed:
+            changed = self.thread_branches(stmt_pairs)
+            optimized_pairs = self.remove_instructions(stmt_pairs)
+            changed = changed or len(optimized_pairs) != len(stmt_pairs)
+            stmt_pairs = optimized_pairs
+
+        return stmt_pairs
+
+    # Maps the code labels (and their aliases) to the index of the labeled instruction
+    def get_code_labels(self, stmt_pairs):
+        code_labels = dict()
+        pending = []
+        for i, (stmt, lineno) in enumerate(stmt_pairs):
+            if isinstance(stmt, AsmLabel):
+                pending.append(stmt.Label)
+            elif isinstance(stmt, AsmInstruction):
+                for label in pending:
+                    code_labels[label] = i
+                pending = []
+            elif stmt.DirType == DirectiveType.ALIAS and hasattr(stmt, 'OriginalSymbol') \
+                    and stmt.OriginalSymbol in code_labels:
+                code_labels[stmt.AliasSymbol] = code_labels[stmt.OriginalSymbol]
+
+        return code_labels
+
+    # Returns why the statements can't be optimized safely, or None
+    def get_unsafe_reason(self, stmt_pairs):
+        code_labels = self.get_code_labels(stmt_pairs)
+        for stmt, lineno in stmt_pairs:
+            if isinstance(stmt, AsmInstruction):
+                if stmt.Mnemonic in ZERO_ADDRESS_INSTRUCTIONS:
+                    continue
+                elif stmt.HasAbsoluteAddress:
+                    return 'absolute address in line %d' % lineno
+                elif stmt.Mnemonic in BRANCHES and not self.is_direct(stmt):
+                    return 'indexed or indirect branch in line %d' % lineno
+                elif stmt.Address in code_labels and stmt.Mnemonic not in BRANCHES:
+                    return 'code label "%s" used as data in line %d' % (stmt.Address, lineno)
+            elif isinstance(stmt, AsmLabel):
+                continue
+            elif stmt.DirType == DirectiveType.ANCHOR:
+                return 'ANCHOR directive in line %d' % lineno
+            elif stmt.DirType == DirectiveType.ALIAS:
+                if hasattr(stmt, 'AbsAddress'):
+                    return 'alias of the absolute address in line %d' % lineno
+                elif hasattr(stmt, 'BaseSymbol') and stmt.BaseSymbol in code_labels:
+                    return 'alias relative to the code label "%s" in line %d' % (stmt.BaseSymbol, lineno)
+
+        return None
+
+    # True for the instructions that address the memory word of their symbol
+    def is_direct(self, stmt):
+        return (isinstance(stmt, AsmInstruction) and stmt.Mnemonic not in ZERO_ADDRESS_INSTRUCTIONS
+                and not stmt.HasAbsoluteAddress and stmt.IndirectOrIODeviceBit == 0
+                and (stmt.Index == 0 or stmt.Mnemonic in NON_INDEXED_INSTRUCTIONS))
+
+    def get_cycles(self, stmt):
+        return self.cycle_model.get_cycles(stmt.Opcode, stmt.IndirectOrIODeviceBit)
+
+    # Redirects the branches to the targets of the BRU chains they branch to.
+    # Returns True if any branch has been redirected
+    def thread_branches(self, stmt_pairs):
+        code_labels = self.get_code_labels(stmt_pairs)
+        changed = False
+        for stmt, lineno in stmt_pairs:
+            if not self.is_direct(stmt) or stmt.Mnemonic not in BRANCHES:
+                continue
+
+            target = stmt.Address
+            visited = set([target])
+            skipped_cycles = 0
+            while target in code_labels:
+                target_stmt = stmt_pairs[code_labels[target]][0]
+                if target_stmt.Mnemonic != 'BRU' or not self.is_direct(target_stmt) \
+                        or target_stmt.Address in visited:
+                    break
+                skipped_cycles += self.get_cycles(target_stmt)
+                target = target_stmt.Address
+                visited.add(target)
+
+            if target != stmt.Address:
+                stmt.StmtString = '%s // -> %s' % (stmt.StmtString.rstrip(), target)
+                stmt.Address = target
+                stmt.SymbolId = None
+                self.rewrites['branch_chain'] += 1
+                self.saved_cycles += skipped_cycles
+                changed = True
+
+        return changed
+
+    # Returns the statements without the redundant loads and branches to the next
+    # instruction
+    def remove_instructions(self, stmt_pairs):
+        code_labels = self.get_code_labels(stmt_pairs)
+        optimized_pairs = []
+        # The previous instruction, unless a label follows it
+        prev_stmt = None
+        for i, (stmt, lineno) in enumerate(stmt_pairs):
+            if not isinstance(stmt, AsmInstruction):
+                optimized_pairs.append((stmt, lineno))
+                if isinstance(stmt, AsmLabel):
+                    prev_stmt = None
+                continue
+
+            rewrite = None
+            if self.is_direct(stmt):
+                if stmt.Mnemonic in PLAIN_BRANCHES and code_labels.get(stmt.Address) == self.get_next_instruction(stmt_pairs, i):
+                    rewrite = 'branch_to_next'
+                elif stmt.Mnemonic == 'LDA' and self.is_direct(prev_stmt) and prev_stmt.Address == stmt.Address:
+                    if prev_stmt.Mnemonic == 'STA':
+                        rewrite = 'store_load'
+                    elif prev_stmt.Mnemonic == 'LDA':
+                        rewrite = 'load_load'
+
+            if rewrite is None:
+                optimized_pairs.append((stmt, lineno))
+                prev_stmt = stmt
+            else:
+                self.rewrites[rewrite] += 1
+                self.removed_instructions += 1
+                self.saved_cycles += self.get_cycles(stmt)
+
+        return optimized_pairs
+
+    # Returns the index of the first instruction after the i-th statement
+    def get_next_instruction(self, stmt_pairs, i):
+        for j in range(i + 1, len(stmt_pairs)):
+            if isinstance(stmt_pairs[j][0], AsmInstruction):
+                return j
+        return None
+
+    def __str__(self):
+        if self.skipped_reason is not None:
+            return 'peephole optimization skipped: %s' % self.skipped_reason
+        return 'peephole optimization: %d instructions removed, %d branches threaded, %d cycles saved per execution (%s)' % (
+            self.removed_instructions, self.rewrites['branch_chain'], self.saved_cycles
+            , ', '.join('%s=%d' % item for item in sorted(self.rewrites.items())))
@@ -0,0 +1,205 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# PART OF THE ARSC ASSEMBLER
+#
+from array import array
+from asm_parser import AsmParser
+from asm_stmt import DirectiveType
+from compiler_engine import FirstPassDriver
+from cycle_model import CycleModel
+from isa_simulator import IsaSimulator, MemoryMappedDevice, QueueInputDevice
+from video_memory import VIDEO_MEMORY_SIZE
+
+# First pass driver that maps each memory address to the source line it has been
+# generated from, and keeps the statement text of the instructions
+class SourceMapDriver(FirstPassDriver):
+    def __init__(self, parser):
+        FirstPassDriver.__init__(self)
+        self.parser = parser
+        self.linenos = array('l')
+        self.stmt_strings = dict()
+
+    def on_instruction(self, stmt):
+        start = self.curr_addr
+        result = FirstPassDriver.on_instruction(self, stmt)
+        self.map_addresses(start)
+        self.stmt_strings[self.curr_addr - 1] = stmt.StmtString.strip()
+        return result
+
+    def on_directive(self, stmt):
+        start = self.curr_addr
+        result = FirstPassDriver.on_directive(self, stmt)
+        if stmt.DirType != DirectiveType.ANCHOR:
+            self.map_addresses(start)
+        return result
+
+    # Maps the addresses allocated by the statement (from start) to the current line
+    def map_addresses(self, start):
+        if len(self.linenos) < self.curr_addr:
+            self.linenos.extend(array('l', [0]) * (self.curr_addr - len(self.linenos)))
+        self.linenos[start:self.curr_addr] = array('l', [self.parser.last_lineno]) * (self.curr_addr - start)
+
+    # Returns the source line of the address (0 if unknown)
+    def get_lineno(self, address):
+        return self.linenos[address] if address < len(self.linenos) else 0
+
+# Parses the source and returns the SourceMapDriver with its source map and the
+# source lines
+def build_source_map(filename):
+    parser = AsmParser(filename)
+    driver = SourceMapDriver(parser)
+    parser.parse(driver)
+    return driver, parser.src_lines
+
+
+# Simulator that counts the executions of each instruction address. The counters
+# are a flat array of 64K integers incremented by the interpreter loop, which is
+# the only cost of the profiling; the clock cycles and the I/O operations are
+# derived from the counts (see Profile)
+class ProfilingSimulator(IsaSimulator):
+    def __init__(self, image=None):
+        self.counts = array('L', [0]) * IsaSimulator.MEMORY_SIZE
+        IsaSimulator.__init__(self, image)
+
+    # Same as IsaSimulator.run, with the execution counting
+    def run(self, max_steps=None):
+        memory = self.memory
+        handlers = self.handlers
+        modes = self.modes
+        idx = self.idx
+        counts = self.counts
+        INDEXED, INDIRECT = IsaSimulator.INDEXED, IsaSimulator.INDIRECT
+        limit = max_steps if max_steps is not None else -1
+        steps = 0
+        self.running = True
+        while self.running and steps != limit:
+            pc = self.pc
+            counts[pc] += 1
+            ir = memory[pc]
+            self.pc = (pc + 1) & 0xFFFF
+            opcode = ir >> 11
+            mode = modes[opcode]
+            address = ir & 0xFF
+            if mode & INDEXED:
+                address = (address + idx[(ir >> 8) & 3]) & 0xFFFF
+            if mode & INDIRECT and ir & 0x400:
+                address = memory[address]
+            handlers[opcode](address, ir)
+            steps += 1
+
+        self.running = False
+        self.steps += steps
+        return steps
+
+
+# Execution profile of a program: the executions, estimated clock cycles and I/O
+# operations (RWD/WWD) per instruction address, mapped back to the source lines if
+# the source map is given. The cycles are estimated from the instruction words in
+# the memory at the end of the simulation
+class Profile:
+    def __init__(self, simulator, source_map=None, src_lines=None, cycle_model=None):
+        self.source_map = source_map
+        self.src_lines = src_lines
+        cycle_model = cycle_model if cycle_model is not None else CycleModel()
+        self.addresses = [address for address, count in enumerate(simulator.counts) if count]
+        self.executions = dict()
+        self.cycles = dict()
+        self.io_operations = dict()
+        for address in self.addresses:
+            word = simulator.memory[address]
+            count = simulator.counts[address]
+            self.executions[address] = count
+            self.cycles[address] = count * cycle_model.get_word_cycles(word)
+            self.io_operations[address] = count if (word >> 11) in CycleModel.IO_INSTRUCTIONS else 0
+        self.total_executions = sum(self.executions.values())
+        self.total_cycles = sum(self.cycles.values())
+
+    def get_lineno(self, address):
+        return self.source_map.get_lineno(address) if self.source_map is not None else 0
+
+    def get_stmt_string(self, address):
+        if self.source_map is None:
+            return ''
+        return self.source_map.stmt_strings.get(address, '')
+
+    # Report of the n instruction addresses with the most clock cycles
+    def get_top_report(self, n=10):
+        lines = ['%-6s %-8s %6s %12s %12s %7s %10s  %s\n' % (
+            'rank', 'address', 'line', 'executions', 'cycles', 'cycles%', 'I/O', 'statement')]
+        ranking = sorted(self.addresses, key=lambda address: (-self.cycles[address], address))
+        for rank, address in enumerate(ranking[:n]):
+            lines.append('%-6d 0x%04x   %6s %12d %12d %6.1f%% %10d  %s\n' % (
+                rank + 1, address, self.get_lineno(address) or '-', self.executions[address]
+                , self.cycles[address], 100.0 * self.cycles[address] / max(self.total_cycles, 1)
+                , self.io_operations[address], self.get_stmt_string(address)))
+        lines.append('total: %d instructions, %d cycles\n' % (self.total_executions, self.total_cycles))
+        return ''.join(lines)
+
+    # Source listing annotated with the executions, cycles and I/O operations of
+    # each line
+    def get_listing(self):
+        if self.src_lines is None:
+            raise RuntimeError('the source is not available')
+
+        line_counts = dict()
+        for address in self.addresses:
+            counts = line_counts.setdefault(self.get_lineno(address), [0, 0, 0])
+            counts[0] += self.executions[address]
+            counts[1] += self.cycles[address]
+            counts[2] += self.io_operations[address]
+
+        lines = ['%12s %12s %7s %8s | %5s  %s\n' % ('executions', 'cycles', 'cycles%', 'I/O', 'line', 'source')]
+        for lineno, src_line in enumerate(self.src_lines, 1):
+            if lineno in line_counts:
+                executions, cycles, io_operations = line_counts[lineno]
+                lines.append('%12d %12d %6.1f%% %8s | %5d  %s\n' % (
+                    executions, cycles, 100.0 * cycles / max(self.total_cycles, 1)
+                    , io_operations or '', lineno, src_line.rstrip()))
+            else:
+                lines.append('%12s %12s %7s %8s | %5d  %s\n' % ('', '', '', '', lineno, src_line.rstrip()))
+        return ''.join(lines)
+
+
+# Runs the memory image (with the video memory and no keyboard input) for at most
+# max_steps instructions and returns the executions of each address
+def profile_image(image, max_steps):
+    simulator = ProfilingSimulator(image)
+    video_memory = MemoryMappedDevice(VIDEO_MEMORY_SIZE)
+    simulator.set_in_device(0, video_memory)
+    simulator.set_out_device(0, video_memory)
+    simulator.set_in_device(1, QueueInputDevice())
+    simulator.run(max_steps)
+    return simulator.counts
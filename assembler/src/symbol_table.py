@@ -36,20 +36,55 @@
 # PART OF THE ARSC ASSEMBLER
 #
 
-# Provides the traditional symbol table functionality
+from array import array
+
+# Provides the traditional symbol table functionality. Additionally, each symbol
+# (either defined or only referenced so far) is given a dense integer id so that
+# the parsed instructions may refer to their symbolic addresses by id and have
+# them resolved with a plain index into the 'addresses' array (-1 if undefined)
 class SymbolTable:
+    UNDEFINED = -1
+
     def __init__(self):
         self.symbols = dict()
+        self.ids = dict()
+        self.names = []
+        self.addresses = array('l')
+
+    # Returns the id of the symbol, giving out a new one to an unknown symbol
+    def get_id(self, symbol):
+        symbol_id = self.ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self.names)
+            self.ids[symbol] = symbol_id
+            self.names.append(symbol)
+            self.addresses.append(SymbolTable.UNDEFINED)
+
+        return symbol_id
 
     def add_entry(self, symbol, addr):
         if symbol in self.symbols:
             raise KeyError('Symbol "%s" already exists' % symbol)
 
         try:
-            self.symbols[symbol] = int(addr)
+            self.set_address(self.get_id(symbol), int(addr))
         except ValueError:
             raise ValueError('Address "%s" must be an integer' % addr)
 
+    # Defines the symbol with the given id (the caller checks for redefinitions)
+    def set_address(self, symbol_id, addr):
+        self.addresses[symbol_id] = addr
+        self.symbols[self.names[symbol_id]] = addr
+
+    # Forgets the addresses of all the symbols; the ids are kept (i.e. for another
+    # first pass over the rewritten statements)
+    def clear_addresses(self):
+        self.symbols = dict()
+        self.addresses[:] = array('l', [SymbolTable.UNDEFINED]) * len(self.names)
+
+    def is_defined(self, symbol_id):
+        return self.addresses[symbol_id] != SymbolTable.UNDEFINED
+
     def contains(self, symbol):
         return (symbol in self.symbols)
 
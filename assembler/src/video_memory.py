@@ -0,0 +1,133 @@
+# ==============================================================================
+# ARSC (A Relatively Simple Computer) License
+# ==============================================================================
+# 
+# ARSC is distributed under the following BSD-style license:
+# 
+# Copyright (c) 2016-2017 Dzanan Bajgoric
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright notice, this
+#    list of conditions and the following disclaimer in the documentation and/or other
+#    materials provided with the distribution.
+# 
+# 3. The name of the author may not be used to endorse or promote products derived from
+#    this product without specific prior written permission from the author.
+# 
+# 4. Products derived from this product may not be called "ARSC" nor may "ARSC" appear
+#    in their names without specific prior written permission from the author.
+# 
+# THIS PRODUCT IS PROVIDED ``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING,
+# BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS PRODUCT, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+# ARSC INSTRUCTION SET SIMULATOR
+#
+import time
+from isa_simulator import MemoryMappedDevice
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# VGA screen geometry: 640x480 3-bit pixels, 5 pixels per 16-bit word (bits 14-0,
+# pixel 0 in the least significant bits), 128 words per row
+SCREEN_WIDTH = 640
+SCREEN_HEIGHT = 480
+PIXELS_PER_WORD = 5
+VIDEO_MEMORY_SIZE = SCREEN_WIDTH * SCREEN_HEIGHT / PIXELS_PER_WORD
+
+# RGB values of the 3-bit colors (bit 2 is red, bit 1 green and bit 0 blue)
+def get_palette():
+    return [(255 * ((color >> 2) & 1), 255 * ((color >> 1) & 1), 255 * (color & 1)) for color in range(0, 8)]
+
+# Decodes the video memory words into the RGB pixels one pixel at a time (the
+# reference for VideoMemory.get_frame, used when NumPy is not available)
+def decode_words(words):
+    palette = get_palette()
+    pixels = bytearray()
+    for word in words:
+        for shift in range(0, 3 * PIXELS_PER_WORD, 3):
+            pixels.extend(palette[(word >> shift) & 7])
+    return pixels
+
+
+# VGA video memory (device 0 of RWD and WWD) decoded into RGB frames with NumPy.
+# The words are kept in an array('H') for the fast per-word access of the
+# simulator, and 'pixels' is a NumPy uint16 view of the same memory used for the
+# vectorized decoding. The words written since the last frame are marked dirty, so
+# only those are decoded into the cached frame: exporting the frames of an
+# animation costs in proportion to what changed between them
+class VideoMemory(MemoryMappedDevice):
+    def __init__(self, size=VIDEO_MEMORY_SIZE):
+        if numpy is None:
+            raise ImportError('the video memory model requires NumPy')
+        MemoryMappedDevice.__init__(self, size)
+        self.size = size
+        self.pixels = numpy.frombuffer(self.words, dtype=numpy.uint16)
+        self.dirty = bytearray(size)
+        self.modified = False
+        self.palette = numpy.array(get_palette(), dtype=numpy.uint8)
+        self.shifts = numpy.arange(0, 3 * PIXELS_PER_WORD, 3, dtype=numpy.uint16)
+        self.frame = numpy.zeros((size * PIXELS_PER_WORD, 3), dtype=numpy.uint8)
+        self.frame[:] = self.palette[0]
+        self.frame_count = 0
+        self.decoded_words = 0
+        self.decode_time = 0
+
+    def write(self, address, data):
+        self.write_count += 1
+        if address < self.size:
+            self.words[address] = data
+            self.dirty[address] = 1
+            self.modified = True
+
+    # Decodes the words into the frame rows (one RGB pixel per row)
+    def decode(self, addresses=None):
+        words = self.pixels if addresses is None else self.pixels[addresses]
+        colors = (words[:, numpy.newaxis] >> self.shifts) & 7
+        if addresses is None:
+            self.frame[:] = self.palette[colors.ravel()]
+        else:
+            offsets = (addresses[:, numpy.newaxis] * PIXELS_PER_WORD + numpy.arange(0, PIXELS_PER_WORD)).ravel()
+            self.frame[offsets] = self.palette[colors.ravel()]
+        self.decoded_words += len(words)
+
+    # Returns the current frame as a height x width x 3 array of RGB bytes. The
+    # frame is shared with the video memory (it is updated by the next call)
+    def get_frame(self):
+        if self.modified:
+            start = time.time()
+            addresses = numpy.flatnonzero(numpy.frombuffer(self.dirty, dtype=numpy.uint8))
+            if len(addresses) * 4 > self.size:
+                self.decode()
+            else:
+                self.decode(addresses)
+            self.dirty[:] = bytearray(self.size)
+            self.modified = False
+            self.decode_time += time.time() - start
+        self.frame_count += 1
+        return self.frame.reshape((self.size / (SCREEN_WIDTH / PIXELS_PER_WORD), SCREEN_WIDTH, 3))
+
+    # Writes the current frame as a binary PPM image
+    def write_frame(self, filename):
+        frame = self.get_frame()
+        try:
+            with open(filename, 'wb') as ppm_file:
+                ppm_file.write('P6\n%d %d\n255\n' % (frame.shape[1], frame.shape[0]))
+                ppm_file.write(frame.tostring())
+        except IOError:
+            raise IOError('Failed to write the frame file "%s"' % filename)
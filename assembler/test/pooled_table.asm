@@ -0,0 +1,10 @@
+LDX ONE,1
+LDA NINE
+STA BUF,1
+LDA =0
+HLT
+ONE BSC 1
+NINE BSC 9
+BUF BSC 0
+B1 BSC 0
+END